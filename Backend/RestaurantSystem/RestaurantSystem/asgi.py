@@ -3,6 +3,9 @@ ASGI config for RestaurantSystem project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live order stream (``/api/orders/events/``) holds connections open, so
+serve it through an ASGI server, e.g. ``uvicorn RestaurantSystem.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
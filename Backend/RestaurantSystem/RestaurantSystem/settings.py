@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -38,6 +39,46 @@ REST_FRAMEWORK = {
     )
 }
 
+# Keyset pagination for the order/billing endpoints (restaurant.pagination).
+# Clients may ask for up to PAGINATION_MAX_PAGE_SIZE rows with ?page_size=.
+PAGINATION_PAGE_SIZE = 50
+PAGINATION_MAX_PAGE_SIZE = 200
+
+# Render hot list endpoints from .values() rows instead of model serializers
+# (restaurant.fastpath); the JSON is the same either way.
+FAST_LIST_SERIALIZATION = True
+
+# Live order events (restaurant.events). The in-process broker only fans out
+# within one ASGI worker; swap in a shared broker when running several.
+ORDER_EVENTS_BROKER = "restaurant.events.InProcessBroker"
+ORDER_EVENTS_HEARTBEAT = 15
+
+# Parallel kitchen capacity for order ETAs (restaurant.kitchen). None counts
+# the active Chef accounts instead, cached for KITCHEN_CHEFS_CACHE_SECONDS.
+KITCHEN_ACTIVE_CHEFS = None
+KITCHEN_CHEFS_CACHE_SECONDS = 60
+
+# How long a stored Idempotency-Key response is replayed (restaurant.idempotency).
+# A key still pending after IDEMPOTENCY_PENDING_LEASE is treated as abandoned.
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+IDEMPOTENCY_PENDING_LEASE = timedelta(seconds=30)
+
+# `manage.py archive_orders` moves PAID/CANCELLED orders older than this into
+# the archive tables, ORDER_ARCHIVE_BATCH_SIZE orders per transaction.
+ORDER_ARCHIVE_AFTER_DAYS = 30
+ORDER_ARCHIVE_BATCH_SIZE = 500
+
+# Deleted-order tombstones are kept this long for delta sync (?since=) and then
+# purged by `manage.py archive_orders`; older sync tokens must refetch the list.
+ORDER_TOMBSTONE_RETENTION_DAYS = 90
+
+# updated_at is stamped before an order's transaction commits, so delta sync
+# re-sends changes younger than this; keep it above the longest such transaction.
+ORDER_SYNC_SETTLE_WINDOW = timedelta(seconds=10)
+
+# Orders billed per aggregate query / invoice upsert (restaurant.billing).
+INVOICE_BATCH_SIZE = 500
+
 INSTALLED_APPS = [
     "django.contrib.admin",
     "django.contrib.auth",
@@ -69,6 +110,7 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
+    'idempotency-key',
 ]
 
 
@@ -90,6 +132,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "RestaurantSystem.wsgi.application"
+ASGI_APPLICATION = "RestaurantSystem.asgi.application"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
@@ -106,6 +149,56 @@ DATABASES = {
 }
 
 
+# Caches
+# The "menu" cache holds the versioned catalog payloads (restaurant.catalog).
+# It must be shared by every worker so they agree on the catalog version; the
+# file backend does that on one host, use Redis/Memcached across hosts.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "menu": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache" / "menu",
+    },
+}
+
+MENU_CACHE_ALIAS = "menu"
+MENU_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Static menu snapshots written under MEDIA_ROOT (restaurant.snapshots) for the
+# front proxy; republished by a background thread after every catalog edit when
+# MENU_AUTO_PUBLISH is on.
+MENU_SNAPSHOT_DIR = "menu"
+MENU_SNAPSHOT_KEEP = 5
+MENU_AUTO_PUBLISH = True
+
+# Resized MenuItem.image copies (restaurant.images), built off the request
+# path by MENU_IMAGE_WORKERS threads. Formats Pillow can't encode are skipped.
+MENU_IMAGE_WIDTHS = {"thumb": 160, "card": 480, "detail": 1080}
+MENU_IMAGE_FORMATS = ("avif", "webp")
+MENU_IMAGE_WORKERS = 2
+
+# Rows per bulk upsert when importing catalog CSV/JSON Lines (restaurant.transfer).
+CATALOG_IMPORT_BATCH_SIZE = 1000
+
+# `manage.py compact_inventory_ledger` folds stock movements older than this
+# into daily snapshots, INVENTORY_LEDGER_BATCH_SIZE items per transaction.
+INVENTORY_LEDGER_RETENTION_DAYS = 30
+INVENTORY_LEDGER_BATCH_SIZE = 500
+
+# Stock depletion forecasts (restaurant.forecast): hour-of-week sales rates over
+# the last INVENTORY_FORECAST_HISTORY_DAYS, recomputed every INVENTORY_FORECAST_TTL
+# seconds, projected INVENTORY_FORECAST_HORIZON_HOURS ahead. Items due to run
+# out within INVENTORY_LOW_STOCK_HOURS are listed at /api/inventory/low-stock/.
+INVENTORY_FORECAST_HISTORY_DAYS = 365
+INVENTORY_FORECAST_TTL = 60 * 60
+INVENTORY_FORECAST_HORIZON_HOURS = 14 * 24
+INVENTORY_FORECAST_BATCH_SIZE = 500
+INVENTORY_LOW_STOCK_HOURS = 24
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,130 @@
+"""Move closed orders out of the hot tables.
+
+PAID and CANCELLED orders older than a cut-off are copied, together with
+their lines, invoice and payment, into the ``Archived*`` tables and then
+deleted from the live ones. Each batch is its own transaction, so a long run
+never holds locks on the working set for more than one batch.
+
+Deleting orders leaves ``DeletedOrder`` tombstones for delta sync; those
+older than ``ORDER_TOMBSTONE_RETENTION_DAYS`` are purged the same way.
+"""
+
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    ArchivedInvoice,
+    ArchivedOrder,
+    ArchivedOrderItem,
+    ArchivedPayment,
+    DeletedOrder,
+    Invoice,
+    Order,
+    OrderItem,
+    Payment,
+)
+
+
+ARCHIVABLE_STATUSES = ("PAID", "CANCELLED")
+ORDER_FIELDS = (
+    "order_id",
+    "customer_id",
+    "table_id",
+    "created_at",
+    "updated_at",
+    "estimated_time",
+    "status",
+    "applied_discount_id",
+    "subtotal",
+    "discount",
+    "total",
+    "prep_minutes",
+)
+
+
+def archive_orders(older_than: timedelta | None = None, batch_size: int | None = None) -> int:
+    """Archive closed orders created before ``now - older_than``; return the count."""
+    if older_than is None:
+        older_than = timedelta(days=getattr(settings, "ORDER_ARCHIVE_AFTER_DAYS", 30))
+    if batch_size is None:
+        batch_size = getattr(settings, "ORDER_ARCHIVE_BATCH_SIZE", 500)
+
+    cutoff = timezone.now() - older_than
+    candidates = Order.objects.filter(
+        status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff
+    ).order_by("created_at", "pk")
+
+    archived = 0
+    while True:
+        batch = list(candidates.values_list("pk", flat=True)[:batch_size])
+        if not batch:
+            return archived
+        archived += _archive_batch(batch)
+
+
+def tombstone_horizon():
+    """Oldest deletion still remembered; delta syncs from before it can't be served."""
+    return timezone.now() - timedelta(days=getattr(settings, "ORDER_TOMBSTONE_RETENTION_DAYS", 90))
+
+
+def purge_tombstones() -> int:
+    """Delete tombstones older than the retention period; return the count."""
+    deleted, _ = DeletedOrder.objects.filter(deleted_at__lt=tombstone_horizon()).delete()
+    return deleted
+
+
+@transaction.atomic
+def _archive_batch(order_ids) -> int:
+    archived_at = timezone.now()
+    # Re-check the status inside the transaction in case an order was
+    # reopened or changed since the batch was picked.
+    orders = list(
+        Order.objects.filter(pk__in=order_ids, status__in=ARCHIVABLE_STATUSES).values(*ORDER_FIELDS)
+    )
+    if not orders:
+        return 0
+    ids = [row["order_id"] for row in orders]
+
+    ArchivedOrder.objects.bulk_create(
+        [ArchivedOrder(archived_at=archived_at, **row) for row in orders]
+    )
+    ArchivedOrderItem.objects.bulk_create(
+        [
+            ArchivedOrderItem(
+                id=line["id"],
+                order_id=line["order_id"],
+                menu_item_id=line["menu_item_id"],
+                name=line["menu_item__name"],
+                price=line["menu_item__price"],
+                quantity=line["quantity"],
+                note=line["note"],
+            )
+            for line in OrderItem.objects.filter(order_id__in=ids).values(
+                "id", "order_id", "menu_item_id", "menu_item__name", "menu_item__price",
+                "quantity", "note",
+            )
+        ]
+    )
+    invoices = list(
+        Invoice.objects.filter(order_id__in=ids).values(
+            "invoice_id", "order_id", "customer_id", "amount", "status", "date"
+        )
+    )
+    ArchivedInvoice.objects.bulk_create([ArchivedInvoice(**row) for row in invoices])
+    ArchivedPayment.objects.bulk_create(
+        [
+            ArchivedPayment(**row)
+            for row in Payment.objects.filter(
+                invoice_id__in=[row["invoice_id"] for row in invoices]
+            ).values("payment_id", "invoice_id", "status", "transaction_id")
+        ]
+    )
+
+    # Invoices and payments cascade from the order.
+    Order.objects.filter(pk__in=ids).delete()
+    return len(ids)
@@ -0,0 +1,68 @@
+"""Invoices issued from the order's stored totals.
+
+An order gets its invoice when it moves to SERVED (``UNPAID``) and the
+invoice follows it to PAID. The amount is the order's denormalized
+``Order.total``, the figure the customer was shown and payments are taken
+against, so later menu price changes never reprice an issued bill. Invoices
+are written with a single ``INSERT ... ON CONFLICT (order_id) DO UPDATE``,
+so issuing is idempotent: re-issuing, or two requests moving the same order
+at once, update the one invoice the order can have instead of failing or
+adding a second one. A PAID invoice is settled and is never rewritten.
+"""
+
+from __future__ import annotations
+
+from django.conf import settings
+
+from .models import Invoice, Order
+
+
+BILLED_STATUSES = ("SERVED", "PAID")
+
+
+def issue_invoices(order_ids) -> int:
+    """Issue or refresh the invoices of the given orders that are SERVED/PAID.
+
+    Orders whose invoice is already PAID are skipped. Returns how many
+    invoices were written. Run it in the transaction that changed the orders
+    so the invoice commits (or not) with the status.
+    """
+    order_ids = list(order_ids)
+    batch_size = getattr(settings, "INVOICE_BATCH_SIZE", 500)
+    issued = 0
+    for start in range(0, len(order_ids), batch_size):
+        rows = (
+            Order.objects.filter(pk__in=order_ids[start:start + batch_size], status__in=BILLED_STATUSES)
+            .exclude(invoice__status=Invoice.PAID)
+            .values_list("pk", "customer_id", "status", "total")
+        )
+        invoices = [
+            Invoice(
+                order_id=pk,
+                customer_id=customer_id,
+                amount=total,
+                status=Invoice.PAID if status == "PAID" else Invoice.UNPAID,
+            )
+            for pk, customer_id, status, total in rows
+        ]
+        Invoice.objects.bulk_create(
+            invoices,
+            update_conflicts=True,
+            unique_fields=["order"],
+            update_fields=["customer", "amount", "status"],
+        )
+        issued += len(invoices)
+    return issued
+
+
+def reissue_invoices(start, end) -> int:
+    """Re-issue the unpaid invoices of SERVED/PAID orders placed between two dates (inclusive)."""
+    order_ids = (
+        Order.objects.filter(
+            status__in=BILLED_STATUSES, created_at__date__gte=start, created_at__date__lte=end
+        )
+        .exclude(invoice__status=Invoice.PAID)
+        .order_by("created_at")
+        .values_list("pk", flat=True)
+    )
+    return issue_invoices(order_ids.iterator())
@@ -0,0 +1,191 @@
+"""Versioned cache for the menu catalog.
+
+Every write to a MenuItem, Category or InventoryItem bumps a catalog version
+kept in the ``settings.MENU_CACHE_ALIAS`` cache. Serialized catalog responses
+are stored under that version, so a read between edits costs two cache hits
+and no database queries, and an edit invalidates everything at once without
+having to enumerate keys. Point the alias at a backend shared by all workers
+(file, Redis, Memcached) so they agree on the current version.
+
+JSON payloads are rendered and compressed (gzip, and brotli when the
+``brotli`` package is installed) once per version and stored as bytes. The
+version doubles as the catalog's last-modified time, so ETag and
+Last-Modified validators come for free and an unchanged catalog is answered
+with 304 without touching the payload at all. HTTP dates only have
+one-second resolution, so Last-Modified is the end of the version's second
+and is only sent once that second is over: a later edit then always lands in
+a later second, and a client echoing the header back as If-Modified-Since
+gets 304 exactly while nothing changed. Until then clients revalidate with
+the ETag.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+VERSION_KEY = "catalog:version"
+# Below this size compression costs more than it saves (same as GZipMiddleware).
+MIN_COMPRESS_LENGTH = 200
+ENCODINGS = (("br", re.compile(r"\bbr\b")), ("gzip", re.compile(r"\bgzip\b")))
+
+
+def _cache():
+    return caches[getattr(settings, "MENU_CACHE_ALIAS", "default")]
+
+
+def _now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+def catalog_version() -> int:
+    """Current catalog version; also the last change time in epoch milliseconds."""
+    version = _cache().get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock, never from 1, so payloads cached under an
+        # evicted version can't be mistaken for the current one.
+        version = _now_ms()
+        if not _cache().add(VERSION_KEY, version, timeout=None):
+            version = _cache().get(VERSION_KEY, version)
+    return version
+
+
+def on_commit_once(func) -> None:
+    """``transaction.on_commit(func)`` unless ``func`` is already queued.
+
+    A bulk edit inside one transaction fires a signal per row; the catalog
+    only needs to be invalidated (and republished) once when it commits.
+    """
+    connection = transaction.get_connection()
+    if connection.in_atomic_block and any(
+        queued is func for _, queued, _ in connection.run_on_commit
+    ):
+        return
+    transaction.on_commit(func)
+
+
+def _bump() -> None:
+    current = _cache().get(VERSION_KEY) or 0
+    _cache().set(VERSION_KEY, max(_now_ms(), current + 1), timeout=None)
+
+
+def bump_catalog_version() -> None:
+    """Invalidate cached catalog payloads once the current transaction commits."""
+    on_commit_once(_bump)
+
+
+class CachedCatalogMixin:
+    """Serve ``list``/``retrieve`` from the versioned catalog cache."""
+
+    catalog_cache_prefix: str = ""
+
+    def _catalog_key(self, request, version: int) -> str:
+        # Image URLs are absolute, so the host is part of the payload. The
+        # request-specific part is hashed to keep free-form query strings
+        # (search terms) within memcached's key rules.
+        variant = "|".join(
+            (
+                self.catalog_cache_prefix,
+                self.action,
+                str(self.kwargs.get(self.lookup_url_kwarg or self.lookup_field, "")),
+                request.get_host(),
+                request.META.get("QUERY_STRING", ""),
+            )
+        )
+        return f"catalog:{version}:{hashlib.sha1(variant.encode()).hexdigest()}"
+
+    def _cached(self, request, render):
+        if request.accepted_renderer.format != "json":
+            # Browsable API and friends: render normally.
+            return render()
+
+        version = catalog_version()
+        key = self._catalog_key(request, version)
+        etag = 'W/"%s"' % hashlib.sha1(key.encode()).hexdigest()
+        last_modified = _last_modified(version)
+
+        if _not_modified(request, etag, last_modified):
+            response = HttpResponseNotModified()
+        else:
+            entry = _cache().get(key)
+            if entry is None:
+                rendered = render()
+                if rendered.status_code != 200:
+                    return rendered
+                entry = _build_entry(rendered.data)
+                _cache().set(key, entry, timeout=getattr(settings, "MENU_CACHE_TIMEOUT", 86400))
+            response = _encoded_response(request, entry)
+
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        response["Cache-Control"] = "private, no-cache"
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(
+            request, lambda: super(CachedCatalogMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(
+            request, lambda: super(CachedCatalogMixin, self).retrieve(request, *args, **kwargs)
+        )
+
+
+def _last_modified(version: int) -> int | None:
+    """Ceiling second of ``version``, or None while that second is still running."""
+    ceiling = version // 1000 + 1
+    if _now_ms() < ceiling * 1000:
+        # Another edit may still land in this second without moving the date.
+        return None
+    return ceiling
+
+
+def _not_modified(request, etag: str, last_modified: int | None) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        # Weak comparison: the validator covers every encoding of the body.
+        tags = parse_etags(if_none_match)
+        return "*" in tags or etag.removeprefix("W/") in {t.removeprefix("W/") for t in tags}
+    if last_modified is None:
+        return False
+    since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return since is not None and last_modified <= since
+
+
+def _build_entry(data) -> dict[str, bytes | None]:
+    body = JSONRenderer().render(data)
+    entry = {"identity": body, "gzip": None, "br": None}
+    if len(body) >= MIN_COMPRESS_LENGTH:
+        entry["gzip"] = gzip.compress(body, mtime=0)
+        if brotli is not None:
+            entry["br"] = brotli.compress(body)
+    return entry
+
+
+def _encoded_response(request, entry) -> HttpResponse:
+    accept = request.headers.get("Accept-Encoding", "")
+    for encoding, pattern in ENCODINGS:
+        if entry[encoding] is not None and pattern.search(accept):
+            response = HttpResponse(entry[encoding], content_type="application/json")
+            response["Content-Encoding"] = encoding
+            return response
+    return HttpResponse(entry["identity"], content_type="application/json")
@@ -0,0 +1,102 @@
+"""Order event fan-out for the live dashboards.
+
+Views publish an event once per order change; every connected stream that is
+subscribed to one of the event's channels receives the already-serialized
+payload, so open dashboards never go back to the database to find out what
+changed.
+
+The broker is pluggable through ``settings.ORDER_EVENTS_BROKER``. The default
+``InProcessBroker`` fans out inside a single ASGI process, which is enough for
+one server; a multi-process deployment can point the setting at a broker
+backed by Redis pub/sub or similar with the same two methods.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+STAFF_CHANNELS = ("role:admin", "role:manager", "role:chef", "role:waiter")
+
+
+class InProcessBroker:
+    """Fan events out to asyncio queues living in this process."""
+
+    queue_size = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    def publish(self, channels, event: dict) -> None:
+        """Deliver ``event`` to every subscriber of ``channels``.
+
+        Safe to call from sync code running in a worker thread; delivery is
+        handed to each subscriber's event loop.
+        """
+        message = json.dumps(event, cls=DjangoJSONEncoder)
+        with self._lock:
+            targets = {sub for channel in channels for sub in self._subscribers.get(channel, ())}
+        for loop, queue in targets:
+            loop.call_soon_threadsafe(self._offer, queue, message)
+
+    @asynccontextmanager
+    async def subscribe(self, channels):
+        """Yield a queue of JSON-encoded events for the given channels."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size))
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                for channel in channels:
+                    subs = self._subscribers.get(channel)
+                    if subs is not None:
+                        subs.discard(subscriber)
+                        if not subs:
+                            del self._subscribers[channel]
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, message: str) -> None:
+        # A client that stopped reading should not grow memory without bound;
+        # it will resync from the REST endpoints when it reconnects.
+        if not queue.full():
+            queue.put_nowait(message)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    path = getattr(settings, "ORDER_EVENTS_BROKER", "restaurant.events.InProcessBroker")
+    return import_string(path)()
+
+
+def channels_for_order(order) -> list[str]:
+    channels = list(STAFF_CHANNELS)
+    if order.customer_id:
+        channels.append(f"customer:{order.customer_id}")
+    return channels
+
+
+def publish_order_event(event_type: str, order, data: dict) -> None:
+    """Publish an order event once the surrounding transaction commits."""
+    event = {"type": event_type, "order": data}
+    channels = channels_for_order(order)
+    transaction.on_commit(lambda: get_broker().publish(channels, event))
+
+
+def publish_status_change(order, previous_status: str, data: dict) -> None:
+    if order.status == previous_status:
+        return
+    event_type = "order.cancelled" if order.status == "CANCELLED" else "order.status_changed"
+    publish_order_event(event_type, order, data)
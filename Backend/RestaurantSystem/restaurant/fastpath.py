@@ -0,0 +1,223 @@
+"""Serializer output from ``.values()`` rows for hot list endpoints.
+
+A ``ModelSerializer`` walks its fields for every object: it resolves each
+attribute through ``get_attribute``, builds a nested serializer per related
+object and runs every ``to_representation``. ``ValuesPlan`` does that
+walk once per serializer class. It works out the columns the serializer
+needs (following nested serializers through joins) and a flat list of
+extractor steps. Rendering a list is then one ``.values()`` query per level
+of ``many=True`` nesting and a tight loop over plain dicts.
+
+The steps reuse the serializer's own field objects for anything that formats
+a value (datetimes, decimals, choices), so the JSON is identical to the
+regular path. Method fields need a ``values_fields`` entry on the serializer
+naming their columns. The matching ``represent_<name>`` method receives those
+column values; a single-column entry without one is passed through as is.
+Serializers the plan can't handle fall back to the regular path.
+
+Plans are built per serializer class and ``Fieldsets`` (restaurant.fieldsets),
+so a sparse or collapsed response also reads fewer columns and skips the
+joins and child queries of whatever wasn't expanded.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import ManyToOneRel
+from rest_framework import serializers
+from rest_framework.relations import RelatedField
+from rest_framework.response import Response
+
+from .fieldsets import Fieldsets, get_fieldsets
+
+
+class UnsupportedSerializer(Exception):
+    pass
+
+
+# Fields whose to_representation is the identity for values read from the DB.
+PASSTHROUGH_FIELDS = (serializers.BooleanField, serializers.IntegerField)
+
+
+class ValuesPlan:
+    def __init__(self, serializer, prefix: str = ""):
+        serializer_class = type(serializer)
+        model = serializer.Meta.model
+        self.model = model
+        self.serializer_class = serializer_class
+        self.columns: list[str] = [prefix + "pk"]
+        # (field name, kind, payload); see _render_row for the kinds.
+        self.steps: list[tuple] = []
+        self.children: list[tuple[str, str, ValuesPlan]] = []
+
+        values_fields = getattr(serializer_class, "values_fields", {})
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source.replace(".", "__")
+
+            if isinstance(field, serializers.SerializerMethodField):
+                if name not in values_fields:
+                    raise UnsupportedSerializer(f"{serializer_class.__name__}.{name}")
+                columns = [prefix + column for column in values_fields[name]]
+                self.columns += columns
+                represent = f"represent_{name}"
+                if hasattr(serializer_class, represent):
+                    self.steps.append((name, "method", (represent, columns)))
+                elif len(columns) == 1:
+                    self.steps.append((name, "raw", columns[0]))
+                else:
+                    raise UnsupportedSerializer(f"{serializer_class.__name__}.{name}")
+
+            elif isinstance(field, serializers.ListSerializer):
+                relation = model._meta.get_field(source)
+                if prefix or not isinstance(relation, ManyToOneRel):
+                    raise UnsupportedSerializer(f"{serializer_class.__name__}.{name}")
+                self.children.append((name, relation.field.name, ValuesPlan(field.child)))
+                self.steps.append((name, "children", name))
+
+            elif isinstance(field, serializers.ManyRelatedField):
+                # A collapsed many=True relation: the children's ids.
+                relation = model._meta.get_field(source)
+                child = field.child_relation
+                if (
+                    prefix
+                    or not isinstance(relation, ManyToOneRel)
+                    or not isinstance(child, serializers.PrimaryKeyRelatedField)
+                    or child.pk_field
+                ):
+                    raise UnsupportedSerializer(f"{serializer_class.__name__}.{name}")
+                self.children.append((name, relation.field.name, PkPlan(relation.related_model)))
+                self.steps.append((name, "children", name))
+
+            elif isinstance(field, serializers.BaseSerializer):
+                nested = ValuesPlan(field, prefix=f"{prefix}{source}__")
+                if nested.children:
+                    raise UnsupportedSerializer(f"{serializer_class.__name__}.{name}")
+                self.columns += [prefix + source, *nested.columns]
+                self.steps.append((name, "nested", (prefix + source, nested)))
+
+            elif isinstance(field, RelatedField):
+                if not isinstance(field, serializers.PrimaryKeyRelatedField) or field.pk_field:
+                    raise UnsupportedSerializer(f"{serializer_class.__name__}.{name}")
+                self.columns.append(prefix + source)
+                self.steps.append((name, "raw", prefix + source))
+
+            else:
+                self.columns.append(prefix + source)
+                plain = isinstance(field, PASSTHROUGH_FIELDS) or (
+                    type(field) is serializers.CharField
+                )
+                if plain:
+                    self.steps.append((name, "raw", prefix + source))
+                else:
+                    self.steps.append((name, "convert", (prefix + source, field)))
+
+        self.columns = list(dict.fromkeys(self.columns))
+
+    def values(self, queryset, *extra):
+        """``queryset`` as rows carrying every column the plan reads."""
+        return queryset.prefetch_related(None).values(*dict.fromkeys([*self.columns, *extra]))
+
+    def render(self, rows, context=None) -> list[dict]:
+        rows = list(rows)
+        context = context or {}
+        owners: dict = {}
+        children = {
+            name: self._fetch_children(rows, parent, plan, context, owners)
+            for name, parent, plan in self.children
+        }
+        return [self._render_row(row, context, owners, children) for row in rows]
+
+    def _fetch_children(self, rows, parent: str, plan: "ValuesPlan", context, owners):
+        lines = plan.values(
+            plan.model._default_manager.filter(**{f"{parent}__in": [row["pk"] for row in rows]}),
+            parent,
+        )
+        grouped: dict = {}
+        for line in lines:
+            grouped.setdefault(line[parent], []).append(
+                plan._render_row(line, context, owners, {})
+            )
+        return grouped
+
+    def _render_row(self, row, context, owners, children) -> dict:
+        out = {}
+        for name, kind, payload in self.steps:
+            if kind == "raw":
+                out[name] = row[payload]
+            elif kind == "convert":
+                value = row[payload[0]]
+                out[name] = None if value is None else payload[1].to_representation(value)
+            elif kind == "nested":
+                key, nested = payload
+                out[name] = (
+                    None if row[key] is None else nested._render_row(row, context, owners, children)
+                )
+            elif kind == "children":
+                out[name] = children[payload].get(row[self.columns[0]], [])
+            else:  # method
+                method, columns = payload
+                owner = owners.get(self.serializer_class)
+                if owner is None:
+                    owner = owners[self.serializer_class] = self.serializer_class(context=context)
+                out[name] = getattr(owner, method)(*(row[column] for column in columns))
+        return out
+
+
+class PkPlan:
+    """Child plan for a relation collapsed to its ids."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def values(self, queryset, *extra):
+        return queryset.values("pk", *extra)
+
+    def _render_row(self, row, context, owners, children):
+        return row["pk"]
+
+
+@lru_cache(maxsize=256)
+def get_plan(serializer_class, fieldsets: Fieldsets | None = None) -> ValuesPlan | None:
+    try:
+        return ValuesPlan(serializer_class(context={"fieldsets": fieldsets or Fieldsets()}))
+    except UnsupportedSerializer:
+        return None
+
+
+class FastListMixin:
+    """Serve ``list`` through the serializer's ValuesPlan when it has one.
+
+    Set ``FAST_LIST_SERIALIZATION = False`` to go back to the serializers.
+    """
+
+    def get_values_plan(self):
+        if not getattr(settings, "FAST_LIST_SERIALIZATION", True):
+            return None
+        return get_plan(
+            self.get_serializer_class(), get_fieldsets({"request": self.request})
+        )
+
+    def serialize_many(self, queryset) -> list:
+        """``get_serializer(queryset, many=True).data``, via the plan if possible."""
+        plan = self.get_values_plan()
+        if plan is None:
+            return self.get_serializer(queryset, many=True).data
+        return plan.render(plan.values(queryset), self.get_serializer_context())
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_values_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # The keyset paginator reads its cursor from the ordering columns.
+        ordering = [field.lstrip("-") for field in getattr(self.paginator, "ordering", ())]
+        rows = plan.values(queryset, *ordering)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(plan.render(page, self.get_serializer_context()))
+        return Response(plan.render(rows, self.get_serializer_context()))
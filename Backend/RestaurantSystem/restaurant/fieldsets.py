@@ -0,0 +1,132 @@
+"""Sparse fieldsets (``?fields=``) and opt-in expansion (``?expand=``).
+
+Both parameters take comma-separated dotted paths, relative to the objects
+the endpoint returns:
+
+* ``?fields=order_id,status,items.quantity`` keeps only those fields. A path
+  through a nested object (``items.quantity``) also expands it;
+* ``?expand=items.menu_item_detail`` renders nested objects that are
+  collapsed by default. ``items.*`` expands everything below ``items``.
+
+Serializers opt in with ``SparseFieldsMixin`` and list their nested fields in
+``expandable_fields``: unless expanded, a nested object is rendered as its id
+(or left out where the id is already a sibling field). Views look at the same
+``Fieldsets`` to only join and prefetch what is actually rendered.
+
+``fields=`` only shapes responses; serializers bound to request data keep
+every field, so writes validate as before.
+"""
+
+from __future__ import annotations
+
+from typing import NamedTuple
+
+from rest_framework import serializers
+
+
+WILDCARD = "*"
+
+
+def _paths(values) -> frozenset[tuple[str, ...]]:
+    return frozenset(
+        tuple(part.strip() for part in path.split("."))
+        for value in values
+        for path in value.split(",")
+        if path.strip()
+    )
+
+
+class Fieldsets(NamedTuple):
+    fields: frozenset = frozenset()
+    expand: frozenset = frozenset()
+
+    @classmethod
+    def from_request(cls, request) -> "Fieldsets":
+        if request is None:
+            return cls()
+        params = request.query_params
+        return cls(_paths(params.getlist("fields")), _paths(params.getlist("expand")))
+
+    def only(self, path: tuple = ()) -> set[str]:
+        """Field names kept at ``path``; empty means all of them."""
+        depth = len(path)
+        return {p[depth] for p in self.fields if len(p) > depth and p[:depth] == path}
+
+    def is_expanded(self, path: tuple, name: str) -> bool:
+        depth = len(path)
+        full = (*path, name)
+        for p in self.expand:
+            if p[-1] == WILDCARD and full[: len(p) - 1] == p[:-1]:
+                return True
+            if len(p) > depth and p[:depth] == path and p[depth] == name:
+                return True
+        # fields=items.quantity needs items expanded.
+        return any(len(p) > depth + 1 and p[:depth] == path and p[depth] == name for p in self.fields)
+
+    def includes(self, dotted: str) -> bool:
+        """Whether ``dotted`` is rendered, i.e. kept by ``fields=`` at every level."""
+        path = tuple(dotted.split("."))
+        for depth, name in enumerate(path):
+            only = self.only(path[:depth])
+            if only and name not in only:
+                return False
+        return True
+
+    def expands(self, dotted: str) -> bool:
+        """Whether the nested object at ``dotted`` is rendered in full."""
+        path = tuple(dotted.split("."))
+        return self.includes(dotted) and all(
+            self.is_expanded(path[:depth], name) for depth, name in enumerate(path)
+        )
+
+
+# Everything rendered in full: the payloads from before expansion was opt-in,
+# for consumers that can't ask (order events).
+EXPAND_ALL = Fieldsets(expand=frozenset({(WILDCARD,)}))
+
+
+def get_fieldsets(context: dict) -> Fieldsets:
+    """The request's ``Fieldsets``, parsed once per serializer context."""
+    if "fieldsets" not in context:
+        context["fieldsets"] = Fieldsets.from_request(context.get("request"))
+    return context["fieldsets"] or Fieldsets()
+
+
+def collapsed_pk(many: bool = False):
+    """``expandable_fields`` value rendering a collapsed relation as its id(s)."""
+    return lambda: serializers.PrimaryKeyRelatedField(many=many, read_only=True)
+
+
+class SparseFieldsMixin:
+    """Apply the context's ``Fieldsets`` to this serializer's fields.
+
+    ``expandable_fields`` maps nested fields to a factory for the field that
+    replaces them when they aren't expanded, or None to leave them out.
+    """
+
+    expandable_fields: dict = {}
+
+    def fieldset_path(self) -> tuple[str, ...]:
+        path = []
+        node = self
+        while node.parent is not None:
+            # A many=True child shares its ListSerializer's name.
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+        return tuple(reversed(path))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldsets = get_fieldsets(self.context)
+        path = self.fieldset_path()
+        for name, collapsed in self.expandable_fields.items():
+            if name in fields and not fieldsets.is_expanded(path, name):
+                if collapsed is None:
+                    del fields[name]
+                else:
+                    fields[name] = collapsed()
+        only = fieldsets.only(path)
+        if only and not hasattr(self.root, "initial_data"):
+            fields = {name: field for name, field in fields.items() if name in only}
+        return fields
@@ -0,0 +1,255 @@
+"""Stock depletion forecasts from order history.
+
+Consumption is modelled per menu item and hour of the week (Monday 00:00 is
+slot 0, in the restaurant's ``TIME_ZONE``): the rate for a slot is the
+quantity sold in that slot over the history window divided by how many times
+the slot occurred since the item's first sale in the window.
+
+The database sums the sales per item and quarter hour as plain integers
+(no per-row datetime or UUID conversion), and they are streamed into NumPy a
+chunk at a time. Everything after that is array arithmetic:
+
+* ``sold`` and ``occurrences`` are ``(items, 168)`` matrices, ``rates`` their
+  ratio;
+* for a batch of items, the next ``horizon`` hours of demand are
+  ``rates[:, slots]``, and a running sum against the current stock gives the
+  hour each item runs out.
+
+Rates only move as history accumulates, so they are cached for
+``INVENTORY_FORECAST_TTL`` seconds (``manage.py forecast_inventory`` refreshes
+them from cron); the projection itself always uses the live quantities.
+"""
+
+from __future__ import annotations
+
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.db.models import Func, IntegerField, Sum
+from django.utils import timezone
+
+from .models import ArchivedOrderItem, InventoryItem, OrderItem
+
+
+HOURS_PER_WEEK = 168
+SLOTS = np.arange(HOURS_PER_WEEK)
+RATES_KEY = "inventory:forecast:rates"
+# Sales are bucketed by quarter hour, the finest step any UTC offset uses.
+BUCKET_SECONDS = 15 * 60
+# Grouped sales rows read from the cursor per array.
+CHUNK_ROWS = 20_000
+# Epoch hours count from Thursday 1970-01-01; shift so Monday 00:00 is slot 0.
+EPOCH_SLOT = 3 * 24
+
+
+class EpochBucket(Func):
+    """Quarter hours since the Unix epoch, computed by the database."""
+
+    output_field = IntegerField()
+    template = f"CAST(EXTRACT(EPOCH FROM %(expressions)s) AS BIGINT) / {BUCKET_SECONDS}"
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            template=f"CAST(strftime('%%%%s', %(expressions)s) AS INTEGER) / {BUCKET_SECONDS}",
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            template=f"UNIX_TIMESTAMP(%(expressions)s) DIV {BUCKET_SECONDS}",
+            **extra_context,
+        )
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def _cache():
+    # The shared catalog cache, so rates refreshed from cron reach every worker.
+    return caches[_setting("MENU_CACHE_ALIAS", "default")]
+
+
+def _offsets(since, now) -> tuple[int, np.ndarray]:
+    """First UTC epoch hour of the window and the local offset (in buckets) of each hour."""
+    tz = timezone.get_current_timezone()
+    first = int(since.timestamp()) // 3600
+    last = int(now.timestamp()) // 3600
+    # DST moves the offset on whole hours, so one lookup per hour of the
+    # window covers every row.
+    offsets = np.fromiter(
+        (
+            int(datetime.fromtimestamp(hour * 3600, tz).utcoffset().total_seconds())
+            // BUCKET_SECONDS
+            for hour in range(first, last + 1)
+        ),
+        dtype=np.int64,
+        count=last - first + 1,
+    )
+    return first, offsets
+
+
+def _local_hours(buckets: np.ndarray, window) -> np.ndarray:
+    """UTC epoch buckets as local wall-clock hours since the epoch."""
+    first, offsets = window
+    index = np.clip(buckets // 4 - first, 0, len(offsets) - 1)
+    return (buckets + offsets[index]) // 4
+
+
+def _slot(hours: np.ndarray) -> np.ndarray:
+    return (hours + EPOCH_SLOT) % HOURS_PER_WEEK
+
+
+def _bucket(moment) -> np.ndarray:
+    return np.array([int(moment.timestamp()) // BUCKET_SECONDS], dtype=np.int64)
+
+
+def _history(model, since):
+    """``(inventory row, bucket, quantity)`` for every tracked item's sales."""
+    return (
+        model.objects.filter(menu_item__inventoryitem__isnull=False, order__created_at__gte=since)
+        .exclude(order__status="CANCELLED")
+        .annotate(bucket=EpochBucket("order__created_at"))
+        .order_by()
+        .values("menu_item__inventoryitem", "bucket")
+        .annotate(sold=Sum("quantity"))
+        .values_list("menu_item__inventoryitem", "bucket", "sold")
+    )
+
+
+def _chunks(queryset):
+    """The queryset's rows as ``int64`` arrays of up to ``CHUNK_ROWS`` rows.
+
+    Every column is an integer, so rows are read straight off the cursor
+    instead of going through the ORM's per-row converters.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        while rows := cursor.fetchmany(CHUNK_ROWS):
+            yield np.array(rows, dtype=np.int64)
+
+
+def consumption_rates(now=None) -> tuple[list, np.ndarray]:
+    """Tracked menu item ids and their units per hour in each slot (one row each)."""
+    now = now or timezone.now()
+    since = now - timedelta(days=_setting("INVENTORY_FORECAST_HISTORY_DAYS", 365))
+    window = _offsets(since, now)
+
+    tracked = list(InventoryItem.objects.order_by("pk").values_list("pk", "item_id"))
+    if not tracked:
+        return [], np.zeros((0, HOURS_PER_WEEK))
+    rows = np.array([pk for pk, _ in tracked], dtype=np.int64)
+    now_hour = _local_hours(_bucket(now), window)[0]
+    sold = np.zeros((len(tracked), HOURS_PER_WEEK))
+    first = np.full(len(tracked), now_hour)
+
+    for model in (OrderItem, ArchivedOrderItem):
+        for batch in _chunks(_history(model, since)):
+            row = np.searchsorted(rows, batch[:, 0])
+            # Items that started being tracked after ``tracked`` was read have
+            # no row (or would land on a neighbour's); leave them out.
+            known = rows[np.minimum(row, len(rows) - 1)] == batch[:, 0]
+            batch, row = batch[known], row[known]
+            hour = _local_hours(batch[:, 1], window)
+            np.add.at(sold, (row, _slot(hour)), batch[:, 2])
+            np.minimum.at(first, row, hour)
+
+    # Each slot occurred once per whole week since the item's first sale, plus
+    # once more if it falls in the leftover part-week (current hour included).
+    start = np.maximum(first, _local_hours(_bucket(since), window)[0])
+    span = now_hour - start + 1
+    occurrences = (span // HOURS_PER_WEEK)[:, None] + (
+        (SLOTS - _slot(start)[:, None]) % HOURS_PER_WEEK < (span % HOURS_PER_WEEK)[:, None]
+    )
+    rates = np.divide(sold, occurrences, out=np.zeros_like(sold), where=occurrences > 0)
+    return [item_id for _, item_id in tracked], rates
+
+
+def cached_rates(item_ids, refresh: bool = False) -> np.ndarray:
+    """``consumption_rates`` rows for ``item_ids``, recomputed when stale."""
+    known = None if refresh else _cache().get(RATES_KEY)
+    if known is None or not known.keys() >= set(item_ids):
+        known = dict(zip(*consumption_rates()))
+        _cache().set(RATES_KEY, known, timeout=_setting("INVENTORY_FORECAST_TTL", 60 * 60))
+    if not item_ids:
+        return np.zeros((0, HOURS_PER_WEEK))
+    return np.stack([known[pk] for pk in item_ids])
+
+
+def project(rates: np.ndarray, quantities: np.ndarray, now=None, horizon: int | None = None):
+    """Hours until each item runs out (NaN: not within ``horizon``) and demand over it."""
+    now = now or timezone.now()
+    horizon = horizon or _setting("INVENTORY_FORECAST_HORIZON_HOURS", 14 * 24)
+    local = timezone.localtime(now)
+
+    # The current hour is partly gone; scale its demand and length to what's left.
+    lengths = np.ones(horizon)
+    lengths[0] = 1 - (local.minute * 60 + local.second) / 3600
+    current = local.weekday() * 24 + local.hour
+    steps = (current + np.arange(horizon)) % HOURS_PER_WEEK
+    demand = rates[:, steps] * lengths
+    used = np.cumsum(demand, axis=1)
+
+    out = used >= quantities[:, None]
+    hour = out.argmax(axis=1)
+    rows = np.arange(len(quantities))
+    before = np.where(hour > 0, used[rows, np.maximum(hour - 1, 0)], 0.0)
+    elapsed = np.concatenate(([0.0], np.cumsum(lengths)))[hour]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        within = (quantities - before) / demand[rows, hour] * lengths[hour]
+    hours_left = np.where(quantities <= 0, 0.0, elapsed + np.nan_to_num(within))
+    hours_left[~out.any(axis=1)] = np.nan
+    return hours_left, used[:, -1]
+
+
+def forecast(now=None) -> list[dict]:
+    """Depletion forecast for every stock-tracked item, soonest out first."""
+    now = now or timezone.now()
+    stock = list(
+        InventoryItem.objects.order_by("item_id").values_list("item_id", "item__name", "quantity")
+    )
+    if not stock:
+        return []
+    item_ids = [pk for pk, _, _ in stock]
+    quantities = np.array([quantity for _, _, quantity in stock], dtype=float)
+
+    rates = cached_rates(item_ids)
+    size = _setting("INVENTORY_FORECAST_BATCH_SIZE", 500)
+    results = []
+    for start in range(0, len(stock), size):
+        end = start + size
+        hours_left, demand = project(rates[start:end], quantities[start:end], now)
+        daily = rates[start:end].sum(axis=1) / 7
+        for (pk, name, quantity), left, needed, per_day in zip(
+            stock[start:end], hours_left.tolist(), demand.tolist(), daily.tolist()
+        ):
+            runs_out = not math.isnan(left)
+            results.append(
+                {
+                    "item": pk,
+                    "name": name,
+                    "quantity": quantity,
+                    "daily_rate": round(per_day, 2),
+                    "hours_left": round(left, 1) if runs_out else None,
+                    "runs_out_at": now + timedelta(hours=left) if runs_out else None,
+                    # Units to order to cover the whole horizon.
+                    "reorder_quantity": max(math.ceil(needed - quantity), 0),
+                }
+            )
+    results.sort(key=lambda row: (row["hours_left"] is None, row["hours_left"] or 0, row["name"]))
+    return results
+
+
+def low_stock(rows: list[dict]) -> list[dict]:
+    """Forecast rows due to run out within ``INVENTORY_LOW_STOCK_HOURS``."""
+    threshold = _setting("INVENTORY_LOW_STOCK_HOURS", 24)
+    return [row for row in rows if row["hours_left"] is not None and row["hours_left"] <= threshold]
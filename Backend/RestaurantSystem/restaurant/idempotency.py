@@ -0,0 +1,140 @@
+"""``Idempotency-Key`` support for create endpoints.
+
+A retried request carrying the same key, body and query string gets the
+stored response of the first one instead of running the create again. Keys are scoped per user and
+endpoint and expire after ``settings.IDEMPOTENCY_KEY_TTL``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+
+HEADER = "Idempotency-Key"
+
+
+class IdempotencyConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is still being processed."
+    default_code = "idempotency_conflict"
+
+
+def _request_hash(request) -> str:
+    # The query string shapes the response (?fields=, ?expand=), so a replay
+    # must match it as well as the body.
+    payload = json.dumps(
+        [sorted(request.query_params.lists()), request.data], sort_keys=True, cls=JSONEncoder
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _claim(request, scope: str, key: str, request_hash: str):
+    """``(row, claimed)``: a new pending row for the key, or the existing live one.
+
+    A pending row older than ``IDEMPOTENCY_PENDING_LEASE`` belongs to a
+    request that died before storing its response; it is taken over.
+    """
+    ttl = getattr(settings, "IDEMPOTENCY_KEY_TTL", timedelta(hours=24))
+    lease = getattr(settings, "IDEMPOTENCY_PENDING_LEASE", timedelta(seconds=30))
+    now = timezone.now()
+    lookup = {"user": request.user, "scope": scope, "key": key}
+
+    # Replays are the common case, so look the key up before trying to insert.
+    existing = IdempotencyKey.objects.filter(**lookup).first()
+    if existing is not None:
+        abandoned = existing.response_status is None and existing.created_at <= now - lease
+        if existing.expires_at > now and not abandoned:
+            return existing, False
+        existing.delete()
+
+    try:
+        with transaction.atomic():
+            claimed = IdempotencyKey.objects.create(
+                request_hash=request_hash, expires_at=now + ttl, **lookup
+            )
+        return claimed, True
+    except IntegrityError:
+        # A concurrent request with the same key claimed it first.
+        existing = IdempotencyKey.objects.filter(**lookup).first()
+        if existing is not None:
+            return existing, False
+    raise IdempotencyConflict()
+
+
+def idempotent(scope: str):
+    """Decorate a viewset ``create`` so it honours the Idempotency-Key header.
+
+    The create and the stored response commit in one transaction, so a
+    stored response always goes with the object it describes, and a create
+    that never got to store one leaves nothing behind for its retry.
+    """
+
+    def decorator(create):
+        @wraps(create)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return create(self, request, *args, **kwargs)
+            if len(key) > 255:
+                raise ValidationError({HEADER: "Must be at most 255 characters."})
+
+            request_hash = _request_hash(request)
+            row, claimed = _claim(request, scope, key, request_hash)
+            if not claimed:
+                if row.request_hash != request_hash:
+                    return Response(
+                        {"detail": f"{HEADER} was already used with a different request."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                if row.response_status is None:
+                    raise IdempotencyConflict()
+                return Response(
+                    json.loads(row.response_body),
+                    status=row.response_status,
+                    headers={"Idempotent-Replayed": "true"},
+                )
+
+            try:
+                with transaction.atomic():
+                    response = create(self, request, *args, **kwargs)
+                    if status.is_success(response.status_code):
+                        stored = IdempotencyKey.objects.filter(
+                            pk=row.pk, response_status__isnull=True
+                        ).update(
+                            response_status=response.status_code,
+                            response_body=json.dumps(response.data, cls=JSONEncoder),
+                        )
+                        if not stored:
+                            # Our lease ran out and a retry took the key over;
+                            # roll back so only one of us creates anything.
+                            raise IdempotencyConflict()
+                        return response
+            except Exception:
+                IdempotencyKey.objects.filter(pk=row.pk, response_status__isnull=True).delete()
+                raise
+
+            # Failed attempts may be retried with the same key.
+            IdempotencyKey.objects.filter(pk=row.pk, response_status__isnull=True).delete()
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def purge_expired() -> int:
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
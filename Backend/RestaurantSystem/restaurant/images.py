@@ -0,0 +1,160 @@
+"""Resized WebP/AVIF derivatives of ``MenuItem.image``.
+
+Uploads are stored as-is; after the save commits, a small thread pool opens
+the original once and writes one copy per configured width and format. The
+copies are named after a hash of the original's bytes
+(``menu_items/derived/<hash>-<width>.<format>``), so they never change once
+written and can be served with a far-future cache lifetime. A JPEG (PNG
+when the image has transparency) at the middle width is written too, as the
+``src`` for clients that ignore ``srcset``. When they are ready, the names are recorded in ``MenuItem.image_variants``, the catalog
+version is bumped and the static menu snapshot republished, so cached menus
+pick up the new ``srcset``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import close_old_connections, transaction
+from django.utils.encoding import filepath_to_uri
+from PIL import Image, ImageOps, features
+
+from .catalog import bump_catalog_version
+from .models import MenuItem
+
+
+logger = logging.getLogger(__name__)
+
+DERIVED_DIR = "menu_items/derived"
+# Pillow save() options per output format.
+ENCODER_OPTIONS = {
+    "avif": {"quality": 60},
+    "webp": {"quality": 80, "method": 4},
+    "jpeg": {"quality": 82, "optimize": True, "progressive": True},
+    "png": {"optimize": True},
+}
+
+
+def variant_widths() -> list[int]:
+    widths = getattr(settings, "MENU_IMAGE_WIDTHS", {"thumb": 160, "card": 480, "detail": 1080})
+    return sorted(widths.values())
+
+
+def variant_formats() -> list[str]:
+    """Configured formats this Pillow build can actually encode."""
+    return [fmt for fmt in getattr(settings, "MENU_IMAGE_FORMATS", ("avif", "webp")) if features.check(fmt)]
+
+
+@lru_cache(maxsize=None)
+def _executor() -> ThreadPoolExecutor:
+    # Pillow releases the GIL while resampling and encoding, so threads are
+    # enough to keep this work off the request path.
+    return ThreadPoolExecutor(
+        max_workers=getattr(settings, "MENU_IMAGE_WORKERS", 2),
+        thread_name_prefix="menu-images",
+    )
+
+
+def schedule_variants(item: MenuItem) -> None:
+    """Build ``item``'s derivatives in the background once the save commits."""
+    name = item.image.name
+    transaction.on_commit(lambda: _executor().submit(_build_in_worker, item.pk, name))
+
+
+def _build_in_worker(item_id, name: str) -> None:
+    close_old_connections()
+    try:
+        build_variants(item_id, name)
+    except Exception:
+        logger.exception("Building image variants for menu item %s failed", item_id)
+    finally:
+        close_old_connections()
+
+
+def build_variants(item_id, name: str) -> dict:
+    """Write the derivatives of image ``name`` and record them on the item."""
+    with default_storage.open(name, "rb") as f:
+        original = f.read()
+    digest = hashlib.sha256(original).hexdigest()[:16]
+
+    with Image.open(BytesIO(original)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            # Palette and greyscale images may carry a transparent colour
+            # instead of an alpha band; keep it as alpha.
+            transparent = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if transparent else "RGB")
+        # Never upscale: widths past the original collapse into one copy.
+        widths = sorted({min(width, image.width) for width in variant_widths()})
+        fallback_width = widths[len(widths) // 2]
+        fallback_format = "png" if image.mode == "RGBA" else "jpeg"
+        formats = {fmt: {} for fmt in variant_formats()}
+        for width in widths:
+            height = max(round(image.height * width / image.width), 1)
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for fmt, names in formats.items():
+                names[str(width)] = _store(resized, f"{DERIVED_DIR}/{digest}-{width}.{fmt}", fmt)
+            if width == fallback_width:
+                fallback = _store(
+                    resized, f"{DERIVED_DIR}/{digest}-{width}.{fallback_format}", fallback_format
+                )
+
+    variants = {"source": name, "widths": widths, "formats": formats, "fallback": fallback}
+    # Only record them if the item still points at the image we processed.
+    if MenuItem.objects.filter(pk=item_id, image=name).update(image_variants=variants):
+        # Imported here: snapshots renders through the serializers, which import this module.
+        from .snapshots import schedule_publish
+
+        bump_catalog_version()
+        schedule_publish()
+    return variants
+
+
+def _store(image: Image.Image, name: str, fmt: str) -> str:
+    if default_storage.exists(name):
+        # Same content hash and width: written by an earlier run.
+        return name
+    buffer = BytesIO()
+    image.save(buffer, format=fmt.upper(), **ENCODER_OPTIONS.get(fmt, {}))
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def media_url_builder(request=None):
+    """Return ``name -> URL`` for stored files, absolute when there is a request.
+
+    With the filesystem storage every URL is ``MEDIA_URL`` plus the quoted
+    name, so the absolute prefix is computed once instead of per file.
+    """
+    if isinstance(default_storage, FileSystemStorage):
+        base = request.build_absolute_uri(default_storage.base_url) if request else default_storage.base_url
+        return lambda name: base + filepath_to_uri(name).lstrip("/")
+    if request is not None:
+        return lambda name: request.build_absolute_uri(default_storage.url(name))
+    return default_storage.url
+
+
+def image_src(name: str, variants: dict, media_url) -> str:
+    """URL for ``<img src>``: the mid-size fallback once built, else the original."""
+    variants = variants or {}
+    if variants.get("source") == name and variants.get("fallback"):
+        return media_url(variants["fallback"])
+    return media_url(name)
+
+
+def image_srcset(name: str, variants: dict, media_url) -> dict[str, str]:
+    """``{format: "url 160w, url 480w, ..."}`` for the image stored as ``name``."""
+    variants = variants or {}
+    if not name or variants.get("source") != name:
+        # Not built yet (or built for a replaced image).
+        return {}
+    return {
+        fmt: ", ".join(f"{media_url(path)} {width}w" for width, path in names.items())
+        for fmt, names in variants.get("formats", {}).items()
+    }
@@ -0,0 +1,330 @@
+"""Stock reservation for orders.
+
+Only menu items with an ``InventoryItem`` row are stock-tracked; the rest can
+always be ordered. Placing an order locks just the inventory rows it touches
+(in primary-key order, so two orders never deadlock) and decrements them with
+one guarded ``UPDATE ... SET quantity = quantity - n WHERE quantity >= n``.
+If any line can't be covered, the order's transaction is rolled back.
+Cancelling an order, or deleting one that could still be cancelled, puts
+back what the ledger says it holds; editing an order's lines reserves or
+returns the difference.
+
+A menu item whose stock reaches zero is switched to unavailable; it is
+switched back on restock unless it was made unavailable by hand.
+
+Every change is also appended to the ``InventoryMovement`` ledger, one
+batched INSERT per operation. ``compact_ledger`` folds movements older than
+the retention window into one ``InventorySnapshot`` per item and day, so
+``stock_levels`` (now or at any past instant) reads one snapshot plus the
+movements after it through the ``(item, created_at)`` index.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Min, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .catalog import bump_catalog_version
+from .models import InventoryItem, InventoryMovement, InventorySnapshot, MenuItem, Order, OrderItem
+from .snapshots import schedule_publish
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# Orders that can still be cancelled hold stock that isn't spent yet.
+RELEASABLE_STATUSES = tuple(s for s, targets in Order.TRANSITIONS.items() if "CANCELLED" in targets)
+# Orders that can't move on any more; their stock is final and their ledger
+# rows may be compacted away.
+SETTLED_STATUSES = tuple(s for s, targets in Order.TRANSITIONS.items() if not targets)
+
+
+def _per_item(amounts: dict):
+    """``CASE item_id WHEN ... THEN n END`` for a ``{menu item id: n}`` map."""
+    return Case(
+        *[When(item_id=item_id, then=Value(n)) for item_id, n in amounts.items()],
+        output_field=IntegerField(),
+    )
+
+
+def reserve(amounts: dict, order_id=None) -> None:
+    """Take ``{menu item id: quantity}`` out of stock or raise ValidationError.
+
+    Must run inside the order's transaction.
+    """
+    tracked = dict(
+        InventoryItem.objects.select_for_update()
+        .filter(item_id__in=amounts)
+        .order_by("item_id")
+        .values_list("item_id", "quantity")
+    )
+    if not tracked:
+        return
+    wanted = {item_id: amounts[item_id] for item_id in tracked}
+
+    updated = (
+        InventoryItem.objects.filter(item_id__in=wanted, quantity__gte=_per_item(wanted))
+        .update(quantity=F("quantity") - _per_item(wanted))
+    )
+    if updated != len(wanted):
+        short = [item_id for item_id, n in wanted.items() if tracked[item_id] < n]
+        names = MenuItem.objects.filter(pk__in=short).order_by("name").values_list("name", flat=True)
+        raise ValidationError({"items": f"Not enough stock for: {', '.join(names)}"})
+
+    InventoryMovement.objects.bulk_create(
+        [
+            InventoryMovement(item_id=item_id, delta=-n, reason=InventoryMovement.ORDER, order_id=order_id)
+            for item_id, n in wanted.items()
+        ]
+    )
+    sync_availability(wanted)
+
+
+def _held(order_ids) -> list[tuple]:
+    """``(order id, menu item id, units)`` the ledger says each order still holds."""
+    rows = (
+        InventoryMovement.objects.filter(
+            order_id__in=order_ids,
+            reason__in=[InventoryMovement.ORDER, InventoryMovement.CANCEL],
+        )
+        .values("order_id", "item")
+        .annotate(balance=Sum("delta"))
+        .filter(balance__lt=0)
+        .values_list("order_id", "item", "balance")
+    )
+    return [(order_id, item_id, -balance) for order_id, item_id, balance in rows]
+
+
+def _put_back(lines, reason: str) -> None:
+    """Return ``(order id, menu item id, units)`` to stock, logged under ``reason``."""
+    if not lines:
+        return
+    amounts: dict = {}
+    for _, item_id, n in lines:
+        amounts[item_id] = amounts.get(item_id, 0) + n
+
+    InventoryItem.objects.filter(item_id__in=amounts).update(
+        quantity=F("quantity") + _per_item(amounts)
+    )
+    InventoryMovement.objects.bulk_create(
+        [
+            InventoryMovement(item_id=item_id, delta=n, reason=reason, order_id=order_id)
+            for order_id, item_id, n in lines
+        ]
+    )
+    sync_availability(amounts)
+
+
+def release_orders(order_ids) -> None:
+    """Return the stock held by the given (just cancelled or deleted) orders.
+
+    What is returned is read from the ledger, not from the order's lines, so
+    lines edited later or items tracked after the order was placed can't put
+    back more than was taken.
+    """
+    _put_back(_held(order_ids), InventoryMovement.CANCEL)
+
+
+def sync_order(order_id) -> None:
+    """Reserve or return the difference between an order's lines and what it holds.
+
+    For lines edited after the order was placed; must run inside the edit's
+    transaction so a shortage rolls the edit back. Settled (paid or
+    cancelled) orders are left alone: their stock is final, and their
+    reservations may already have been compacted out of the ledger.
+    """
+    if Order.objects.filter(pk=order_id, status__in=SETTLED_STATUSES).exists():
+        return
+    wanted = dict(
+        OrderItem.objects.filter(order_id=order_id, menu_item__inventoryitem__isnull=False)
+        .values("menu_item")
+        .annotate(total=Sum("quantity"))
+        .values_list("menu_item", "total")
+    )
+    held = {item_id: n for _, item_id, n in _held([order_id])}
+    change = {
+        item_id: wanted.get(item_id, 0) - held.get(item_id, 0)
+        for item_id in wanted.keys() | held.keys()
+    }
+    reserve({item_id: n for item_id, n in change.items() if n > 0}, order_id)
+    _put_back(
+        [(order_id, item_id, -n) for item_id, n in change.items() if n < 0],
+        InventoryMovement.ORDER,
+    )
+
+
+def adjust(entries) -> None:
+    """Apply restock/waste entries: dicts with ``item``, ``quantity``, ``reason``, ``note``.
+
+    Restocking an untracked item starts tracking it.
+    """
+    amounts: dict = {}
+    movements = []
+    for entry in entries:
+        sign = -1 if entry["reason"] == InventoryMovement.WASTE else 1
+        delta = sign * entry["quantity"]
+        amounts[entry["item"]] = amounts.get(entry["item"], 0) + delta
+        movements.append(
+            InventoryMovement(
+                item_id=entry["item"], delta=delta, reason=entry["reason"], note=entry.get("note", "")
+            )
+        )
+    with transaction.atomic():
+        InventoryItem.objects.bulk_create(
+            [InventoryItem(item_id=item_id, quantity=0) for item_id in amounts],
+            ignore_conflicts=True,
+        )
+        InventoryItem.objects.filter(item_id__in=amounts).update(
+            quantity=F("quantity") + _per_item(amounts)
+        )
+        short = InventoryItem.objects.filter(item_id__in=amounts, quantity__lt=0)
+        if short.exists():
+            names = short.order_by("item__name").values_list("item__name", flat=True)
+            raise ValidationError({"entries": f"More waste than stock for: {', '.join(names)}"})
+        InventoryMovement.objects.bulk_create(movements)
+        sync_availability(amounts)
+
+
+def record_stocktakes(counts: dict, previous: dict) -> None:
+    """Log ``{item id: counted}`` against ``{item id: quantity before}``."""
+    InventoryMovement.objects.bulk_create(
+        [
+            InventoryMovement(
+                item_id=item_id, delta=counted - previous.get(item_id, 0),
+                reason=InventoryMovement.STOCKTAKE,
+            )
+            for item_id, counted in counts.items()
+            if counted != previous.get(item_id, 0)
+        ]
+    )
+
+
+def sync_availability(item_ids) -> None:
+    """Flip ``MenuItem.available`` for tracked items that ran out or came back."""
+    item_ids = list(item_ids)
+    sold_out = list(
+        InventoryItem.objects.filter(
+            item_id__in=item_ids, quantity__lte=0, item__available=True
+        ).values_list("item_id", flat=True)
+    )
+    restocked = list(
+        InventoryItem.objects.filter(
+            item_id__in=item_ids, quantity__gt=0, disabled_by_stock=True
+        ).values_list("item_id", flat=True)
+    )
+    if sold_out:
+        MenuItem.objects.filter(pk__in=sold_out).update(available=False)
+        InventoryItem.objects.filter(item_id__in=sold_out).update(disabled_by_stock=True)
+    if restocked:
+        MenuItem.objects.filter(pk__in=restocked).update(available=True)
+        InventoryItem.objects.filter(item_id__in=restocked).update(disabled_by_stock=False)
+    if sold_out or restocked:
+        # QuerySet.update() sends no signals, so invalidate the menu here.
+        bump_catalog_version()
+        schedule_publish()
+
+
+def stock_levels(item_ids=None, at: datetime | None = None) -> dict:
+    """``{menu item id: quantity}`` from the ledger, now or as of ``at``.
+
+    Each item costs one snapshot lookup and one indexed range sum; before the
+    retention window the answer is as of the end of that day's activity.
+    """
+    at = at or timezone.now()
+    if item_ids is None:
+        item_ids = InventoryItem.objects.values("item_id")
+    snapshot = InventorySnapshot.objects.filter(item=OuterRef("pk"), taken_at__lte=at).order_by(
+        "-taken_at"
+    )
+    moved = (
+        InventoryMovement.objects.filter(
+            item=OuterRef("pk"),
+            created_at__lte=at,
+            created_at__gt=Coalesce(OuterRef("snapshot_at"), Value(EPOCH)),
+        )
+        .order_by()
+        .values("item")
+        .annotate(total=Sum("delta"))
+        .values("total")
+    )
+    rows = (
+        MenuItem.objects.filter(pk__in=item_ids)
+        .annotate(
+            snapshot_at=Subquery(snapshot.values("taken_at")[:1]),
+            snapshot_quantity=Subquery(snapshot.values("quantity")[:1]),
+        )
+        .annotate(moved=Subquery(moved))
+        .values_list("pk", "snapshot_quantity", "moved")
+    )
+    return {pk: (base or 0) + (delta or 0) for pk, base, delta in rows}
+
+
+def compact_ledger(older_than: timedelta | None = None, batch_size: int | None = None) -> int:
+    """Fold movements older than ``now - older_than`` into daily snapshots.
+
+    Returns the number of movements removed. Items are handled
+    ``batch_size`` at a time, each batch in its own transaction. Items held
+    by an order that isn't settled yet stop at that reservation.
+    """
+    if older_than is None:
+        older_than = timedelta(days=getattr(settings, "INVENTORY_LEDGER_RETENTION_DAYS", 30))
+    if batch_size is None:
+        batch_size = getattr(settings, "INVENTORY_LEDGER_BATCH_SIZE", 500)
+    cutoff = timezone.now() - older_than
+    old = InventoryMovement.objects.filter(created_at__lt=cutoff)
+    item_ids = list(old.order_by().values_list("item_id", flat=True).distinct())
+
+    # release_orders and sync_order read the reservations of orders that
+    # aren't settled, so an item is only compacted up to the oldest of those.
+    held_since = dict(
+        InventoryMovement.objects.filter(
+            reason=InventoryMovement.ORDER,
+            created_at__lt=cutoff,
+            order_id__in=Order.objects.exclude(status__in=SETTLED_STATUSES).values("pk"),
+        )
+        .values("item_id")
+        .annotate(first=Min("created_at"))
+        .values_list("item_id", "first")
+    )
+
+    removed = 0
+    for start in range(0, len(item_ids), batch_size):
+        removed += _compact_items(item_ids[start:start + batch_size], cutoff, held_since)
+    return removed
+
+
+@transaction.atomic
+def _compact_items(item_ids, cutoff, held_since: dict) -> int:
+    # Movements only ever follow the newest snapshot, so that is the base.
+    balance = {
+        item_id: quantity
+        for item_id, quantity in InventorySnapshot.objects.filter(item_id__in=item_ids)
+        .order_by("item_id", "taken_at")
+        .values_list("item_id", "quantity")
+    }
+    window = Q(item_id__in=[i for i in item_ids if i not in held_since], created_at__lt=cutoff)
+    for item_id in item_ids:
+        if item_id in held_since:
+            window |= Q(item_id=item_id, created_at__lt=held_since[item_id])
+    old = InventoryMovement.objects.filter(window)
+    days = (
+        old.annotate(day=TruncDate("created_at"))
+        .values("item_id", "day")
+        .annotate(delta=Sum("delta"), last=Max("created_at"))
+        .order_by("item_id", "day")
+    )
+    snapshots = []
+    for row in days:
+        balance[row["item_id"]] = balance.get(row["item_id"], 0) + row["delta"]
+        # Stamped with the day's last movement, so the snapshot covers
+        # exactly the movements at or before ``taken_at``.
+        snapshots.append(
+            InventorySnapshot(item_id=row["item_id"], taken_at=row["last"], quantity=balance[row["item_id"]])
+        )
+    InventorySnapshot.objects.bulk_create(snapshots)
+    removed, _ = old.delete()
+    return removed
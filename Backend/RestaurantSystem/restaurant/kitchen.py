@@ -0,0 +1,166 @@
+"""Queue-aware estimated ready times.
+
+The kitchen is modelled as ``active_chefs`` parallel workers draining a
+backlog measured in chef-minutes. The backlog lives in the single
+``KitchenState`` row and is adjusted with ``F()`` updates when an order enters
+or leaves PENDING/PREPARING, so each estimate costs O(1) queries no matter
+how long the queue is.
+
+Adjustments are applied once the order's transaction commits, each in its
+own short statement, so concurrent orders never queue on the row's lock for
+the length of their transactions; an estimate reads the row without locking
+it. The chef count is cached for ``KITCHEN_CHEFS_CACHE_SECONDS`` and dropped
+whenever a chef account changes.
+"""
+
+from __future__ import annotations
+
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, Sum, Value, When
+from django.utils import timezone
+
+from users.models import Chef
+
+from .models import KitchenState, Order, OrderItem
+
+
+STATE_PK = 1
+CHEFS_CACHE_KEY = "kitchen:active_chefs"
+
+
+def order_work_minutes(lines) -> int:
+    """Chef-minutes for a set of ``(menu_item, quantity)``-bearing lines."""
+    return sum(line["quantity"] * line["menu_item"].prep_minutes for line in lines)
+
+
+def active_chefs() -> int:
+    configured = getattr(settings, "KITCHEN_ACTIVE_CHEFS", None)
+    if configured:
+        return configured
+    return cache.get_or_set(
+        CHEFS_CACHE_KEY,
+        lambda: max(Chef.objects.filter(user__is_active=True).count(), 1),
+        getattr(settings, "KITCHEN_CHEFS_CACHE_SECONDS", 60),
+    )
+
+
+def forget_active_chefs() -> None:
+    cache.delete(CHEFS_CACHE_KEY)
+
+
+def _queued_minutes(orders) -> int:
+    return orders.filter(status__in=Order.KITCHEN_STATUSES).aggregate(
+        value=Sum("prep_minutes")
+    )["value"] or 0
+
+
+def rebuild_backlog() -> int:
+    """Recompute the backlog from the live orders (repairs any drift)."""
+    backlog = _queued_minutes(Order.objects.all())
+    KitchenState.objects.update_or_create(pk=STATE_PK, defaults={"backlog_minutes": backlog})
+    return backlog
+
+
+def current_backlog(exclude=None) -> int:
+    """Committed backlog in chef-minutes, leaving out order ``exclude``."""
+    backlog = KitchenState.objects.filter(pk=STATE_PK).values_list("backlog_minutes", flat=True).first()
+    if backlog is None:
+        # No row yet: count the queue, which may already hold ``exclude``.
+        backlog = _queued_minutes(Order.objects.exclude(pk=exclude))
+    return backlog
+
+
+def _apply_backlog(delta: int) -> None:
+    updated = KitchenState.objects.filter(pk=STATE_PK).update(
+        backlog_minutes=F("backlog_minutes") + delta
+    )
+    if not updated:
+        # First order ever (or the row was removed): seed from the database,
+        # which already includes the committed change.
+        rebuild_backlog()
+
+
+def _adjust_backlog(delta: int) -> None:
+    transaction.on_commit(lambda: _apply_backlog(delta))
+
+
+def _eta(minutes: float):
+    return timezone.now() + timedelta(minutes=math.ceil(minutes))
+
+
+def order_created(order: Order) -> None:
+    """Queue a new order's work and stamp its estimated ready time."""
+    backlog = current_backlog(exclude=order.pk) + order.prep_minutes
+    _adjust_backlog(order.prep_minutes)
+    order.estimated_time = _eta(backlog / active_chefs())
+    Order.objects.filter(pk=order.pk).update(estimated_time=order.estimated_time)
+
+
+def order_status_changed(order: Order, previous_status: str) -> None:
+    """Release or re-estimate kitchen work after a status transition."""
+    was_queued = previous_status in Order.KITCHEN_STATUSES
+    is_queued = order.status in Order.KITCHEN_STATUSES
+
+    if was_queued and not is_queued:
+        _adjust_backlog(-order.prep_minutes)
+    elif is_queued and not was_queued:
+        _adjust_backlog(order.prep_minutes)
+
+    if order.status == "PREPARING":
+        # Work has started, so only this order's own work remains.
+        order.estimated_time = _eta(order.prep_minutes / active_chefs())
+    elif order.status == "READY":
+        order.estimated_time = timezone.now()
+    else:
+        return
+    Order.objects.filter(pk=order.pk).update(estimated_time=order.estimated_time)
+
+
+def bulk_status_eta(new_status: str, prep_minutes: set[int]):
+    """``estimated_time`` expression for a set-based status UPDATE, or None.
+
+    Mirrors order_status_changed: one CASE arm per distinct work size keeps
+    the whole batch in a single statement.
+    """
+    if new_status == "READY":
+        return Value(timezone.now())
+    if new_status == "PREPARING":
+        chefs = active_chefs()
+        return Case(
+            *[When(prep_minutes=m, then=Value(_eta(m / chefs))) for m in sorted(prep_minutes)],
+            output_field=DateTimeField(),
+        )
+    return None
+
+
+def bulk_status_changed(released: list[Order], new_status: str) -> None:
+    """Adjust the backlog once for a batch of orders that just moved."""
+    if new_status in Order.KITCHEN_STATUSES:
+        return
+    minutes = sum(o.prep_minutes for o in released if o.status in Order.KITCHEN_STATUSES)
+    if minutes:
+        _adjust_backlog(-minutes)
+
+
+def order_removed(order: Order) -> None:
+    if order.status in Order.KITCHEN_STATUSES and order.prep_minutes:
+        _adjust_backlog(-order.prep_minutes)
+
+
+def refresh_order_work(order: Order) -> None:
+    """Re-derive an order's work after its lines change while it is queued."""
+    work = OrderItem.objects.filter(order=order).aggregate(
+        value=Sum(F("quantity") * F("menu_item__prep_minutes"))
+    )["value"] or 0
+    delta = work - order.prep_minutes
+    if not delta:
+        return
+    Order.objects.filter(pk=order.pk).update(prep_minutes=work)
+    order.prep_minutes = work
+    if order.status in Order.KITCHEN_STATUSES:
+        _adjust_backlog(delta)
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from restaurant.archive import archive_orders, purge_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Move PAID/CANCELLED orders older than --days, with their items, invoices "
+        "and payments, into the archive tables, and purge deleted-order tombstones "
+        "past ORDER_TOMBSTONE_RETENTION_DAYS. Intended to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "ORDER_ARCHIVE_AFTER_DAYS", 30),
+            help="Archive closed orders created more than this many days ago.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=getattr(settings, "ORDER_ARCHIVE_BATCH_SIZE", 500),
+            help="Orders moved per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        count = archive_orders(timedelta(days=options["days"]), options["batch_size"])
+        purged = purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"Archived {count} orders, purged {purged} tombstones"))
@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from restaurant.fastpath import get_plan
+from restaurant.fieldsets import EXPAND_ALL
+from restaurant.models import MenuItem, Order, OrderItem
+from restaurant.serializers import MenuItemSerializer, OrderItemSerializer, OrderSerializer
+from restaurant.views import order_items_prefetch
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the regular serializers against the .values() fast path on the "
+        "current data, and check that both produce the same JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=200, help="Rows per list.")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per path.")
+
+    def handle(self, *args, **options):
+        limit, repeat = options["limit"], options["repeat"]
+        request = RequestFactory().get("/api/")
+        # Fully expanded: the heaviest payload each endpoint can be asked for.
+        context = {"request": request, "fieldsets": EXPAND_ALL}
+        cases = [
+            (
+                "menu-items",
+                MenuItemSerializer,
+                MenuItem.objects.select_related("category").order_by("name"),
+            ),
+            (
+                "orders",
+                OrderSerializer,
+                Order.objects.prefetch_related(*order_items_prefetch()).order_by("-created_at"),
+            ),
+            (
+                "order-items",
+                OrderItemSerializer,
+                OrderItem.objects.select_related("order", "menu_item__category").order_by("-pk"),
+            ),
+        ]
+
+        renderer = JSONRenderer()
+        for name, serializer_class, queryset in cases:
+            queryset = queryset[:limit]
+            plan = get_plan(serializer_class, EXPAND_ALL)
+
+            def regular():
+                return serializer_class(queryset.all(), many=True, context=context).data
+
+            def fast():
+                return plan.render(plan.values(queryset.all()), context)
+
+            if renderer.render(regular()) != renderer.render(fast()):
+                raise CommandError(f"{name}: fast path output differs from the serializer")
+
+            slow_ms, fast_ms = self._time(regular, repeat), self._time(fast, repeat)
+            rows = len(regular())
+            self.stdout.write(
+                f"{name:12} {rows:5} rows  serializer {slow_ms:8.2f} ms  "
+                f"values {fast_ms:8.2f} ms  x{slow_ms / fast_ms if fast_ms else 0:.1f}"
+            )
+
+    @staticmethod
+    def _time(func, repeat: int) -> float:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
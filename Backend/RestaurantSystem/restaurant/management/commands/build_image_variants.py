@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from restaurant.images import build_variants
+from restaurant.models import MenuItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the resized WebP/AVIF copies and the fallback copy of menu item "
+        "images that are missing or out of date (e.g. images uploaded before the "
+        "pipeline existed)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild every item's variants, not only stale ones.",
+        )
+
+    def handle(self, *args, **options):
+        built = 0
+        for item in MenuItem.objects.exclude(image="").exclude(image__isnull=True).iterator():
+            variants = item.image_variants
+            if options["force"] or variants.get("source") != item.image.name or "fallback" not in variants:
+                build_variants(item.pk, item.image.name)
+                built += 1
+        self.stdout.write(self.style.SUCCESS(f"Built variants for {built} menu items"))
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from restaurant.inventory import compact_ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold inventory movements older than --days into one stock snapshot per "
+        "item and day. Intended to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "INVENTORY_LEDGER_RETENTION_DAYS", 30),
+            help="Keep individual movements from the last this many days.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=getattr(settings, "INVENTORY_LEDGER_BATCH_SIZE", 500),
+            help="Items compacted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        count = compact_ledger(timedelta(days=options["days"]), options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Compacted {count} inventory movements"))
@@ -0,0 +1,24 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from restaurant.transfer import FORMATS, RESOURCES, render_rows
+
+
+class Command(BaseCommand):
+    help = "Stream a catalog resource to CSV or JSON Lines (stdout by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("resource", choices=sorted(RESOURCES))
+        parser.add_argument("--as", dest="fmt", choices=sorted(FORMATS), default="csv")
+        parser.add_argument("--output", "-o", help="File to write instead of stdout.")
+
+    def handle(self, *args, **options):
+        resource = RESOURCES[options["resource"]]
+        out = open(options["output"], "w", encoding="utf-8", newline="") if options["output"] else sys.stdout
+        try:
+            for chunk in render_rows(resource, options["fmt"]):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from restaurant.forecast import cached_rates, forecast, low_stock
+from restaurant.models import InventoryItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the hourly consumption rates behind /api/inventory/forecast/ and "
+        "list the items due to run out soon. Intended to run from cron."
+    )
+
+    def handle(self, *args, **options):
+        item_ids = list(InventoryItem.objects.order_by("item_id").values_list("item_id", flat=True))
+        cached_rates(item_ids, refresh=True)
+        alerts = low_stock(forecast())
+        for row in alerts:
+            self.stdout.write(f"{row['name']}: {row['quantity']} left, out in {row['hours_left']}h")
+        self.stdout.write(self.style.SUCCESS(f"Forecast refreshed; {len(alerts)} items low on stock"))
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from restaurant.transfer import FORMATS, RESOURCES, import_rows, parse_format, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert a catalog resource from a CSV or JSON Lines file in batches. "
+        "Nothing is written if any row is rejected."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("resource", choices=sorted(RESOURCES))
+        parser.add_argument("path")
+        parser.add_argument(
+            "--as",
+            dest="fmt",
+            choices=sorted(FORMATS),
+            help="Input format; guessed from the file extension by default.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=getattr(settings, "CATALOG_IMPORT_BATCH_SIZE", 1000),
+            help="Rows per bulk upsert.",
+        )
+
+    def handle(self, *args, **options):
+        fmt = parse_format(options["fmt"], options["path"])
+        with open(options["path"], "rb") as f:
+            try:
+                count = import_rows(
+                    RESOURCES[options["resource"]], read_rows(f, fmt), options["batch_size"]
+                )
+            except ValidationError as exc:
+                errors = exc.detail["errors"]
+                lines = "\n".join(f"  line {e['line']}: {e['error']}" for e in errors)
+                raise CommandError(f"{len(errors)} bad row(s), nothing imported:\n{lines}")
+        self.stdout.write(self.style.SUCCESS(f"Imported {count} {options['resource']} rows"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from restaurant.snapshots import publish_menu
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the available menu, grouped by category, to static JSON under "
+        "MEDIA_ROOT so a front proxy can serve it without reaching Django."
+    )
+
+    def handle(self, *args, **options):
+        path = publish_menu()
+        self.stdout.write(self.style.SUCCESS(f"Published {path}"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from restaurant.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the menu full-text search index from the MenuItem/Category tables."
+
+    def handle(self, *args, **options):
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS("Rebuilt the menu search index"))
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:27
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def backfill_order_totals(apps, schema_editor):
+    Order = apps.get_model("restaurant", "Order")
+    orders = Order.objects.select_related("applied_discount").annotate(
+        line_sum=Sum(F("items__quantity") * F("items__menu_item__price"))
+    )
+    for order in orders.iterator():
+        subtotal = order.line_sum or Decimal("0")
+        percent = order.applied_discount.percent_off if order.applied_discount_id else 0
+        discount = (subtotal * percent / 100).quantize(Decimal("0.01"))
+        Order.objects.filter(pk=order.pk).update(
+            subtotal=subtotal, discount=discount, total=subtotal - discount
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("restaurant", "0005_order_status_created_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="discount",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="subtotal",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="total",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(backfill_order_totals, migrations.RunPython.noop),
+    ]
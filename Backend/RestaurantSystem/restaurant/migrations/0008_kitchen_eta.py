@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:31
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def backfill_kitchen_work(apps, schema_editor):
+    Order = apps.get_model("restaurant", "Order")
+    KitchenState = apps.get_model("restaurant", "KitchenState")
+    live = Order.objects.filter(status__in=["PENDING", "PREPARING"]).annotate(
+        work=Sum(F("items__quantity") * F("items__menu_item__prep_minutes"))
+    )
+    backlog = 0
+    for order in live:
+        work = order.work or 0
+        Order.objects.filter(pk=order.pk).update(prep_minutes=work)
+        backlog += work
+    KitchenState.objects.create(pk=1, backlog_minutes=backlog)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("restaurant", "0007_order_updated_at_deletedorder"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="KitchenState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("backlog_minutes", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="prep_minutes",
+            field=models.PositiveIntegerField(default=10),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="prep_minutes",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_kitchen_work, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("restaurant", "0010_order_archive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menuitem",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,54 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE restaurant_menuitem_fts USING fts5("
+            "item_id UNINDEXED, name, description, category, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        schema_editor.execute(
+            "INSERT INTO restaurant_menuitem_fts (item_id, name, description, category) "
+            "SELECT m.item_id, m.name, m.description, COALESCE(c.name, '') "
+            "FROM restaurant_menuitem m "
+            "LEFT JOIN restaurant_category c ON c.id = m.category_id"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE TABLE restaurant_menuitem_search ("
+            "item_id uuid PRIMARY KEY, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX restaurant_menuitem_search_gin "
+            "ON restaurant_menuitem_search USING GIN (document)"
+        )
+        schema_editor.execute(
+            "INSERT INTO restaurant_menuitem_search (item_id, document) "
+            "SELECT m.item_id, "
+            "setweight(to_tsvector('simple', m.name), 'A') "
+            "|| setweight(to_tsvector('simple', COALESCE(c.name, '')), 'B') "
+            "|| setweight(to_tsvector('simple', m.description), 'C') "
+            "FROM restaurant_menuitem m "
+            "LEFT JOIN restaurant_category c ON c.id = m.category_id"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS restaurant_menuitem_fts")
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP TABLE IF EXISTS restaurant_menuitem_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("restaurant", "0011_menuitem_image_variants"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("restaurant", "0012_menuitem_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inventoryitem",
+            name="disabled_by_stock",
+            field=models.BooleanField(default=False),
+        ),
+    ]
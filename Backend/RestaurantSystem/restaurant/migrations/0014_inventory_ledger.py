@@ -0,0 +1,109 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def snapshot_current_stock(apps, schema_editor):
+    # Start the ledger from today's balances so ledger and counter agree.
+    InventoryItem = apps.get_model("restaurant", "InventoryItem")
+    InventorySnapshot = apps.get_model("restaurant", "InventorySnapshot")
+    now = timezone.now()
+    InventorySnapshot.objects.bulk_create(
+        [
+            InventorySnapshot(item_id=item_id, taken_at=now, quantity=quantity)
+            for item_id, quantity in InventoryItem.objects.values_list("item_id", "quantity")
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("restaurant", "0013_inventoryitem_disabled_by_stock"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventoryMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("delta", models.IntegerField()),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("ORDER", "Order"),
+                            ("CANCEL", "Cancelled order"),
+                            ("RESTOCK", "Restock"),
+                            ("WASTE", "Waste"),
+                            ("STOCKTAKE", "Stock-take"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("order_id", models.UUIDField(blank=True, null=True)),
+                ("note", models.CharField(blank=True, max_length=255)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="movements",
+                        to="restaurant.menuitem",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["item", "created_at"], name="invmove_item_created_idx"
+                    ),
+                    models.Index(fields=["created_at"], name="invmove_created_idx"),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="InventorySnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("taken_at", models.DateTimeField()),
+                ("quantity", models.IntegerField()),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_snapshots",
+                        to="restaurant.menuitem",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("item", "taken_at"),
+                        name="invsnapshot_item_taken_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(snapshot_current_stock, migrations.RunPython.noop),
+    ]
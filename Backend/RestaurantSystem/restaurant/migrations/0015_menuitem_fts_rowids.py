@@ -0,0 +1,56 @@
+from django.db import migrations
+
+
+FTS_OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+
+def key_fts_by_rowid(apps, schema_editor):
+    # SQLite only: PostgreSQL's search table is already keyed on item_id.
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS restaurant_menuitem_fts")
+    schema_editor.execute(
+        "CREATE TABLE restaurant_menuitem_fts_ids ("
+        "docid INTEGER PRIMARY KEY, item_id char(32) NOT NULL UNIQUE)"
+    )
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE restaurant_menuitem_fts USING fts5(name, description, category, {FTS_OPTIONS})"
+    )
+    schema_editor.execute(
+        "INSERT INTO restaurant_menuitem_fts_ids (item_id) SELECT item_id FROM restaurant_menuitem"
+    )
+    schema_editor.execute(
+        "INSERT INTO restaurant_menuitem_fts (rowid, name, description, category) "
+        "SELECT i.docid, m.name, m.description, COALESCE(c.name, '') "
+        "FROM restaurant_menuitem m "
+        "JOIN restaurant_menuitem_fts_ids i ON i.item_id = m.item_id "
+        "LEFT JOIN restaurant_category c ON c.id = m.category_id"
+    )
+
+
+def key_fts_by_item_id(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS restaurant_menuitem_fts")
+    schema_editor.execute("DROP TABLE IF EXISTS restaurant_menuitem_fts_ids")
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE restaurant_menuitem_fts USING fts5("
+        f"item_id UNINDEXED, name, description, category, {FTS_OPTIONS})"
+    )
+    schema_editor.execute(
+        "INSERT INTO restaurant_menuitem_fts (item_id, name, description, category) "
+        "SELECT m.item_id, m.name, m.description, COALESCE(c.name, '') "
+        "FROM restaurant_menuitem m "
+        "LEFT JOIN restaurant_category c ON c.id = m.category_id"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("restaurant", "0014_inventory_ledger"),
+    ]
+
+    operations = [
+        migrations.RunPython(key_fts_by_rowid, key_fts_by_item_id),
+    ]
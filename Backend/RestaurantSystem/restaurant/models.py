@@ -1,4 +1,9 @@
-from django.db import models
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
 import uuid
 from users.models import Customer
 
@@ -42,6 +47,7 @@ class MenuItem(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=8, decimal_places=2)
     available = models.BooleanField(default=True)
+    prep_minutes = models.PositiveIntegerField(default=10)
 
     def __str__(self):
         return self.name
@@ -51,6 +57,9 @@ class MenuItem(models.Model):
         null=True,
         blank=True
     )
+    # Resized copies of ``image`` built by restaurant.images:
+    # {"source": <image name>, "widths": [...], "formats": {fmt: {width: name}}}
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     category = models.ForeignKey(
         Category,
@@ -64,6 +73,82 @@ class InventoryItem(models.Model):
     item = models.OneToOneField(MenuItem, on_delete=models.CASCADE)
     quantity = models.IntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
+    # Set when running out of stock made the menu item unavailable, so a
+    # restock only re-enables items that weren't switched off by hand.
+    disabled_by_stock = models.BooleanField(default=False)
+
+
+class InventoryMovement(models.Model):
+    """Append-only stock change; see restaurant.inventory.
+
+    ``InventoryItem.quantity`` is the running balance used to guard
+    reservations; the ledger is what it can be audited and rebuilt from.
+    """
+
+    ORDER = "ORDER"
+    CANCEL = "CANCEL"
+    RESTOCK = "RESTOCK"
+    WASTE = "WASTE"
+    STOCKTAKE = "STOCKTAKE"
+    REASONS = [
+        (ORDER, "Order"),
+        (CANCEL, "Cancelled order"),
+        (RESTOCK, "Restock"),
+        (WASTE, "Waste"),
+        (STOCKTAKE, "Stock-take"),
+    ]
+
+    item = models.ForeignKey(MenuItem, related_name="movements", on_delete=models.CASCADE)
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASONS)
+    # Plain id rather than a FK: orders are archived away, movements stay.
+    order_id = models.UUIDField(null=True, blank=True)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["item", "created_at"], name="invmove_item_created_idx"),
+            models.Index(fields=["created_at"], name="invmove_created_idx"),
+        ]
+
+
+class InventorySnapshot(models.Model):
+    """Stock level of an item once every movement up to ``taken_at`` is counted.
+
+    Written by restaurant.inventory.compact_ledger, which folds old movements
+    into one snapshot per item and day and then deletes them.
+    """
+
+    item = models.ForeignKey(MenuItem, related_name="stock_snapshots", on_delete=models.CASCADE)
+    taken_at = models.DateTimeField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["item", "taken_at"], name="invsnapshot_item_taken_unique"),
+        ]
+
+
+class OrderQuerySet(models.QuerySet):
+    def delete(self):
+        # Bulk deletes write their tombstones and return their stock in one go;
+        # the per-row post_delete handler skips deletes from a queryset.
+        # restaurant.inventory imports this module, hence the local import.
+        from .inventory import RELEASABLE_STATUSES, release_orders
+
+        with transaction.atomic():
+            gone = list(self.values_list("pk", "customer_id", "status"))
+            result = super().delete()
+            now = timezone.now()
+            DeletedOrder.objects.bulk_create(
+                [DeletedOrder(order_id=pk, customer_id=customer_id, deleted_at=now) for pk, customer_id, _ in gone],
+                update_conflicts=True,
+                unique_fields=["order_id"],
+                update_fields=["customer", "deleted_at"],
+            )
+            release_orders([pk for pk, _, status in gone if status in RELEASABLE_STATUSES])
+        return result
 
 
 class Order(models.Model):
@@ -71,6 +156,7 @@ class Order(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True)
     table = models.ForeignKey(Table, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     estimated_time = models.DateTimeField(null=True, blank=True)
 
     STATUS = [
@@ -84,8 +170,108 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS, default='PENDING')
     applied_discount = models.ForeignKey(DiscountCode, null=True, blank=True, on_delete=models.SET_NULL)
 
+    # Denormalized from the order's lines; kept current by recalculate_totals().
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    # Chef-minutes of work in this order (sum of quantity * prep_minutes).
+    prep_minutes = models.PositiveIntegerField(default=0)
+
+    KITCHEN_STATUSES = ("PENDING", "PREPARING")
+
+    # Allowed status moves; anything not listed here is rejected.
+    TRANSITIONS = {
+        "PENDING": {"PREPARING", "CANCELLED"},
+        "PREPARING": {"READY", "CANCELLED"},
+        "READY": {"SERVED"},
+        "SERVED": {"PAID"},
+        "PAID": set(),
+        "CANCELLED": set(),
+    }
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="order_status_created_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        self._apply_discount()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = {*update_fields, "updated_at"}
+            if "applied_discount" in update_fields:
+                update_fields |= {"discount", "total"}
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def can_transition(cls, current: str, new: str) -> bool:
+        return new in cls.TRANSITIONS.get(current, ())
+
+    def transition_to(self, new_status: str) -> bool:
+        """Move to ``new_status`` only if the row still has our status.
+
+        Runs a single ``UPDATE ... WHERE status = <current>`` touching just
+        status/updated_at. Returns False when another request changed the
+        status first, leaving this instance untouched.
+        """
+        now = timezone.now()
+        updated = Order.objects.filter(pk=self.pk, status=self.status).update(
+            status=new_status, updated_at=now
+        )
+        if updated:
+            self.status = new_status
+            self.updated_at = now
+        return bool(updated)
+
+    @staticmethod
+    def discount_for(subtotal, percent_off) -> Decimal:
+        return (Decimal(subtotal) * (percent_off or 0) / 100).quantize(Decimal("0.01"))
+
+    def _apply_discount(self):
+        percent = self.applied_discount.percent_off if self.applied_discount_id else 0
+        self.discount = self.discount_for(self.subtotal, percent)
+        self.total = Decimal(self.subtotal) - self.discount
+
+    def recalculate_totals(self):
+        """Re-sum this order's lines in SQL and store subtotal/discount/total."""
+        subtotal = self.items.aggregate(
+            value=Sum(F("quantity") * F("menu_item__price"))
+        )["value"]
+        self.subtotal = subtotal or Decimal("0")
+        self._apply_discount()
+        self.updated_at = timezone.now()
+        Order.objects.filter(pk=self.pk).update(
+            subtotal=self.subtotal,
+            discount=self.discount,
+            total=self.total,
+            updated_at=self.updated_at,
+        )
+
     def calculate_total(self):
-        return sum(item.line_total() for item in self.items.all())
+        return self.total
+
+
+class DeletedOrder(models.Model):
+    """Tombstone left behind when an order is deleted, for delta sync clients."""
+
+    order_id = models.UUIDField(primary_key=True)
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True)
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+class KitchenState(models.Model):
+    """Single-row running total of outstanding kitchen work.
+
+    Maintained incrementally by restaurant.kitchen as orders enter and leave
+    PENDING/PREPARING, so estimating a new order never rescans the backlog.
+    """
+
+    backlog_minutes = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
 
 class OrderItem(models.Model):
@@ -99,6 +285,11 @@ class OrderItem(models.Model):
 
 
 class Invoice(models.Model):
+    """Bill for a SERVED/PAID order, issued by restaurant.billing."""
+
+    UNPAID = "UNPAID"
+    PAID = "PAID"
+
     invoice_id = models.UUIDField(primary_key=True, default=uuid.uuid4)
     order = models.OneToOneField(Order, on_delete=models.CASCADE)
     customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True)
@@ -113,3 +304,75 @@ class Payment(models.Model):
     status = models.CharField(max_length=20)
     transaction_id = models.CharField(max_length=200, null=True)
 
+
+
+class IdempotencyKey(models.Model):
+    """Stored outcome of a create request sent with an ``Idempotency-Key``."""
+
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    scope = models.CharField(max_length=50)
+    request_hash = models.CharField(max_length=64)
+    # Null while the first request is still being processed.
+    response_status = models.PositiveSmallIntegerField(null=True)
+    response_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "scope", "key"], name="idempotency_key_unique"
+            ),
+        ]
+
+
+class ArchivedOrder(models.Model):
+    """Closed order moved out of the hot ``Order`` table by restaurant.archive."""
+
+    order_id = models.UUIDField(primary_key=True)
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True)
+    table = models.ForeignKey(Table, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    estimated_time = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=Order.STATUS)
+    applied_discount = models.ForeignKey(DiscountCode, null=True, blank=True, on_delete=models.SET_NULL)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+    discount = models.DecimalField(max_digits=10, decimal_places=2)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    prep_minutes = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="archorder_status_created_idx"),
+            models.Index(fields=["customer", "created_at"], name="archorder_customer_created_idx"),
+        ]
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, related_name="items", on_delete=models.CASCADE)
+    # Menu items may be retired later, so the line keeps its own name/price.
+    menu_item = models.ForeignKey(MenuItem, null=True, on_delete=models.SET_NULL)
+    name = models.CharField(max_length=150)
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    quantity = models.IntegerField(default=1)
+    note = models.TextField(blank=True)
+
+
+class ArchivedInvoice(models.Model):
+    invoice_id = models.UUIDField(primary_key=True)
+    order = models.OneToOneField(ArchivedOrder, related_name="invoice", on_delete=models.CASCADE)
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20)
+    date = models.DateTimeField()
+
+
+class ArchivedPayment(models.Model):
+    payment_id = models.UUIDField(primary_key=True)
+    invoice = models.OneToOneField(ArchivedInvoice, related_name="payment", on_delete=models.CASCADE)
+    status = models.CharField(max_length=20)
+    transaction_id = models.CharField(max_length=200, null=True)
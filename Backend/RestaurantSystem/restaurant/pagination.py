@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import base64
+import json
+from functools import reduce
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination that seeks on the full ordering tuple.
+
+    DRF's ``CursorPagination`` only keys on the first ordering field and
+    falls back to OFFSET for ties. Here the cursor carries the value of every
+    ordering field (the last one must be unique, usually ``pk``), so each page
+    is a plain ``WHERE (a, b) < (x, y) ORDER BY a, b LIMIT n`` no matter how
+    deep the client has scrolled.
+
+    Total counts cost a full scan, so they are only included with ``?count=true``.
+    """
+
+    ordering: tuple[str, ...] = ("-created_at", "-pk")
+    page_size = getattr(settings, "PAGINATION_PAGE_SIZE", 50)
+    page_size_query_param = "page_size"
+    max_page_size = getattr(settings, "PAGINATION_MAX_PAGE_SIZE", 200)
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        self.count = None
+        if str(request.query_params.get(self.count_query_param, "")).lower() in {"1", "true"}:
+            self.count = queryset.count()
+
+        position, reverse = self.decode_cursor(request)
+        ordering = self._reversed(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek_filter(ordering, position))
+
+        # Fetch one extra row to learn whether another page follows.
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_paginated_response(self, data):
+        payload = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+        if self.count is not None:
+            payload = {"count": self.count, **payload}
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer"},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[0]), reverse=True)
+
+    def encode_cursor(self, position, reverse):
+        raw = json.dumps({"p": position, "r": int(reverse)}, separators=(",", ":"))
+        token = base64.urlsafe_b64encode(raw.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            position = data["p"]
+            reverse = bool(data.get("r"))
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def _position(self, instance):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            if isinstance(instance, dict):
+                # A .values() row (restaurant.fastpath) keyed by the lookup.
+                value = instance[name]
+            else:
+                value = reduce(getattr, name.split("__"), instance)
+            values.append(value.isoformat() if hasattr(value, "isoformat") else str(value))
+        return values
+
+    @staticmethod
+    def _reversed(ordering):
+        return tuple(f[1:] if f.startswith("-") else f"-{f}" for f in ordering)
+
+    @staticmethod
+    def _seek_filter(ordering, position):
+        """Build ``(a, b, c) > (x, y, z)`` as nested OR/AND for any direction mix."""
+        condition = Q()
+        for index in reversed(range(len(ordering))):
+            field = ordering[index]
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            step = Q(**{f"{name}__{lookup}": position[index]})
+            if index < len(ordering) - 1:
+                step |= Q(**{name: position[index]}) & condition
+            condition = step
+        return condition
+
+
+class OrderItemPagination(KeysetPagination):
+    ordering = ("-order__created_at", "-pk")
+
+
+class InvoicePagination(KeysetPagination):
+    ordering = ("-date", "-pk")
+
+
+class PaymentPagination(KeysetPagination):
+    ordering = ("-invoice__date", "-pk")
+
+
+class InventoryMovementPagination(KeysetPagination):
+    ordering = ("-created_at", "-pk")
@@ -0,0 +1,157 @@
+"""Full-text search over the menu.
+
+The index lives next to ``restaurant_menuitem`` in a backend-specific table:
+
+* SQLite: ``restaurant_menuitem_fts``, an FTS5 table ranked with ``bm25``.
+  Its rows are keyed by rowid; ``restaurant_menuitem_fts_ids`` maps each
+  menu item to its rowid, so reindexing an item never scans the index;
+* PostgreSQL: ``restaurant_menuitem_search``, a weighted ``tsvector`` column
+  with a GIN index, ranked with ``ts_rank``.
+
+Both are created by migrations 0012/0015 and kept in step with MenuItem/Category
+writes by ``restaurant.signals``. Every query term is matched as a prefix, so
+"bur ch" finds "Cheese Burger". Other backends fall back to ``icontains``.
+"""
+
+from __future__ import annotations
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import MenuItem
+
+
+SQLITE_TABLE = "restaurant_menuitem_fts"
+SQLITE_IDS_TABLE = "restaurant_menuitem_fts_ids"
+POSTGRES_TABLE = "restaurant_menuitem_search"
+MAX_TERMS = 8
+# bm25 column weights: name, description, category.
+SQLITE_WEIGHTS = (10.0, 1.0, 4.0)
+
+SQLITE_INDEX_SQL = f"""
+    INSERT INTO {SQLITE_TABLE} (rowid, name, description, category)
+    SELECT i.docid, m.name, m.description, COALESCE(c.name, '')
+    FROM restaurant_menuitem m
+    JOIN {SQLITE_IDS_TABLE} i ON i.item_id = m.item_id
+    LEFT JOIN restaurant_category c ON c.id = m.category_id
+"""
+SQLITE_DOCIDS_SQL = f"SELECT docid FROM {SQLITE_IDS_TABLE} WHERE item_id IN ({{}})"
+POSTGRES_INDEX_SQL = f"""
+    INSERT INTO {POSTGRES_TABLE} (item_id, document)
+    SELECT m.item_id,
+           setweight(to_tsvector('simple', m.name), 'A')
+           || setweight(to_tsvector('simple', COALESCE(c.name, '')), 'B')
+           || setweight(to_tsvector('simple', m.description), 'C')
+    FROM restaurant_menuitem m LEFT JOIN restaurant_category c ON c.id = m.category_id
+"""
+
+
+def _db_ids(ids) -> list:
+    pk = MenuItem._meta.pk
+    return [pk.get_db_prep_value(pk.to_python(value), connection) for value in ids]
+
+
+def _in_clause(ids) -> str:
+    return ", ".join(["%s"] * len(ids))
+
+
+def index_items(ids) -> None:
+    """(Re)index the given menu items from their current rows."""
+    ids = _db_ids(ids)
+    if not ids:
+        return
+    where = f" WHERE m.item_id IN ({_in_clause(ids)})"
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"INSERT OR IGNORE INTO {SQLITE_IDS_TABLE} (item_id) VALUES "
+                + ", ".join(["(%s)"] * len(ids)),
+                ids,
+            )
+            cursor.execute(
+                f"DELETE FROM {SQLITE_TABLE} WHERE rowid IN ("
+                + SQLITE_DOCIDS_SQL.format(_in_clause(ids)) + ")",
+                ids,
+            )
+            cursor.execute(SQLITE_INDEX_SQL + where, ids)
+        elif connection.vendor == "postgresql":
+            cursor.execute(
+                POSTGRES_INDEX_SQL + where
+                + " ON CONFLICT (item_id) DO UPDATE SET document = EXCLUDED.document",
+                ids,
+            )
+
+
+def remove_items(ids) -> None:
+    ids = _db_ids(ids)
+    if not ids:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"DELETE FROM {SQLITE_TABLE} WHERE rowid IN ("
+                + SQLITE_DOCIDS_SQL.format(_in_clause(ids)) + ")",
+                ids,
+            )
+            cursor.execute(
+                f"DELETE FROM {SQLITE_IDS_TABLE} WHERE item_id IN ({_in_clause(ids)})", ids
+            )
+        elif connection.vendor == "postgresql":
+            cursor.execute(
+                f"DELETE FROM {POSTGRES_TABLE} WHERE item_id IN ({_in_clause(ids)})", ids
+            )
+
+
+def rebuild_index() -> None:
+    """Drop and refill the whole index (repairs drift after raw SQL edits)."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE}")
+            cursor.execute(f"DELETE FROM {SQLITE_IDS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {SQLITE_IDS_TABLE} (item_id) SELECT item_id FROM restaurant_menuitem"
+            )
+            cursor.execute(SQLITE_INDEX_SQL)
+        elif connection.vendor == "postgresql":
+            cursor.execute(f"TRUNCATE {POSTGRES_TABLE}")
+            cursor.execute(POSTGRES_INDEX_SQL)
+
+
+def search_menu_items(query: str, limit: int) -> list:
+    """Primary keys of the best ``limit`` matches for ``query``, best first.
+
+    Unavailable items match too, as they are listed on the menu; callers
+    that only want orderable items filter on ``available``.
+    """
+    terms = re.findall(r"\w+", query.lower())[:MAX_TERMS]
+    if not terms:
+        return []
+
+    if connection.vendor == "sqlite":
+        sql = (
+            f"SELECT i.item_id FROM {SQLITE_TABLE} JOIN {SQLITE_IDS_TABLE} i "
+            f"ON i.docid = {SQLITE_TABLE}.rowid WHERE {SQLITE_TABLE} MATCH %s "
+            f"ORDER BY bm25({SQLITE_TABLE}, {', '.join(map(str, SQLITE_WEIGHTS))}) LIMIT %s"
+        )
+        params = [" ".join(f'"{term}"*' for term in terms), limit]
+    elif connection.vendor == "postgresql":
+        sql = (
+            f"SELECT item_id FROM {POSTGRES_TABLE}, to_tsquery('simple', %s) query "
+            "WHERE document @@ query ORDER BY ts_rank(document, query) DESC LIMIT %s"
+        )
+        params = [" & ".join(f"{term}:*" for term in terms), limit]
+    else:
+        matches = Q()
+        for term in terms:
+            matches &= (
+                Q(name__icontains=term)
+                | Q(description__icontains=term)
+                | Q(category__name__icontains=term)
+            )
+        return list(MenuItem.objects.filter(matches).values_list("pk", flat=True)[:limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [MenuItem._meta.pk.to_python(row[0]) for row in cursor.fetchall()]
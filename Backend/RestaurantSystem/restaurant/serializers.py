@@ -1,54 +1,96 @@
+from django.db import transaction
 from rest_framework import serializers
+from . import inventory, kitchen
+from .fieldsets import SparseFieldsMixin, collapsed_pk
+from .images import image_src, image_srcset, media_url_builder
 from .models import (
     Table,
     MenuItem,
     InventoryItem,
+    InventoryMovement,
     Order,
     OrderItem,
     Invoice,
     Payment,
-    Category
+    Category,
+    ArchivedOrder,
+    ArchivedOrderItem,
+    ArchivedInvoice,
+    ArchivedPayment,
 )
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ["id", "name"]
 
-class TableSerializer(serializers.ModelSerializer):
+class TableSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Table
         fields = "__all__"
 
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
     category = CategorySerializer(read_only=True)
 
+    expandable_fields = {"category": collapsed_pk()}
+
+    # Columns behind each method field, for the .values() fast path.
+    values_fields = {"image": ("image", "image_variants")}
 
     class Meta:
         model = MenuItem
-        fields = "__all__"
+        exclude = ["image_variants"]
 
     def get_image(self, obj):
-        request = self.context.get("request")
-        if obj.image and request:
-            return request.build_absolute_uri(obj.image.url)
-        if obj.image:
-            return obj.image.url
-        return None
+        return self.represent_image(obj.image.name, obj.image_variants)
+
+    def represent_image(self, name, variants):
+        """``{"src": url, "srcset": {format: srcset}}`` or None.
+
+        Until the derivatives have been built ``src`` is the original and
+        ``srcset`` is empty; then ``src`` is the mid-size fallback copy.
+        """
+        if not name:
+            return None
+        if not hasattr(self, "_media_url"):
+            self._media_url = media_url_builder(self.context.get("request"))
+        return {
+            "src": image_src(name, variants, self._media_url),
+            "srcset": image_srcset(name, variants, self._media_url),
+        }
 
 
 
-class InventoryItemSerializer(serializers.ModelSerializer):
+class InventoryItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = InventoryItem
         fields = "__all__"
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class InventoryMovementSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = InventoryMovement
+        fields = "__all__"
+
+
+class StockAdjustmentSerializer(serializers.Serializer):
+    item = serializers.PrimaryKeyRelatedField(queryset=MenuItem.objects.all())
+    quantity = serializers.IntegerField(min_value=1)
+    reason = serializers.ChoiceField(choices=[InventoryMovement.RESTOCK, InventoryMovement.WASTE])
+    note = serializers.CharField(max_length=255, required=False, allow_blank=True, default="")
+
+
+class StockAdjustmentsSerializer(serializers.Serializer):
+    entries = StockAdjustmentSerializer(many=True)
+
+
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     menu_item_detail = MenuItemSerializer(source="menu_item", read_only=True)
 
+    expandable_fields = {"menu_item_detail": None}
+
     class Meta:
         model = OrderItem
         fields = [
@@ -59,7 +101,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
             "note",
         ]
 
-class OrderDetailItemSerializer(serializers.ModelSerializer):
+class OrderDetailItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     name = serializers.CharField(source="menu_item.name")
     price = serializers.DecimalField(
         source="menu_item.price",
@@ -71,7 +113,7 @@ class OrderDetailItemSerializer(serializers.ModelSerializer):
         model = OrderItem
         fields = ["name", "quantity", "price"]
 
-class OrderDetailSerializer(serializers.ModelSerializer):
+class OrderDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderDetailItemSerializer(many=True)
     total_price = serializers.SerializerMethodField()
 
@@ -87,14 +129,16 @@ class OrderDetailSerializer(serializers.ModelSerializer):
         ]
 
     def get_total_price(self, obj):
-        return obj.calculate_total()
+        return obj.total
 
 
 
-class OrderItemCreateSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = OrderItem
-        fields = ["menu_item", "quantity", "note"]
+class OrderItemCreateSerializer(serializers.Serializer):
+    # Plain UUIDs here; OrderCreateSerializer.validate_items resolves all
+    # menu items at once instead of one PrimaryKeyRelatedField lookup per line.
+    menu_item = serializers.UUIDField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
+    note = serializers.CharField(allow_blank=True, required=False, default="")
 
 
 class OrderCreateSerializer(serializers.ModelSerializer):
@@ -116,20 +160,55 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         read_only_fields = ["order_id", "created_at", "estimated_time", "status"]
 
     def get_total_price(self, obj):
-        return obj.calculate_total()
+        return obj.total
+
+    def validate_items(self, items):
+        ids = {item["menu_item"] for item in items}
+        menu_items = MenuItem.objects.in_bulk(ids)
+
+        missing = sorted(str(pk) for pk in ids - menu_items.keys())
+        if missing:
+            raise serializers.ValidationError(f"Unknown menu item(s): {', '.join(missing)}")
+
+        unavailable = sorted(m.name for m in menu_items.values() if not m.available)
+        if unavailable:
+            raise serializers.ValidationError(f"Currently unavailable: {', '.join(unavailable)}")
+
+        for item in items:
+            item["menu_item"] = menu_items[item["menu_item"]]
+        return items
 
     def create(self, validated_data):
         items_data = validated_data.pop("items", [])
-        order = Order.objects.create(**validated_data)
+        # Prices are already loaded by validate_items, so the totals can be
+        # written with the order row instead of re-aggregated afterwards.
+        subtotal = sum(item["quantity"] * item["menu_item"].price for item in items_data)
+        prep_minutes = kitchen.order_work_minutes(items_data)
+
+        amounts: dict = {}
         for item in items_data:
-            OrderItem.objects.create(order=order, **item)
+            pk = item["menu_item"].pk
+            amounts[pk] = amounts.get(pk, 0) + item["quantity"]
+
+        with transaction.atomic():
+            order = Order.objects.create(
+                subtotal=subtotal, prep_minutes=prep_minutes, **validated_data
+            )
+            inventory.reserve(amounts, order.pk)
+            OrderItem.objects.bulk_create(
+                [OrderItem(order=order, **item) for item in items_data]
+            )
+            kitchen.order_created(order)
         return order
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     total_price = serializers.SerializerMethodField()
 
+    expandable_fields = {"items": collapsed_pk(many=True)}
+    values_fields = {"total_price": ("total",)}
+
     class Meta:
         model = Order
         fields = [
@@ -141,16 +220,36 @@ class OrderSerializer(serializers.ModelSerializer):
             "estimated_time",
             "applied_discount",
             "items",
+            "subtotal",
+            "discount",
             "total_price",
         ]
-        read_only_fields = ["order_id", "created_at"]
+        read_only_fields = ["order_id", "created_at", "subtotal", "discount"]
 
     def get_total_price(self, obj):
-        return obj.calculate_total()
+        return obj.total
+
+    def update(self, instance, validated_data):
+        # Only write the columns that were sent; status changes go through
+        # Order.transition_to so a stale instance never overwrites them.
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        if validated_data:
+            instance.save(update_fields=list(validated_data))
+        return instance
+
+class BulkStatusSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(
+        child=serializers.UUIDField(), allow_empty=False, max_length=500
+    )
+    status = serializers.ChoiceField(choices=Order.STATUS)
 
-class InvoiceSerializer(serializers.ModelSerializer):
+
+class InvoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     order_detail = OrderSerializer(source="order", read_only=True)
 
+    expandable_fields = {"order_detail": None}
+
     class Meta:
         model = Invoice
         fields = [
@@ -165,9 +264,21 @@ class InvoiceSerializer(serializers.ModelSerializer):
         read_only_fields = ["invoice_id", "date", "amount"]
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class InvoiceReissueSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+
+    def validate(self, attrs):
+        if attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError({"end": "Must not be before start."})
+        return attrs
+
+
+class PaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     invoice_detail = InvoiceSerializer(source="invoice", read_only=True)
 
+    expandable_fields = {"invoice_detail": None}
+
     class Meta:
         model = Payment
         fields = [
@@ -179,3 +290,53 @@ class PaymentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["payment_id"]
 
+
+
+class ArchivedOrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedOrderItem
+        fields = ["id", "menu_item", "name", "price", "quantity", "note"]
+
+
+class ArchivedPaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedPayment
+        fields = ["payment_id", "status", "transaction_id"]
+
+
+class ArchivedInvoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    payment = ArchivedPaymentSerializer(read_only=True, default=None)
+
+    expandable_fields = {"payment": collapsed_pk()}
+
+    class Meta:
+        model = ArchivedInvoice
+        fields = ["invoice_id", "customer", "amount", "status", "date", "payment"]
+
+
+class ArchivedOrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    items = ArchivedOrderItemSerializer(many=True, read_only=True)
+    invoice = ArchivedInvoiceSerializer(read_only=True, default=None)
+    total_price = serializers.DecimalField(
+        source="total", max_digits=10, decimal_places=2, coerce_to_string=False, read_only=True
+    )
+
+    expandable_fields = {"items": collapsed_pk(many=True), "invoice": collapsed_pk()}
+
+    class Meta:
+        model = ArchivedOrder
+        fields = [
+            "order_id",
+            "customer",
+            "table",
+            "status",
+            "created_at",
+            "estimated_time",
+            "applied_discount",
+            "items",
+            "subtotal",
+            "discount",
+            "total_price",
+            "invoice",
+            "archived_at",
+        ]
@@ -0,0 +1,116 @@
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import Chef
+
+from . import billing, images, inventory, kitchen, search
+from .catalog import bump_catalog_version
+from .models import Category, DeletedOrder, InventoryItem, MenuItem, Order, OrderItem
+from .snapshots import schedule_publish
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def refresh_order_totals(sender, instance, **kwargs):
+    """Keep Order.subtotal/discount/total in step with its lines."""
+    origin = kwargs.get("origin")
+    if isinstance(origin, Order) or (isinstance(origin, QuerySet) and origin.model is Order):
+        # The order itself is being deleted; there is nothing left to update.
+        return
+
+    order = Order.objects.select_related("applied_discount").filter(pk=instance.order_id).first()
+    if order is not None:
+        order.recalculate_totals()
+        kitchen.refresh_order_work(order)
+        if order.status in billing.BILLED_STATUSES:
+            billing.issue_invoices([order.pk])
+
+
+@receiver(post_delete, sender=Order)
+def record_deleted_order(sender, instance, **kwargs):
+    kitchen.order_removed(instance)
+    if isinstance(kwargs.get("origin"), QuerySet):
+        # OrderQuerySet.delete() records the whole batch at once.
+        return
+    if instance.status in inventory.RELEASABLE_STATUSES:
+        inventory.release_orders([instance.pk])
+    DeletedOrder.objects.update_or_create(
+        order_id=instance.pk,
+        defaults={"customer_id": instance.customer_id, "deleted_at": timezone.now()},
+    )
+
+
+@receiver(post_save, sender=Chef)
+@receiver(post_delete, sender=Chef)
+def recount_chefs(sender, **kwargs):
+    kitchen.forget_active_chefs()
+
+
+@receiver(post_save, sender=get_user_model())
+def recount_chefs_on_deactivation(sender, update_fields=None, **kwargs):
+    # Logins only touch last_login; anything else may flip is_active.
+    if update_fields is None or "is_active" in update_fields:
+        kitchen.forget_active_chefs()
+
+
+@receiver(post_save, sender=MenuItem)
+def index_menu_item(sender, instance, **kwargs):
+    search.index_items([instance.pk])
+
+
+@receiver(post_delete, sender=MenuItem)
+def unindex_menu_item(sender, instance, **kwargs):
+    search.remove_items([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_items(sender, instance, created, **kwargs):
+    if not created:
+        search.index_items(instance.items.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_items(sender, instance, **kwargs):
+    # SET_NULL detaches the items with an UPDATE, so collect them first.
+    instance._search_item_ids = list(instance.items.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def reindex_detached_items(sender, instance, **kwargs):
+    search.index_items(getattr(instance, "_search_item_ids", []))
+
+
+@receiver(pre_save, sender=InventoryItem)
+def remember_stock_level(sender, instance, **kwargs):
+    # Saving a row directly is a stocktake: log the difference it makes.
+    instance._previous_quantity = (
+        InventoryItem.objects.filter(item_id=instance.item_id).values_list("quantity", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=InventoryItem)
+def sync_menu_availability(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_quantity", None)
+    inventory.record_stocktakes({instance.item_id: instance.quantity}, {instance.item_id: previous or 0})
+    inventory.sync_availability([instance.item_id])
+
+
+@receiver(post_save, sender=MenuItem)
+def queue_image_variants(sender, instance, **kwargs):
+    if instance.image and instance.image_variants.get("source") != instance.image.name:
+        images.schedule_variants(instance)
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_delete, sender=InventoryItem)
+def invalidate_catalog(sender, **kwargs):
+    # Registered in this order so the snapshot is written under the new version.
+    bump_catalog_version()
+    schedule_publish()
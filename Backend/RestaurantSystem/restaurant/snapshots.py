@@ -0,0 +1,171 @@
+"""Static menu snapshots for the front proxy.
+
+``publish_menu`` renders the available menu, grouped by category, to JSON
+files under ``MEDIA_ROOT/<MENU_SNAPSHOT_DIR>``:
+
+* ``menu-<version>.json`` – immutable, named after the catalog version, so
+  it can be served with a far-future cache lifetime;
+* ``menu.json`` – always the latest snapshot, for clients that don't know the
+  version yet (serve it with ``no-cache``).
+
+Each file has a ``.gz`` sibling for ``gzip_static``-style serving. Every file
+is written to a temporary name in the same directory and renamed into place,
+so the proxy never sees a half-written file. Snapshots are republished after
+every committed catalog edit (see ``restaurant.signals``) and can be rebuilt
+by hand with ``manage.py publish_menu``.
+
+Republishing runs on a single background thread, never in the request that
+made the edit: an order that sells an item out shouldn't wait for the whole
+menu to be rendered and fsync'd. Edits are coalesced, so a burst of commits
+queues at most one more publish behind the one in progress, and that one
+renders the latest state.
+"""
+
+from __future__ import annotations
+
+import gzip
+import logging
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .catalog import catalog_version, on_commit_once
+from .fastpath import get_plan
+from .fieldsets import Fieldsets
+from .models import Category, MenuItem
+from .serializers import CategorySerializer, MenuItemSerializer
+
+
+logger = logging.getLogger(__name__)
+
+LATEST_NAME = "menu.json"
+VERSIONED_NAME = re.compile(r"^menu-(\d+)\.json$")
+
+
+def snapshot_dir() -> Path:
+    return Path(settings.MEDIA_ROOT) / getattr(settings, "MENU_SNAPSHOT_DIR", "menu")
+
+
+def build_menu() -> dict:
+    items = MenuItem.objects.filter(available=True).select_related("category").order_by("name")
+    fieldsets = Fieldsets(expand=frozenset({("category",)}))
+    plan = get_plan(MenuItemSerializer, fieldsets)
+    if plan:
+        rendered = plan.render(plan.values(items))
+    else:
+        rendered = MenuItemSerializer(items, many=True, context={"fieldsets": fieldsets}).data
+
+    by_category: dict[int | None, list] = {}
+    for item in rendered:
+        category = item["category"]
+        by_category.setdefault(category["id"] if category else None, []).append(item)
+
+    categories = [
+        {**CategorySerializer(category).data, "items": by_category[category.pk]}
+        for category in Category.objects.order_by("name")
+        if category.pk in by_category
+    ]
+    return {
+        "version": catalog_version(),
+        "generated_at": timezone.now(),
+        "categories": categories,
+        "uncategorized": by_category.get(None, []),
+    }
+
+
+def _write_atomic(path: Path, content: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600; the proxy usually runs as another user.
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _write_with_gzip(path: Path, body: bytes) -> None:
+    _write_atomic(path, body)
+    _write_atomic(path.with_name(path.name + ".gz"), gzip.compress(body, mtime=0))
+
+
+def _prune(directory: Path, keep: int) -> None:
+    versions = sorted(
+        (int(m.group(1)) for m in map(VERSIONED_NAME.match, os.listdir(directory)) if m),
+        reverse=True,
+    )
+    for version in versions[keep:]:
+        for name in (f"menu-{version}.json", f"menu-{version}.json.gz"):
+            try:
+                (directory / name).unlink()
+            except FileNotFoundError:
+                pass
+
+
+def publish_menu() -> Path:
+    """Write the current menu snapshot and return the versioned file's path."""
+    directory = snapshot_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    menu = build_menu()
+    body = JSONRenderer().render(menu)
+    versioned = directory / f"menu-{menu['version']}.json"
+    _write_with_gzip(versioned, body)
+    _write_with_gzip(directory / LATEST_NAME, body)
+
+    _prune(directory, getattr(settings, "MENU_SNAPSHOT_KEEP", 5))
+    return versioned
+
+
+@lru_cache(maxsize=None)
+def _executor() -> ThreadPoolExecutor:
+    # One worker: publishes must not race each other to rename the files.
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="menu-snapshot")
+
+
+_queue_lock = threading.Lock()
+_queued = False
+
+
+def _publish_on_commit() -> None:
+    global _queued
+    with _queue_lock:
+        if _queued:
+            # A publish that hasn't started yet will pick this edit up too.
+            return
+        _queued = True
+    _executor().submit(_publish_in_worker)
+
+
+def _publish_in_worker() -> None:
+    global _queued
+    with _queue_lock:
+        # Edits committed from here on need a publish after this one.
+        _queued = False
+    close_old_connections()
+    try:
+        publish_menu()
+    except Exception:
+        logger.exception("Publishing the menu snapshot failed")
+    finally:
+        close_old_connections()
+
+
+def schedule_publish() -> None:
+    """Republish the snapshot in the background once the current transaction commits."""
+    if getattr(settings, "MENU_AUTO_PUBLISH", True):
+        on_commit_once(_publish_on_commit)
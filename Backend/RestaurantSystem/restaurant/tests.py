@@ -1,3 +1,1873 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+    skipUnlessDBFeature,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+from rest_framework.exceptions import ValidationError as DRFValidationError
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import Chef, Customer, Manager
+
+from . import billing, catalog, events, forecast, idempotency, images, inventory, kitchen, snapshots
+from .archive import archive_orders, purge_tombstones
+from .models import (
+    ArchivedOrder,
+    Category,
+    DeletedOrder,
+    DiscountCode,
+    IdempotencyKey,
+    InventoryItem,
+    InventoryMovement,
+    InventorySnapshot,
+    Invoice,
+    KitchenState,
+    MenuItem,
+    Order,
+    OrderItem,
+    Payment,
+)
+from .pagination import KeysetPagination
+from .permissions import get_user_role
+from .search import search_menu_items
+from .views import _stream_channels
+
+
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "default"},
+    "menu": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "menu"},
+}
+
+
+def make_user(username, profile=None):
+    user = get_user_model().objects.create_user(username=username, password="x")
+    if profile is not None:
+        profile.objects.create(user=user)
+    return user
+
+
+def api_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    # The role lookup is cached on the user; keep it out of the query counts.
+    get_user_role(user)
+    return client
+
+
+class IsolatedStorageMixin:
+    """Keeps the menu cache and published files out of the working tree.
+
+    Background snapshot publishing is off; SnapshotTests turn it back on.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        media = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media, ignore_errors=True)
+        cls.enterClassContext(
+            override_settings(MEDIA_ROOT=media, CACHES=TEST_CACHES, MENU_AUTO_PUBLISH=False)
+        )
+        super().setUpClass()
+
+    def setUp(self):
+        super().setUp()
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+
+
+class RestaurantTestCase(IsolatedStorageMixin, TestCase):
+    pass
+
+
+class QueryCountTests(RestaurantTestCase):
+    """Order, invoice and payment endpoints don't query per row.
+
+    Each check counts the queries for a single order, then asserts that the
+    same request over several orders, each with several lines, issues exactly
+    as many.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("manager", Manager)
+        cls.menu_items = [
+            MenuItem.objects.create(name=f"Dish {i}", description="", price=Decimal("5.00"))
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.user)
+
+    def add_order(self):
+        order = Order.objects.create(status="SERVED", subtotal=Decimal("15.00"), total=Decimal("15.00"))
+        OrderItem.objects.bulk_create(
+            [OrderItem(order=order, menu_item=menu_item, quantity=1) for menu_item in self.menu_items]
+        )
+        invoice = Invoice.objects.create(order=order, amount=order.total, status=Invoice.UNPAID)
+        Payment.objects.create(invoice=invoice, status="PENDING", transaction_id=str(order.pk))
+        return order
+
+    def assertConstantQueries(self, url, params=None):
+        self.add_order()
+        with CaptureQueriesContext(connection) as baseline:
+            self.assertEqual(self.client.get(url, params).status_code, 200)
+        for _ in range(4):
+            self.add_order()
+        with self.assertNumQueries(len(baseline)):
+            self.assertEqual(self.client.get(url, params).status_code, 200)
+
+    def test_order_list(self):
+        self.assertConstantQueries("/api/orders/")
+
+    def test_order_list_expanded(self):
+        self.assertConstantQueries("/api/orders/", {"expand": "items.menu_item_detail"})
+
+    def test_order_detail(self):
+        order = self.add_order()
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/orders/{order.pk}/", {"expand": "items.*"})
+        self.assertEqual(len(response.data["items"]), 3)
+
+    def test_invoice_list(self):
+        self.assertConstantQueries("/api/invoices/", {"expand": "order_detail.items"})
+
+    def test_invoice_detail(self):
+        invoice = self.add_order().invoice
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/invoices/{invoice.pk}/", {"expand": "order_detail.items"})
+        self.assertEqual(len(response.data["order_detail"]["items"]), 3)
+
+    def test_payment_list(self):
+        self.assertConstantQueries("/api/payments/", {"expand": "invoice_detail.order_detail.items"})
+
+    def test_payment_detail(self):
+        payment = self.add_order().invoice.payment
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                f"/api/payments/{payment.pk}/", {"expand": "invoice_detail.order_detail.items"}
+            )
+        self.assertEqual(len(response.data["invoice_detail"]["order_detail"]["items"]), 3)
+
+
+class OrderSyncTests(RestaurantTestCase):
+    """ETag revalidation, ``?since=`` delta sync and deletion tombstones."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("customer", Customer)
+        cls.customer = cls.user.customer_profile
+        cls.other = make_user("other", Customer).customer_profile
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.user)
+
+    def add_order(self, age=timedelta(0), customer=None):
+        order = Order.objects.create(customer=customer or self.customer)
+        order.updated_at = timezone.now() - age
+        Order.objects.filter(pk=order.pk).update(updated_at=order.updated_at)
+        return order
+
+    def sync(self, since):
+        response = self.client.get("/api/orders/", {"since": since})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_unchanged_page_is_not_modified(self):
+        order = self.add_order()
+        etag = self.client.get("/api/orders/")["ETag"]
+
+        # Only the page's keys are read to answer the revalidation.
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/orders/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        order.transition_to("PREPARING")
+        response = self.client.get("/api/orders/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_new_order_changes_the_etag(self):
+        self.add_order()
+        etag = self.client.get("/api/orders/")["ETag"]
+        self.add_order()
+        self.assertEqual(self.client.get("/api/orders/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_other_customers_orders_do_not_change_the_etag(self):
+        self.add_order()
+        etag = self.client.get("/api/orders/")["ETag"]
+        self.add_order(customer=self.other)
+        self.assertEqual(self.client.get("/api/orders/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_delta_returns_changes_oldest_first(self):
+        old = self.add_order(age=timedelta(hours=2))
+        first = self.add_order(age=timedelta(minutes=5))
+        second = self.add_order(age=timedelta(minutes=1))
+
+        data = self.sync((timezone.now() - timedelta(hours=1)).isoformat())
+        self.assertEqual([o["order_id"] for o in data["results"]], [str(first.pk), str(second.pk)])
+        self.assertNotIn(str(old.pk), [o["order_id"] for o in data["results"]])
+        self.assertFalse(data["has_more"])
+
+        self.assertEqual(self.sync(data["since"])["results"], [])
+
+    def test_delta_resends_changes_younger_than_the_settle_window(self):
+        start = (timezone.now() - timedelta(minutes=1)).isoformat()
+        fresh = self.add_order()
+        data = self.sync(start)
+        self.assertEqual([o["order_id"] for o in data["results"]], [str(fresh.pk)])
+
+        # A transaction that stamped its row earlier but committed later.
+        late = self.add_order(age=timedelta(seconds=5))
+        data = self.sync(data["since"])
+        self.assertEqual(
+            [o["order_id"] for o in data["results"]], [str(late.pk), str(fresh.pk)]
+        )
+
+    def test_delta_pages_through_ties(self):
+        stamp = timezone.now() - timedelta(minutes=5)
+        orders = [self.add_order() for _ in range(5)]
+        Order.objects.update(updated_at=stamp)
+        expected = sorted(str(o.pk) for o in orders)
+
+        seen = []
+        since = (stamp - timedelta(seconds=1)).isoformat()
+        with mock.patch.object(KeysetPagination, "max_page_size", 2):
+            while True:
+                data = self.sync(since)
+                seen += [o["order_id"] for o in data["results"]]
+                since = data["since"]
+                if not data["has_more"]:
+                    break
+        self.assertEqual(seen, expected)
+
+    def test_delta_reports_deleted_orders(self):
+        start = (timezone.now() - timedelta(minutes=1)).isoformat()
+        mine = self.add_order().pk
+        theirs = self.add_order(customer=self.other).pk
+        Order.objects.get(pk=mine).delete()
+        Order.objects.filter(pk=theirs).delete()
+
+        self.assertTrue(DeletedOrder.objects.filter(pk=theirs).exists())
+        self.assertEqual(self.sync(start)["deleted"], [mine])
+
+    def test_delta_refuses_tokens_older_than_the_tombstones(self):
+        since = (timezone.now() - timedelta(days=91)).isoformat()
+        response = self.client.get("/api/orders/", {"since": since})
+        self.assertEqual(response.status_code, 400)
+
+    def test_archive_purges_old_tombstones(self):
+        now = timezone.now()
+        for days in (1, 120):
+            DeletedOrder.objects.create(order_id=Order().pk, deleted_at=now - timedelta(days=days))
+        self.assertEqual(purge_tombstones(), 1)
+        self.assertEqual(DeletedOrder.objects.count(), 1)
+
+
+@override_settings(KITCHEN_ACTIVE_CHEFS=2)
+class KitchenTests(RestaurantTestCase):
+    """Ready-time estimates and the running backlog behind them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("customer", Customer)
+        cls.staff = make_user("manager", Manager)
+        cls.soup = MenuItem.objects.create(name="Soup", description="", price=Decimal("4.00"), prep_minutes=5)
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.user)
+        self.staff_client = api_client(self.staff)
+
+    def place(self, quantity):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/orders/",
+                {"items": [{"menu_item": str(self.soup.pk), "quantity": quantity}]},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        return Order.objects.get(pk=response.data["order_id"])
+
+    def set_status(self, order, new_status):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.staff_client.patch(
+                f"/api/orders/{order.pk}/update_status/", {"status": new_status}, format="json"
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        order.refresh_from_db()
+
+    def assertBacklogInStep(self):
+        queued = Order.objects.filter(status__in=Order.KITCHEN_STATUSES).aggregate(
+            value=Sum("prep_minutes")
+        )["value"] or 0
+        self.assertEqual(kitchen.current_backlog(), queued)
+
+    def assertEta(self, order, minutes):
+        self.assertAlmostEqual(
+            order.estimated_time, timezone.now() + timedelta(minutes=minutes), delta=timedelta(seconds=5)
+        )
+
+    def test_estimate_waits_for_the_queue_ahead(self):
+        first = self.place(3)  # 15 chef-minutes over 2 chefs: 7.5, rounded up
+        self.assertEqual(first.prep_minutes, 15)
+        self.assertEta(first, 8)
+
+        second = self.place(2)  # (15 + 10) / 2 = 12.5
+        self.assertEta(second, 13)
+        self.assertEqual(kitchen.current_backlog(), 25)
+
+    def test_preparing_and_ready_estimates(self):
+        order = self.place(4)
+        self.set_status(order, "PREPARING")
+        self.assertEta(order, 10)
+        self.set_status(order, "READY")
+        self.assertEta(order, 0)
+        self.assertEqual(kitchen.current_backlog(), 0)
+
+    def test_cancel_releases_the_backlog(self):
+        kept = self.place(1)
+        cancelled = self.place(2)
+        self.set_status(cancelled, "CANCELLED")
+        self.assertEqual(kitchen.current_backlog(), kept.prep_minutes)
+        self.assertBacklogInStep()
+
+    def test_delete_releases_the_backlog(self):
+        orders = [self.place(n) for n in (1, 2, 3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            orders[0].delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.filter(pk=orders[1].pk).delete()
+        self.assertEqual(kitchen.current_backlog(), orders[2].prep_minutes)
+        self.assertBacklogInStep()
+
+    def test_editing_lines_moves_the_backlog(self):
+        order = self.place(1)
+        line = order.items.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.staff_client.patch(
+                f"/api/order-items/{line.pk}/", {"quantity": 4}, format="json"
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(kitchen.current_backlog(), 20)
+        self.assertBacklogInStep()
+
+    def test_backlog_is_only_bumped_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(
+                "/api/orders/",
+                {"items": [{"menu_item": str(self.soup.pk), "quantity": 1}]},
+                format="json",
+            )
+        self.assertEqual(KitchenState.objects.get().backlog_minutes, 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(kitchen.current_backlog(), 5)
+
+    def test_missing_state_row_is_rebuilt(self):
+        self.place(2)
+        KitchenState.objects.all().delete()
+        order = self.place(2)  # (10 + 10) / 2
+        self.assertEta(order, 10)
+        self.assertEqual(KitchenState.objects.get().backlog_minutes, 20)
+
+    @override_settings(KITCHEN_ACTIVE_CHEFS=None)
+    def test_chef_count_is_cached_until_chefs_change(self):
+        self.assertEqual(kitchen.active_chefs(), 1)
+        make_user("chef-1", Chef)
+        make_user("chef-2", Chef)
+        self.assertEqual(kitchen.active_chefs(), 2)
+        with self.assertNumQueries(0):
+            kitchen.active_chefs()
+
+        chef = get_user_model().objects.get(username="chef-2")
+        chef.is_active = False
+        chef.save()
+        self.assertEqual(kitchen.active_chefs(), 1)
+
+
+class InventoryTests(RestaurantTestCase):
+    """Stock reservation, release and the availability it drives."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("customer", Customer)
+        cls.staff = make_user("manager", Manager)
+        cls.pie = MenuItem.objects.create(name="Pie", description="", price=Decimal("6.00"))
+        cls.stock = InventoryItem.objects.create(item=cls.pie, quantity=3)
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.user)
+        self.staff_client = api_client(self.staff)
+
+    def place(self, quantity):
+        return self.client.post(
+            "/api/orders/",
+            {"items": [{"menu_item": str(self.pie.pk), "quantity": quantity}]},
+            format="json",
+        )
+
+    def assertStock(self, quantity):
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.quantity, quantity)
+        # The running balance and the ledger agree.
+        self.assertEqual(inventory.stock_levels([self.pie.pk])[self.pie.pk], quantity)
+
+    def test_order_reserves_stock(self):
+        response = self.place(2)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertStock(1)
+        movement = InventoryMovement.objects.get(reason=InventoryMovement.ORDER)
+        self.assertEqual((movement.delta, str(movement.order_id)), (-2, response.data["order_id"]))
+
+    def test_oversell_is_rejected(self):
+        response = self.place(4)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Not enough stock for: Pie", str(response.data))
+        self.assertFalse(Order.objects.exists())
+        self.assertStock(3)
+
+    def test_cancel_releases_the_reservation(self):
+        order_id = self.place(2).data["order_id"]
+        response = self.staff_client.patch(
+            f"/api/orders/{order_id}/update_status/", {"status": "CANCELLED"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertStock(3)
+
+        # Releasing twice puts nothing more back.
+        inventory.release_orders([order_id])
+        self.assertStock(3)
+
+    def test_deleting_a_pending_order_releases_it(self):
+        order_id = self.place(1).data["order_id"]
+        self.assertEqual(self.staff_client.delete(f"/api/orders/{order_id}/").status_code, 204)
+        self.assertStock(3)
+
+    def test_bulk_delete_releases_pending_orders(self):
+        first = self.place(1).data["order_id"]
+        self.place(1)
+        Order.objects.filter(pk=first).update(status="SERVED")
+        Order.objects.all().delete()
+        # The served order's unit was used up; only the pending one returns.
+        self.assertStock(2)
+
+    def test_running_out_disables_the_item_until_restocked(self):
+        order_id = self.place(3).data["order_id"]
+        self.pie.refresh_from_db()
+        self.stock.refresh_from_db()
+        self.assertFalse(self.pie.available)
+        self.assertTrue(self.stock.disabled_by_stock)
+        self.assertEqual(self.place(1).status_code, 400)
+
+        Order.objects.get(pk=order_id).delete()
+        self.pie.refresh_from_db()
+        self.stock.refresh_from_db()
+        self.assertTrue(self.pie.available)
+        self.assertFalse(self.stock.disabled_by_stock)
+
+    def test_restock_keeps_items_switched_off_by_hand(self):
+        MenuItem.objects.filter(pk=self.pie.pk).update(available=False)
+        inventory.adjust([{"item": self.pie.pk, "quantity": 5, "reason": InventoryMovement.RESTOCK}])
+        self.pie.refresh_from_db()
+        self.assertFalse(self.pie.available)
+        self.assertStock(8)
+
+    def test_stock_taken_between_read_and_update_is_not_oversold(self):
+        # Simulate another order committing between the read of the stock
+        # rows and the guarded UPDATE, as a database without row locks allows.
+        per_item = inventory._per_item
+        interleaved = []
+
+        def race(amounts):
+            if not interleaved:
+                interleaved.append(True)
+                inventory.reserve({self.pie.pk: 3})
+            return per_item(amounts)
+
+        with mock.patch.object(inventory, "_per_item", side_effect=race):
+            with self.assertRaises(DRFValidationError):
+                inventory.reserve({self.pie.pk: 1})
+        self.assertStock(0)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentReservationTests(IsolatedStorageMixin, TransactionTestCase):
+    """Two orders racing for the last unit, on a database with row locks."""
+
+    def test_only_one_order_gets_the_last_unit(self):
+        pie = MenuItem.objects.create(name="Pie", description="", price=Decimal("6.00"))
+        InventoryItem.objects.create(item=pie, quantity=1)
+        barrier = threading.Barrier(2)
+        outcomes = []
+
+        def place():
+            try:
+                barrier.wait()
+                with transaction.atomic():
+                    inventory.reserve({pie.pk: 1})
+                outcomes.append("reserved")
+            except DRFValidationError:
+                outcomes.append("short")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=place) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(outcomes), ["reserved", "short"])
+        self.assertEqual(InventoryItem.objects.get(item=pie).quantity, 0)
+
+
+class CatalogCacheTests(RestaurantTestCase):
+    """Conditional requests against the versioned menu cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("customer", Customer)
+        MenuItem.objects.create(name="Soup", description="", price=Decimal("4.00"))
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.user)
+
+    def set_version(self, version):
+        catalog._cache().set(catalog.VERSION_KEY, version, timeout=None)
+
+    def test_echoed_last_modified_is_not_modified(self):
+        self.set_version(catalog._now_ms() - 5000)
+        response = self.client.get("/api/menu-items/")
+        self.assertEqual(response.status_code, 200)
+        last_modified = response["Last-Modified"]
+
+        response = self.client.get("/api/menu-items/", HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        # An edit after that second is over moves the date past the echoed one.
+        self.set_version(catalog._now_ms())
+        response = self.client.get("/api/menu-items/", HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_last_modified_within_the_changing_second(self):
+        now = catalog._now_ms()
+        self.set_version(now)
+        with mock.patch.object(catalog, "_now_ms", return_value=now):
+            response = self.client.get("/api/menu-items/")
+            self.assertNotIn("Last-Modified", response)
+            # Even a date past the version can't vouch for the running second.
+            response = self.client.get(
+                "/api/menu-items/", HTTP_IF_MODIFIED_SINCE=http_date(now // 1000 + 5)
+            )
+            self.assertEqual(response.status_code, 200)
+
+    def test_etag_is_not_modified(self):
+        etag = self.client.get("/api/menu-items/")["ETag"]
+        self.assertEqual(self.client.get("/api/menu-items/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_cached_reads_skip_the_database(self):
+        first = self.client.get("/api/menu-items/")
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/menu-items/")
+        self.assertEqual(second.content, first.content)
+
+    def test_edits_invalidate_once_committed(self):
+        first = self.client.get("/api/menu-items/")
+        soup = MenuItem.objects.get(name="Soup")
+        soup.price = Decimal("4.50")
+        # The test transaction never commits, so the bump queued by
+        # setUpTestData would swallow this one; queue it unconditionally.
+        with mock.patch.object(catalog, "on_commit_once", transaction.on_commit), \
+                self.captureOnCommitCallbacks(execute=True):
+            soup.save()
+            # Still inside the transaction: the old version is served.
+            self.assertEqual(self.client.get("/api/menu-items/").content, first.content)
+        second = self.client.get("/api/menu-items/")
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second.json()[0]["price"], "4.50")
+        self.assertEqual(
+            self.client.get("/api/menu-items/", HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 200
+        )
+
+    def test_payload_is_served_compressed(self):
+        for i in range(5):
+            MenuItem.objects.create(name=f"Dish {i}", description="x" * 50, price=Decimal("1.00"))
+        plain = self.client.get("/api/menu-items/")
+        zipped = self.client.get("/api/menu-items/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(zipped["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(zipped.content), plain.content)
+        self.assertIn("Accept-Encoding", plain["Vary"])
+
+
+class BillingTests(RestaurantTestCase):
+    """Invoices follow the order to SERVED/PAID at the order's stored total."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user("manager", Manager)
+        cls.dish = MenuItem.objects.create(name="Stew", description="", price=Decimal("8.00"))
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.staff)
+        self.order = Order.objects.create(status="READY")
+        OrderItem.objects.create(order=self.order, menu_item=self.dish, quantity=2)
+
+    def move(self, status):
+        response = self.client.patch(
+            f"/api/orders/{self.order.pk}/update_status/", {"status": status}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def invoice(self):
+        return Invoice.objects.get(order=self.order)
+
+    def reissue(self):
+        today = timezone.localdate().isoformat()
+        response = self.client.post(
+            "/api/invoices/reissue/", {"start": today, "end": today}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data["issued"]
+
+    def test_invoice_issued_on_served_and_paid(self):
+        self.move("SERVED")
+        self.assertEqual((self.invoice().amount, self.invoice().status), (Decimal("16.00"), Invoice.UNPAID))
+        self.move("PAID")
+        self.assertEqual((self.invoice().amount, self.invoice().status), (Decimal("16.00"), Invoice.PAID))
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    def test_price_change_does_not_reprice_invoices(self):
+        self.move("SERVED")
+        MenuItem.objects.filter(pk=self.dish.pk).update(price=Decimal("10.00"))
+        self.assertEqual(self.reissue(), 1)
+        self.assertEqual(self.invoice().amount, Decimal("16.00"))
+
+    def test_reissue_picks_up_a_corrected_total(self):
+        self.move("SERVED")
+        Invoice.objects.filter(order=self.order).update(amount=Decimal("1.00"))
+        self.assertEqual(self.reissue(), 1)
+        self.assertEqual(self.invoice().amount, Decimal("16.00"))
+
+    def test_reissue_leaves_paid_invoices_alone(self):
+        self.move("SERVED")
+        self.move("PAID")
+        Order.objects.filter(pk=self.order.pk).update(total=Decimal("99.00"))
+        self.assertEqual(self.reissue(), 0)
+        self.assertEqual(self.invoice().amount, Decimal("16.00"))
+
+
+class FastListTests(RestaurantTestCase):
+    """The .values() fast path renders exactly what the serializers do."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("manager", Manager)
+        customer = make_user("customer", Customer).customer_profile
+        soups = Category.objects.create(name="Soups")
+        discount = DiscountCode.objects.create(
+            code="TEN", percent_off=10, expires_at=timezone.now() + timedelta(days=1)
+        )
+        soup = MenuItem.objects.create(
+            name="Soup", description="Hot", price=Decimal("4.50"), category=soups
+        )
+        bread = MenuItem.objects.create(name="Bread", description="", price=Decimal("1.25"))
+        for status, code in (("PENDING", None), ("SERVED", discount)):
+            order = Order.objects.create(customer=customer, status=status, applied_discount=code)
+            OrderItem.objects.create(order=order, menu_item=soup, quantity=2, note="no salt")
+            OrderItem.objects.create(order=order, menu_item=bread, quantity=1)
+        billing.issue_invoices(Order.objects.values_list("pk", flat=True))
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.user)
+
+    def assertSameAsSerializer(self, url, params=None):
+        responses = []
+        for fast in (True, False):
+            # Drop cached catalog payloads so each path renders its own.
+            for alias in TEST_CACHES:
+                caches[alias].clear()
+            with override_settings(FAST_LIST_SERIALIZATION=fast):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            responses.append(response.content)
+        self.assertEqual(*responses)
+
+    def test_menu_items(self):
+        self.assertSameAsSerializer("/api/menu-items/")
+        self.assertSameAsSerializer("/api/menu-items/", {"expand": "category"})
+
+    def test_orders(self):
+        self.assertSameAsSerializer("/api/orders/")
+        self.assertSameAsSerializer("/api/orders/", {"expand": "items.menu_item_detail"})
+        self.assertSameAsSerializer("/api/orders/", {"expand": "items.*,invoice"})
+
+    def test_order_items(self):
+        self.assertSameAsSerializer("/api/order-items/")
+        self.assertSameAsSerializer("/api/order-items/", {"expand": "menu_item_detail.category"})
+
+    def test_sparse_fieldsets(self):
+        self.assertSameAsSerializer("/api/orders/", {"fields": "order_id,status,items.quantity"})
+
+
+class OrderEventTests(RestaurantTestCase):
+    """Order events reach staff and the owning customer only."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("customer", Customer)
+        cls.chef = make_user("chef", Chef)
+        cls.dish = MenuItem.objects.create(name="Curry", description="", price=Decimal("9.00"))
+
+    def setUp(self):
+        super().setUp()
+        self.broker = mock.Mock()
+        patcher = mock.patch.object(events, "get_broker", return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def published(self):
+        return [(set(call.args[0]), call.args[1]) for call in self.broker.publish.call_args_list]
+
+    def test_events_are_published_on_commit(self):
+        customer_channel = f"customer:{self.user.customer_profile.pk}"
+        with self.captureOnCommitCallbacks(execute=True):
+            response = api_client(self.user).post(
+                "/api/orders/",
+                {"items": [{"menu_item": str(self.dish.pk), "quantity": 1}]},
+                format="json",
+            )
+            self.assertEqual(response.status_code, 201, response.data)
+            self.broker.publish.assert_not_called()
+        order_id = response.data["order_id"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            api_client(self.chef).patch(
+                f"/api/orders/{order_id}/update_status/", {"status": "PREPARING"}, format="json"
+            )
+
+        (created_channels, created), (changed_channels, changed) = self.published()
+        self.assertEqual(created_channels, {*events.STAFF_CHANNELS, customer_channel})
+        self.assertEqual(changed_channels, created_channels)
+        self.assertEqual((created["type"], str(created["order"]["order_id"])), ("order.created", order_id))
+        self.assertEqual((changed["type"], changed["order"]["status"]), ("order.status_changed", "PREPARING"))
+
+    def test_rolled_back_change_is_not_published(self):
+        order = Order.objects.create(status="PENDING")
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                events.publish_order_event("order.created", order, {})
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+        self.broker.publish.assert_not_called()
+
+    def test_stream_channels_are_scoped_by_role(self):
+        factory = RequestFactory()
+
+        def channels(user):
+            token = str(AccessToken.for_user(user))
+            return _stream_channels(factory.get("/api/orders/events/", {"token": token}))
+
+        self.assertEqual(channels(self.chef), ["role:chef"])
+        self.assertEqual(channels(self.user), [f"customer:{self.user.customer_profile.pk}"])
+        self.assertIsNone(_stream_channels(factory.get("/api/orders/events/", {"token": "junk"})))
+
+    def test_stream_refuses_wsgi(self):
+        response = self.client.get("/api/orders/events/")
+        self.assertEqual(response.status_code, 501)
+        self.assertFalse(response.streaming)
+
+
+class InProcessBrokerTests(TestCase):
+    def test_subscribers_only_get_their_channels(self):
+        broker = events.InProcessBroker()
+
+        async def scenario():
+            async with broker.subscribe(["customer:1"]) as mine, broker.subscribe(["customer:2"]) as theirs:
+                broker.publish(["role:chef", "customer:1"], {"type": "order.created"})
+                message = await asyncio.wait_for(mine.get(), timeout=1)
+                await asyncio.sleep(0)
+                return message, theirs.empty()
+
+        message, others_empty = asyncio.run(scenario())
+        self.assertEqual(json.loads(message), {"type": "order.created"})
+        self.assertTrue(others_empty)
+        # Unsubscribing leaves no channels behind.
+        self.assertEqual(broker._subscribers, {})
+
+
+class OrderStatusTests(RestaurantTestCase):
+    """The order state machine, single and in bulk."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user("manager", Manager)
+        cls.user = make_user("customer", Customer)
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.staff)
+
+    def order(self, status="PENDING"):
+        return Order.objects.create(status=status, customer=self.user.customer_profile)
+
+    def move(self, order, status, client=None):
+        return (client or self.client).patch(
+            f"/api/orders/{order.pk}/update_status/", {"status": status}, format="json"
+        )
+
+    def assertStatus(self, order, status):
+        order.refresh_from_db()
+        self.assertEqual(order.status, status)
+
+    def test_transition_rules(self):
+        for current, targets in Order.TRANSITIONS.items():
+            for new in Order.TRANSITIONS:
+                if new != current:
+                    self.assertEqual(Order.can_transition(current, new), new in targets, (current, new))
+
+    def test_walks_the_happy_path(self):
+        order = self.order()
+        for status in ("PREPARING", "READY", "SERVED", "PAID"):
+            response = self.move(order, status)
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertStatus(order, status)
+
+    def test_illegal_transition_is_rejected(self):
+        order = self.order("PENDING")
+        response = self.move(order, "SERVED")
+        self.assertEqual(response.status_code, 400)
+        self.assertStatus(order, "PENDING")
+        self.assertEqual(self.move(order, "BOGUS").status_code, 400)
+
+    def test_customer_may_only_cancel_pending(self):
+        client = api_client(self.user)
+        order = self.order("PENDING")
+        self.assertEqual(self.move(order, "PREPARING", client).status_code, 403)
+        self.assertEqual(self.move(order, "CANCELLED", client).status_code, 200)
+        self.assertStatus(order, "CANCELLED")
+
+    def test_concurrent_change_is_a_conflict(self):
+        order = self.order("PENDING")
+        can_transition = Order.can_transition
+
+        def lose_the_race(current, new):
+            # Another request cancels the order after this one read it.
+            Order.objects.filter(pk=order.pk).update(status="CANCELLED")
+            return can_transition(current, new)
+
+        with mock.patch.object(Order, "can_transition", side_effect=lose_the_race):
+            response = self.move(order, "PREPARING")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["status"], "CANCELLED")
+        self.assertStatus(order, "CANCELLED")
+
+    def test_transition_to_only_updates_the_expected_status(self):
+        order = self.order("PENDING")
+        stale = Order.objects.get(pk=order.pk)
+        self.assertTrue(order.transition_to("PREPARING"))
+        self.assertFalse(stale.transition_to("CANCELLED"))
+        self.assertEqual(stale.status, "PENDING")
+        self.assertStatus(order, "PREPARING")
+
+    def test_bulk_status_reports_each_order(self):
+        moved, already, served, raced = (
+            self.order("PENDING"), self.order("PREPARING"), self.order("SERVED"), self.order("PENDING")
+        )
+        missing = uuid.uuid4()
+        bulk_status_eta = kitchen.bulk_status_eta
+
+        def race(*args):
+            # Another request cancels one of the orders between read and UPDATE.
+            Order.objects.filter(pk=raced.pk).update(status="CANCELLED")
+            return bulk_status_eta(*args)
+
+        with mock.patch.object(kitchen, "bulk_status_eta", side_effect=race):
+            response = self.client.post(
+                "/api/orders/bulk-status/",
+                {
+                    "order_ids": [str(o) for o in (moved.pk, already.pk, served.pk, raced.pk, missing)],
+                    "status": "PREPARING",
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [row["result"] for row in response.data["results"]],
+            ["updated", "unchanged", "invalid_transition", "conflict", "not_found"],
+        )
+        self.assertStatus(moved, "PREPARING")
+        self.assertStatus(served, "SERVED")
+        self.assertStatus(raced, "CANCELLED")
+
+    def test_bulk_status_is_staff_only(self):
+        order = self.order()
+        response = api_client(self.user).post(
+            "/api/orders/bulk-status/", {"order_ids": [str(order.pk)], "status": "CANCELLED"}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertStatus(order, "PENDING")
+
+
+class IdempotencyTests(RestaurantTestCase):
+    """Retried order creates with an Idempotency-Key."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("customer", Customer)
+        cls.dish = MenuItem.objects.create(name="Rice", description="", price=Decimal("3.00"))
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.user)
+
+    def place(self, quantity=1, key="order-1"):
+        return self.client.post(
+            "/api/orders/",
+            {"items": [{"menu_item": str(self.dish.pk), "quantity": quantity}]},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_replay_returns_the_stored_response(self):
+        first = self.place()
+        self.assertEqual(first.status_code, 201, first.data)
+        self.assertNotIn("Idempotent-Replayed", first)
+
+        replay = self.place()
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.count(), 1)
+
+    def test_key_reused_with_another_body_is_rejected(self):
+        self.place(quantity=1)
+        response = self.place(quantity=2)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_are_scoped_per_user(self):
+        self.place()
+        other = api_client(make_user("other", Customer))
+        response = other.post(
+            "/api/orders/",
+            {"items": [{"menu_item": str(self.dish.pk), "quantity": 1}]},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY="order-1",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_request_still_running_is_a_conflict(self):
+        IdempotencyKey.objects.create(
+            user=self.user,
+            scope="orders.create",
+            key="order-1",
+            request_hash="pending",
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        with mock.patch.object(idempotency, "_request_hash", return_value="pending"):
+            response = self.place()
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+
+    def test_failed_create_frees_the_key(self):
+        MenuItem.objects.filter(pk=self.dish.pk).update(available=False)
+        self.assertEqual(self.place().status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        MenuItem.objects.filter(pk=self.dish.pk).update(available=True)
+        response = self.place()
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertNotIn("Idempotent-Replayed", response)
+
+
+class SnapshotTests(RestaurantTestCase):
+    """Static menu snapshots and how edits republish them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.soups = Category.objects.create(name="Soups")
+        MenuItem.objects.create(name="Soup", description="", price=Decimal("4.00"), category=cls.soups)
+        MenuItem.objects.create(name="Tea", description="", price=Decimal("1.00"))
+        MenuItem.objects.create(name="Gone", description="", price=Decimal("2.00"), available=False)
+
+    def read(self, path):
+        return json.loads(path.read_bytes())
+
+    def test_publish_writes_versioned_and_latest_files(self):
+        path = snapshots.publish_menu()
+        menu = self.read(path)
+        self.assertEqual(path.name, f"menu-{menu['version']}.json")
+        self.assertEqual(menu, self.read(snapshots.snapshot_dir() / snapshots.LATEST_NAME))
+        self.assertEqual(gzip.decompress(path.with_name(path.name + ".gz").read_bytes()), path.read_bytes())
+
+        [soups] = menu["categories"]
+        self.assertEqual((soups["name"], [i["name"] for i in soups["items"]]), ("Soups", ["Soup"]))
+        self.assertEqual([i["name"] for i in menu["uncategorized"]], ["Tea"])
+
+    @override_settings(MENU_SNAPSHOT_KEEP=2)
+    def test_old_versions_are_pruned(self):
+        for version in (1000, 2000, 3000):
+            catalog._cache().set(catalog.VERSION_KEY, version, timeout=None)
+            snapshots.publish_menu()
+        names = sorted(os.listdir(snapshots.snapshot_dir()))
+        self.assertEqual(
+            names,
+            ["menu-2000.json", "menu-2000.json.gz", "menu-3000.json", "menu-3000.json.gz",
+             "menu.json", "menu.json.gz"],
+        )
+
+    @override_settings(MENU_AUTO_PUBLISH=True)
+    def test_edits_publish_in_the_background_once(self):
+        self.addCleanup(setattr, snapshots, "_queued", False)
+        executor = mock.Mock()
+        with mock.patch.object(snapshots, "_executor", return_value=executor), \
+                mock.patch.object(snapshots, "publish_menu") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                MenuItem.objects.create(name="Bread", description="", price=Decimal("1.50"))
+                MenuItem.objects.get(name="Soup").save()
+            # Committing only queues the work; nothing is rendered in this thread.
+            publish.assert_not_called()
+            executor.submit.assert_called_once_with(snapshots._publish_in_worker)
+
+            # Commits landing before the queued publish starts ride along with it.
+            snapshots._publish_on_commit()
+            executor.submit.assert_called_once()
+
+            snapshots._publish_in_worker()
+            publish.assert_called_once()
+
+            # Once it has started, the next commit queues one more publish.
+            snapshots._publish_on_commit()
+            self.assertEqual(executor.submit.call_count, 2)
+
+
+@override_settings(MENU_IMAGE_WIDTHS={"thumb": 40, "card": 80, "detail": 160}, MENU_IMAGE_FORMATS=("webp",))
+class ImageVariantTests(RestaurantTestCase):
+    """Resized copies of menu item images and the URLs the API gives out."""
+
+    def store(self, image, name="menu_items/dish.png"):
+        buffer = BytesIO()
+        image.save(buffer, format="PNG")
+        name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        item = MenuItem.objects.create(name="Dish", description="", price=Decimal("5.00"))
+        MenuItem.objects.filter(pk=item.pk).update(image=name)
+        return item, name
+
+    def client_for_menu(self):
+        return api_client(make_user("customer", Customer))
+
+    def open(self, name):
+        with default_storage.open(name, "rb") as f:
+            image = Image.open(BytesIO(f.read()))
+            image.load()
+        return image
+
+    def test_src_is_the_mid_size_fallback(self):
+        item, name = self.store(Image.new("RGB", (200, 100), "red"))
+        variants = images.build_variants(item.pk, name)
+        self.assertEqual(variants["widths"], [40, 80, 160])
+        self.assertEqual(sorted(variants["formats"]["webp"]), ["160", "40", "80"])
+
+        fallback = self.open(variants["fallback"])
+        self.assertEqual((fallback.format, fallback.size), ("JPEG", (80, 40)))
+
+        data = self.client_for_menu().get(f"/api/menu-items/{item.pk}/").json()["image"]
+        self.assertTrue(data["src"].endswith(variants["fallback"]), data["src"])
+        self.assertIn(" 80w", data["srcset"]["webp"])
+
+    def test_src_is_the_original_until_built(self):
+        item, name = self.store(Image.new("RGB", (200, 100), "red"))
+        data = self.client_for_menu().get(f"/api/menu-items/{item.pk}/").json()["image"]
+        self.assertTrue(data["src"].endswith(name))
+        self.assertEqual(data["srcset"], {})
+
+    def test_palette_transparency_is_kept(self):
+        image = Image.new("P", (120, 60), 0)
+        image.putpalette([255, 0, 0, 0, 255, 0] + [0] * 762)
+        image.paste(1, (0, 0, 60, 60))
+        image.info["transparency"] = 0
+        item, name = self.store(image)
+
+        variants = images.build_variants(item.pk, name)
+        fallback = self.open(variants["fallback"])
+        self.assertEqual(fallback.format, "PNG")
+        fallback = fallback.convert("RGBA")
+        self.assertEqual(fallback.getpixel((fallback.width - 1, 0))[3], 0)
+        self.assertEqual(fallback.getpixel((0, 0))[3], 255)
+        webp = self.open(variants["formats"]["webp"]["120"]).convert("RGBA")
+        self.assertEqual(webp.getpixel((119, 0))[3], 0)
+
+
+class OrderQueueTests(RestaurantTestCase):
+    """Status-filtered order lists and the kitchen/ready queues."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user("chef", Chef)
+        now = timezone.now()
+        cls.orders = {}
+        for minutes, status in ((5, "PREPARING"), (30, "PENDING"), (20, "READY"), (10, "PENDING"), (40, "SERVED")):
+            order = Order.objects.create(status=status)
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(minutes=minutes))
+            cls.orders[minutes] = str(order.pk)
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.staff)
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200, response.data)
+        data = response.json()
+        rows = data["results"] if isinstance(data, dict) else data
+        return [row["order_id"] for row in rows]
+
+    def test_kitchen_queue_is_oldest_first(self):
+        self.assertEqual(
+            self.ids(self.client.get("/api/orders/kitchen-queue/")),
+            [self.orders[30], self.orders[10], self.orders[5]],
+        )
+
+    def test_ready_queue(self):
+        self.assertEqual(self.ids(self.client.get("/api/orders/ready/")), [self.orders[20]])
+
+    def test_list_filters_by_status(self):
+        ids = self.ids(self.client.get("/api/orders/", {"status": "ready,served"}))
+        self.assertEqual(sorted(ids), sorted([self.orders[20], self.orders[40]]))
+
+    def test_unknown_status_is_rejected(self):
+        response = self.client.get("/api/orders/", {"status": "PENDING,LOST"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("LOST", str(response.data))
+
+
+class KeysetPaginationTests(RestaurantTestCase):
+    """Cursor paging over rows that tie on created_at."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user("manager", Manager)
+        orders = [Order.objects.create(status="PENDING") for _ in range(7)]
+        created = timezone.now() - timedelta(hours=1)
+        Order.objects.filter(pk__in=[o.pk for o in orders[:5]]).update(created_at=created)
+        # Newest first, ties broken by pk descending.
+        cls.expected = [
+            str(pk) for pk in Order.objects.order_by("-created_at", "-pk").values_list("pk", flat=True)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.staff)
+
+    def page(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.json()
+
+    def test_pages_cover_every_row_once(self):
+        page = self.page("/api/orders/", {"page_size": 3})
+        self.assertNotIn("count", page)
+        seen, pages = [], []
+        while True:
+            ids = [row["order_id"] for row in page["results"]]
+            seen += ids
+            pages.append(ids)
+            if not page["next"]:
+                break
+            page = self.page(page["next"])
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(ids) for ids in pages], [3, 3, 1])
+
+        # And back again from the last page.
+        backwards = []
+        while page["previous"]:
+            page = self.page(page["previous"])
+            backwards = [row["order_id"] for row in page["results"]] + backwards
+        self.assertEqual(backwards, self.expected[:6])
+
+    def test_count_only_on_request(self):
+        page = self.page("/api/orders/", {"page_size": 3, "count": "true"})
+        self.assertEqual(page["count"], 7)
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(KeysetPagination, "max_page_size", 2):
+            self.assertEqual(len(self.page("/api/orders/", {"page_size": 500})["results"]), 2)
+
+    def test_bad_cursor_is_not_found(self):
+        self.assertEqual(self.client.get("/api/orders/", {"cursor": "garbage"}).status_code, 404)
+
+
+class OrderTotalsTests(RestaurantTestCase):
+    """Order subtotal/discount/total follow the order's lines."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.soup = MenuItem.objects.create(name="Soup", description="", price=Decimal("4.50"))
+        cls.bread = MenuItem.objects.create(name="Bread", description="", price=Decimal("1.25"))
+        cls.discount = DiscountCode.objects.create(
+            code="QUARTER", percent_off=25, expires_at=timezone.now() + timedelta(days=1)
+        )
+
+    def assertTotals(self, order, subtotal, discount, total):
+        order.refresh_from_db()
+        self.assertEqual(
+            (order.subtotal, order.discount, order.total),
+            (Decimal(subtotal), Decimal(discount), Decimal(total)),
+        )
+
+    def test_line_writes_update_the_totals(self):
+        order = Order.objects.create()
+        soup = OrderItem.objects.create(order=order, menu_item=self.soup, quantity=2)
+        self.assertTotals(order, "9.00", "0.00", "9.00")
+
+        OrderItem.objects.create(order=order, menu_item=self.bread, quantity=3)
+        self.assertTotals(order, "12.75", "0.00", "12.75")
+
+        soup.quantity = 1
+        soup.save()
+        self.assertTotals(order, "8.25", "0.00", "8.25")
+
+        soup.delete()
+        self.assertTotals(order, "3.75", "0.00", "3.75")
+
+    def test_discount_is_applied_to_the_stored_total(self):
+        order = Order.objects.create(applied_discount=self.discount)
+        OrderItem.objects.create(order=order, menu_item=self.soup, quantity=2)
+        self.assertTotals(order, "9.00", "2.25", "6.75")
+        self.assertEqual(order.calculate_total(), Decimal("6.75"))
+
+        order.applied_discount = None
+        order.save(update_fields=["applied_discount"])
+        self.assertTotals(order, "9.00", "0.00", "9.00")
+
+    def test_reading_totals_does_not_touch_the_lines(self):
+        order = Order.objects.create()
+        OrderItem.objects.create(order=order, menu_item=self.soup, quantity=2)
+        order = Order.objects.get(pk=order.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(order.calculate_total(), Decimal("9.00"))
+
+
+class OrderCreateTests(RestaurantTestCase):
+    """Placing an order with several lines."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("customer", Customer)
+        cls.dishes = [
+            MenuItem.objects.create(name=f"Dish {i}", description="", price=Decimal("2.50"))
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.user)
+
+    def place(self, lines):
+        return self.client.post(
+            "/api/orders/",
+            {"items": [{"menu_item": str(dish.pk), "quantity": quantity} for dish, quantity in lines]},
+            format="json",
+        )
+
+    def test_lines_and_totals_are_written_together(self):
+        response = self.place([(dish, 2) for dish in self.dishes])
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Decimal(str(response.data["total_price"])), Decimal("20.00"))
+        order = Order.objects.get(pk=response.data["order_id"])
+        self.assertEqual(order.items.count(), 4)
+        self.assertEqual(order.total, Decimal("20.00"))
+        self.assertEqual(order.customer, self.user.customer_profile)
+
+    def test_query_count_does_not_grow_with_lines(self):
+        # Warm the cached chef count first.
+        self.place([(self.dishes[0], 1)])
+        with CaptureQueriesContext(connection) as one_line:
+            self.assertEqual(self.place([(self.dishes[0], 1)]).status_code, 201)
+        with self.assertNumQueries(len(one_line)):
+            self.assertEqual(self.place([(dish, 1) for dish in self.dishes]).status_code, 201)
+
+    def test_unknown_and_unavailable_items_are_rejected(self):
+        MenuItem.objects.filter(pk=self.dishes[1].pk).update(available=False)
+        response = self.place([(self.dishes[0], 1), (self.dishes[1], 1)])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Currently unavailable: Dish 1", str(response.data))
+
+        ghost = MenuItem(name="Ghost", description="", price=Decimal("1.00"))
+        response = self.place([(ghost, 1)])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(ghost.pk), str(response.data))
+        self.assertFalse(Order.objects.exists())
+
+    def test_failure_part_way_leaves_nothing_behind(self):
+        with mock.patch.object(OrderItem.objects, "bulk_create", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                self.place([(dish, 1) for dish in self.dishes])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+
+class PrepSummaryTests(RestaurantTestCase):
+    """Outstanding kitchen lines rolled up by dish."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.chef = make_user("chef", Chef)
+        cls.soup = MenuItem.objects.create(name="Soup", description="", price=Decimal("4.00"))
+        cls.salad = MenuItem.objects.create(name="Salad", description="", price=Decimal("5.00"))
+        now = timezone.now()
+        for minutes, status, lines in (
+            (30, "PENDING", [(cls.salad, 1, "no onion")]),
+            (20, "PREPARING", [(cls.soup, 2, ""), (cls.salad, 2, "")]),
+            (10, "PENDING", [(cls.soup, 1, "extra hot")]),
+            (40, "SERVED", [(cls.soup, 5, "ignored")]),
+        ):
+            order = Order.objects.create(status=status)
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(minutes=minutes))
+            for dish, quantity, note in lines:
+                OrderItem.objects.create(order=order, menu_item=dish, quantity=quantity, note=note)
+
+    def test_rolls_up_open_orders_by_dish(self):
+        response = api_client(self.chef).get("/api/order-items/prep-summary/")
+        self.assertEqual(response.status_code, 200, response.data)
+        rows = {row["name"]: row for row in response.data}
+        self.assertEqual(list(rows), ["Salad", "Soup"])  # longest waiting first
+        self.assertEqual(
+            {name: (row["pending"], row["preparing"], row["total"]) for name, row in rows.items()},
+            {"Salad": (1, 2, 3), "Soup": (1, 2, 3)},
+        )
+        self.assertEqual([n["note"] for n in rows["Salad"]["notes"]], ["no onion"])
+        self.assertEqual([n["note"] for n in rows["Soup"]["notes"]], ["extra hot"])
+
+    def test_two_queries_however_many_lines(self):
+        client = api_client(self.chef)
+        with self.assertNumQueries(2):
+            client.get("/api/order-items/prep-summary/")
+
+    def test_customers_are_refused(self):
+        response = api_client(make_user("customer", Customer)).get("/api/order-items/prep-summary/")
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(KITCHEN_ACTIVE_CHEFS=2)
+class BulkStatusTests(RestaurantTestCase):
+    """Side effects of POST /orders/bulk-status/ on the orders it moves."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user("manager", Manager)
+        cls.dish = MenuItem.objects.create(
+            name="Pasta", description="", price=Decimal("7.00"), prep_minutes=10
+        )
+        cls.stock = InventoryItem.objects.create(item=cls.dish, quantity=10)
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.staff)
+
+    def orders(self, count, status="PENDING", quantity=1):
+        orders = []
+        for _ in range(count):
+            order = Order.objects.create(status=status)
+            inventory.reserve({self.dish.pk: quantity}, order.pk)
+            OrderItem.objects.create(order=order, menu_item=self.dish, quantity=quantity)
+            orders.append(order)
+        return orders
+
+    def bulk(self, orders, status):
+        response = self.client.post(
+            "/api/orders/bulk-status/",
+            {"order_ids": [str(o.pk) for o in orders], "status": status},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual({row["result"] for row in response.data["results"]}, {"updated"})
+
+    def test_preparing_sets_each_orders_eta(self):
+        small, large = self.orders(1, quantity=1) + self.orders(1, quantity=3)
+        before = timezone.now()
+        self.bulk([small, large], "PREPARING")
+        for order, minutes in ((small, 5), (large, 15)):
+            order.refresh_from_db()
+            expected = before + timedelta(minutes=minutes)
+            self.assertLess(abs(order.estimated_time - expected), timedelta(seconds=5))
+
+    def test_cancelling_releases_stock(self):
+        self.bulk(self.orders(3, quantity=2), "CANCELLED")
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.quantity, 10)
+
+    def test_serving_issues_invoices(self):
+        orders = self.orders(2, status="READY")
+        self.bulk(orders, "SERVED")
+        self.assertEqual(
+            sorted(Invoice.objects.values_list("amount", "status")),
+            [(Decimal("7.00"), Invoice.UNPAID)] * 2,
+        )
+
+    def test_query_count_does_not_grow_with_orders(self):
+        self.bulk(self.orders(1), "CANCELLED")  # warm the chef count
+        one_order, orders = self.orders(1), self.orders(4)
+        with CaptureQueriesContext(connection) as one:
+            self.bulk(one_order, "PREPARING")
+        with self.assertNumQueries(len(one)):
+            self.bulk(orders, "PREPARING")
+
+
+class ArchiveTests(RestaurantTestCase):
+    """Moving closed orders to the archive tables and reporting across both."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user("manager", Manager)
+        cls.user = make_user("customer", Customer)
+        cls.dish = MenuItem.objects.create(name="Pho", description="", price=Decimal("11.00"))
+
+    def order(self, status, days_ago, quantity=1):
+        order = Order.objects.create(status=status, customer=self.user.customer_profile)
+        OrderItem.objects.create(order=order, menu_item=self.dish, quantity=quantity, note="spicy")
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        if status in billing.BILLED_STATUSES:
+            billing.issue_invoices([order.pk])
+            Payment.objects.create(invoice=order.invoice, status="COMPLETED", transaction_id="tx")
+        return order
+
+    def test_closed_old_orders_move_with_their_children(self):
+        paid, cancelled = self.order("PAID", 40, quantity=2), self.order("CANCELLED", 40)
+        kept = [self.order("PENDING", 40), self.order("PAID", 1)]
+
+        self.assertEqual(archive_orders(timedelta(days=30), batch_size=1), 2)
+
+        self.assertEqual(set(Order.objects.all()), set(kept))
+        self.assertEqual(
+            set(ArchivedOrder.objects.values_list("pk", flat=True)), {paid.pk, cancelled.pk}
+        )
+        archived = ArchivedOrder.objects.get(pk=paid.pk)
+        self.assertEqual(archived.total, Decimal("22.00"))
+        [line] = archived.items.all()
+        self.assertEqual((line.name, line.price, line.quantity, line.note), ("Pho", Decimal("11.00"), 2, "spicy"))
+        self.assertEqual(archived.invoice.amount, Decimal("22.00"))
+        self.assertEqual(archived.invoice.payment.transaction_id, "tx")
+        # Delta sync clients learn the orders left the live table.
+        self.assertEqual(DeletedOrder.objects.count(), 2)
+
+    def test_revenue_spans_live_and_archived_orders(self):
+        self.order("PAID", 40, quantity=2)
+        self.order("SERVED", 2)
+        self.order("CANCELLED", 40)
+        client = api_client(self.staff)
+        before = client.get("/api/orders/revenue/").data
+        archive_orders(timedelta(days=30))
+        after = client.get("/api/orders/revenue/").data
+
+        self.assertEqual(after, before)
+        self.assertEqual(after["revenue"], Decimal("33.00"))
+        self.assertEqual(after["order_count"], 3)
+        self.assertEqual([row["revenue"] for row in after["daily"]], [Decimal("11.00")])
+
+    def test_customers_read_their_archived_orders(self):
+        paid = self.order("PAID", 40)
+        archive_orders(timedelta(days=30))
+        response = api_client(self.user).get("/api/archive/orders/")
+        self.assertEqual([row["order_id"] for row in response.data["results"]], [str(paid.pk)])
+        other = api_client(make_user("other", Customer)).get("/api/archive/orders/")
+        self.assertEqual(other.data["results"], [])
+
+
+class MenuSearchTests(RestaurantTestCase):
+    """The full-text index follows menu item and category writes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("customer", Customer)
+        cls.burgers = Category.objects.create(name="Burgers")
+        cls.burger = MenuItem.objects.create(
+            name="Cheese Burger", description="Beef patty", price=Decimal("9.00"), category=cls.burgers
+        )
+        cls.soup = MenuItem.objects.create(
+            name="Onion Soup", description="Topped with melted cheese", price=Decimal("6.00")
+        )
+
+    def search(self, query, limit=20):
+        return [MenuItem.objects.get(pk=pk).name for pk in search_menu_items(query, limit)]
+
+    def test_prefix_terms_ranked_by_name_first(self):
+        self.assertEqual(self.search("bur ch"), ["Cheese Burger"])
+        self.assertEqual(self.search("chees"), ["Cheese Burger", "Onion Soup"])
+        self.assertEqual(self.search("burgers"), ["Cheese Burger"])  # category name
+        self.assertEqual(self.search("chees", limit=1), ["Cheese Burger"])
+        self.assertEqual(self.search("  !! "), [])
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        tea = MenuItem.objects.create(name="Green Tea", description="", price=Decimal("2.00"))
+        self.assertEqual(self.search("tea"), ["Green Tea"])
+
+        tea.name = "Mint Infusion"
+        tea.save()
+        self.assertEqual(self.search("tea"), [])
+        self.assertEqual(self.search("mint"), ["Mint Infusion"])
+
+        tea.delete()
+        self.assertEqual(self.search("mint"), [])
+
+    def test_category_changes_reindex_their_items(self):
+        self.burgers.name = "Sandwiches"
+        self.burgers.save()
+        self.assertEqual(self.search("sandw"), ["Cheese Burger"])
+        self.burgers.delete()
+        self.assertEqual(self.search("sandw"), [])
+        self.assertEqual(self.search("patty"), ["Cheese Burger"])
+
+    def test_search_endpoint(self):
+        response = api_client(self.user).get("/api/menu-items/search/", {"q": "onion"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["name"] for row in response.json()], ["Onion Soup"])
+        response = api_client(self.user).get("/api/menu-items/search/", {"q": "x", "limit": "many"})
+        self.assertEqual(response.status_code, 400)
+
+
+class CatalogTransferTests(RestaurantTestCase):
+    """CSV / JSON Lines export and import of the catalog."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.chef = make_user("chef", Chef)
+        cls.mains = Category.objects.create(name="Mains")
+        cls.steak = MenuItem.objects.create(
+            name="Steak", description="Grilled", price=Decimal("20.00"), category=cls.mains
+        )
+        cls.salad = MenuItem.objects.create(name="Salad", description="", price=Decimal("7.50"))
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.chef)
+
+    def export(self, resource, fmt):
+        response = self.client.get(f"/api/{resource}/export/", {"as": fmt})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def upload(self, resource, name, content):
+        return self.client.post(
+            f"/api/{resource}/import/",
+            {"file": SimpleUploadedFile(name, content.encode())},
+            format="multipart",
+        )
+
+    def test_jsonl_round_trip_updates_and_creates(self):
+        rows = [json.loads(line) for line in self.export("menu-items", "jsonl").splitlines()]
+        self.assertEqual(
+            {row["name"]: (row["price"], row["category"]) for row in rows},
+            {"Steak": ("20.00", "Mains"), "Salad": ("7.50", None)},
+        )
+        for row in rows:
+            if row["name"] == "Salad":
+                row.update(price="8.00", category="Starters")
+        rows.append({"name": "Fries", "price": "3.00", "category": "Sides"})
+
+        response = self.upload("menu-items", "menu.jsonl", "".join(json.dumps(row) + "\n" for row in rows))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["imported"], 3)
+
+        self.salad.refresh_from_db()
+        self.assertEqual((self.salad.price, self.salad.category.name), (Decimal("8.00"), "Starters"))
+        self.assertEqual(MenuItem.objects.get(name="Fries").category.name, "Sides")
+        self.assertEqual(MenuItem.objects.count(), 3)
+
+    def test_csv_columns_left_out_are_kept(self):
+        csv_text = f"item_id,name,price\r\n{self.steak.pk},Steak,22.50\r\n"
+        self.assertEqual(self.upload("menu-items", "menu.csv", csv_text).status_code, 200)
+        self.steak.refresh_from_db()
+        self.assertEqual(
+            (self.steak.name, self.steak.description, self.steak.price, self.steak.category_id),
+            ("Steak", "Grilled", Decimal("22.50"), self.mains.pk),
+        )
+
+    def test_bad_rows_are_reported_and_nothing_is_applied(self):
+        csv_text = "name,price\r\nSoup,4.00\r\n,5.00\r\nStew,cheap\r\n"
+        response = self.upload("menu-items", "menu.csv", csv_text)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["errors"],
+            [{"line": "3", "error": "missing name"}, {"line": "4", "error": "not a number: 'cheap'"}],
+        )
+        self.assertFalse(MenuItem.objects.filter(name="Soup").exists())
+
+    def test_inventory_import_rejects_unknown_items(self):
+        content = json.dumps({"item_id": str(uuid.uuid4()), "quantity": 5}) + "\n"
+        response = self.upload("inventory", "stock.jsonl", content)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("unknown menu item", str(response.data))
+
+        content = json.dumps({"item_id": str(self.steak.pk), "quantity": 5}) + "\n"
+        self.assertEqual(self.upload("inventory", "stock.jsonl", content).status_code, 200)
+        self.assertEqual(inventory.stock_levels([self.steak.pk])[self.steak.pk], 5)
+
+    def test_customers_cannot_transfer(self):
+        client = api_client(make_user("customer", Customer))
+        self.assertEqual(client.get("/api/menu-items/export/").status_code, 403)
+
+
+class LedgerCompactionTests(RestaurantTestCase):
+    """Folding old stock movements into snapshots keeps every balance."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dish = MenuItem.objects.create(name="Ramen", description="", price=Decimal("12.00"))
+        cls.day = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=40)
+
+    def setUp(self):
+        super().setUp()
+        self.seen = 0
+
+    def at(self, hours):
+        """Stamp the movements written since the last call ``hours`` into the old day."""
+        InventoryMovement.objects.filter(pk__gt=self.seen).update(created_at=self.day + timedelta(hours=hours))
+        self.seen = InventoryMovement.objects.order_by("-pk").values_list("pk", flat=True).first()
+
+    def order(self, quantity, status="PENDING"):
+        order = Order.objects.create(status=status)
+        inventory.reserve({self.dish.pk: quantity}, order.pk)
+        OrderItem.objects.create(order=order, menu_item=self.dish, quantity=quantity)
+        return order
+
+    def level(self, at=None):
+        return inventory.stock_levels([self.dish.pk], at=at)[self.dish.pk]
+
+    def test_compaction_preserves_stock_levels(self):
+        InventoryItem.objects.create(item=self.dish, quantity=20)
+        self.at(-30)
+        self.order(4, status="PAID")
+        self.at(-2)
+        inventory.adjust([{"item": self.dish.pk, "quantity": 3, "reason": InventoryMovement.WASTE}])
+        self.at(1)
+        self.order(2, status="CANCELLED")
+        inventory.release_orders(Order.objects.filter(status="CANCELLED").values("pk"))
+        self.at(2)
+
+        instants = [None, self.day - timedelta(days=1, hours=4), self.day + timedelta(days=1)]
+        before = [self.level(at) for at in instants]
+        self.assertEqual(before, [13, 20, 13])
+
+        self.assertEqual(inventory.compact_ledger(timedelta(days=30)), 5)
+        self.assertFalse(InventoryMovement.objects.exists())
+        self.assertEqual(InventorySnapshot.objects.count(), 2)  # one per day with movements
+        self.assertEqual([self.level(at) for at in instants], before)
+
+        # Compacting again changes nothing.
+        self.assertEqual(inventory.compact_ledger(timedelta(days=30)), 0)
+        self.assertEqual(self.level(), 13)
+
+    def test_reservations_that_can_be_released_are_kept(self):
+        InventoryItem.objects.create(item=self.dish, quantity=10)
+        self.at(0)
+        pending = self.order(3)
+        self.at(1)
+        inventory.adjust([{"item": self.dish.pk, "quantity": 5, "reason": InventoryMovement.RESTOCK}])
+        self.at(2)
+
+        inventory.compact_ledger(timedelta(days=30))
+        # Only the stocktake before the reservation was folded away.
+        self.assertEqual(InventoryMovement.objects.count(), 2)
+        self.assertEqual(self.level(), 12)
+
+        inventory.release_orders([pending.pk])
+        self.assertEqual(self.level(), 15)
+        self.assertEqual(InventoryItem.objects.get(item=self.dish).quantity, 15)
+
+    def test_editing_an_open_order_after_compaction(self):
+        InventoryItem.objects.create(item=self.dish, quantity=10)
+        self.at(0)
+        served = self.order(3, status="SERVED")
+        paid = self.order(2, status="PAID")
+        self.at(1)
+        inventory.compact_ledger(timedelta(days=30))
+
+        # The served order's reservation survived, so only the extra unit is taken.
+        served.items.update(quantity=4)
+        inventory.sync_order(served.pk)
+        self.assertEqual(self.level(), 4)
+
+        # A paid order is settled: its lines no longer move stock.
+        paid.items.update(quantity=5)
+        inventory.sync_order(paid.pk)
+        self.assertEqual(self.level(), 4)
+        self.assertEqual(InventoryItem.objects.get(item=self.dish).quantity, 4)
+
+
+class ForecastTests(RestaurantTestCase):
+    """Hour-of-week consumption rates and the depletion projection."""
+
+    # A Wednesday evening, in UTC like the project's TIME_ZONE.
+    now = datetime(2026, 3, 4, 18, 0, tzinfo=dt_timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user("manager", Manager)
+        cls.dish = MenuItem.objects.create(name="Dumplings", description="", price=Decimal("6.00"))
+        cls.idle = MenuItem.objects.create(name="Caviar", description="", price=Decimal("90.00"))
+        InventoryItem.objects.create(item=cls.dish, quantity=10)
+        InventoryItem.objects.create(item=cls.idle, quantity=3)
+
+    def sell(self, quantity, at, status="PAID"):
+        order = Order.objects.create(status=status)
+        OrderItem.objects.create(order=order, menu_item=self.dish, quantity=quantity)
+        Order.objects.filter(pk=order.pk).update(created_at=at)
+
+    def test_rates_per_hour_of_week(self):
+        # Three units every day at noon for the last two weeks.
+        for days in range(14):
+            self.sell(3, self.now.replace(hour=12) - timedelta(days=days))
+        self.sell(50, self.now.replace(hour=12), status="CANCELLED")
+
+        item_ids, rates = forecast.consumption_rates(self.now)
+        self.assertEqual(set(item_ids), {self.dish.pk, self.idle.pk})
+        dish = rates[item_ids.index(self.dish.pk)]
+        noon = [day * 24 + 12 for day in range(7)]
+        self.assertEqual(dish[noon].tolist(), [3.0] * 7)
+        self.assertEqual(dish.sum(), 21.0)
+        self.assertEqual(rates[item_ids.index(self.idle.pk)].sum(), 0.0)
+
+    def test_projection_finds_the_hour_stock_runs_out(self):
+        rates = np.zeros((3, forecast.HOURS_PER_WEEK))
+        rates[0, [day * 24 + 12 for day in range(7)]] = 3  # 3 a day at noon
+        rates[1, :] = 2  # 2 an hour, around the clock
+        quantities = np.array([10.0, 10.0, 0.0])
+        # Wednesday 08:30: half of the current hour is left.
+        hours_left, demand = forecast.project(
+            rates, quantities, self.now.replace(hour=8, minute=30), horizon=96
+        )
+        # Noon today, Thursday and Friday use 9; Saturday noon runs out a third in.
+        self.assertAlmostEqual(hours_left[0], 75.5 + 1 / 3)
+        self.assertEqual(hours_left[1], 5.0)
+        self.assertEqual(hours_left[2], 0.0)
+        self.assertEqual(demand.tolist(), [12.0, 191.0, 0.0])
+
+        never, _ = forecast.project(rates[:1] * 0, quantities[:1], self.now)
+        self.assertTrue(np.isnan(never[0]))
+
+    @override_settings(INVENTORY_LOW_STOCK_HOURS=24)
+    def test_forecast_and_low_stock_endpoints(self):
+        item_ids = [self.dish.pk, self.idle.pk]
+        rates = np.stack([np.full(forecast.HOURS_PER_WEEK, 1.0), np.zeros(forecast.HOURS_PER_WEEK)])
+        client = api_client(self.staff)
+        with mock.patch.object(forecast, "consumption_rates", return_value=(item_ids, rates)):
+            rows = client.get("/api/inventory/forecast/").data
+            low = client.get("/api/inventory/low-stock/").data
+
+        self.assertEqual([row["name"] for row in rows], ["Dumplings", "Caviar"])
+        self.assertEqual((rows[0]["hours_left"], rows[0]["daily_rate"]), (10.0, 24.0))
+        self.assertIsNone(rows[1]["hours_left"])
+        self.assertEqual(rows[1]["reorder_quantity"], 0)
+        self.assertEqual([row["name"] for row in low], ["Dumplings"])
+
+        customer = api_client(make_user("customer", Customer))
+        self.assertEqual(customer.get("/api/inventory/low-stock/").status_code, 403)
+
+
+class SparseFieldsetTests(RestaurantTestCase):
+    """``?fields=`` and ``?expand=`` on the nested payment/invoice/order payloads."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = make_user("manager", Manager)
+        dish = MenuItem.objects.create(name="Tacos", description="", price=Decimal("3.00"))
+        cls.order = Order.objects.create(status="SERVED")
+        OrderItem.objects.create(order=cls.order, menu_item=dish, quantity=2)
+        billing.issue_invoices([cls.order.pk])
+        cls.invoice = Invoice.objects.get(order=cls.order)
+        cls.paid = Payment.objects.create(invoice=cls.invoice, status="PENDING", transaction_id="t1")
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.staff)
+
+    def get_payment(self, **params):
+        response = self.client.get("/api/payments/", params)
+        self.assertEqual(response.status_code, 200, response.data)
+        [payment] = response.json()["results"]
+        return payment
+
+    def test_nested_objects_are_collapsed_by_default(self):
+        payment = self.get_payment()
+        self.assertEqual(payment["invoice"], str(self.invoice.pk))
+        self.assertNotIn("invoice_detail", payment)
+
+    def test_expansion_goes_one_level_at_a_time(self):
+        invoice = self.get_payment(expand="invoice_detail")["invoice_detail"]
+        self.assertEqual((invoice["order"], invoice["amount"]), (str(self.order.pk), "6.00"))
+        self.assertNotIn("order_detail", invoice)
+
+        order = self.get_payment(expand="invoice_detail.order_detail")["invoice_detail"]["order_detail"]
+        self.assertEqual(order["status"], "SERVED")
+        self.assertEqual(order["items"], [OrderItem.objects.get().pk])
+
+        expanded = self.get_payment(expand="invoice_detail.order_detail.items")
+        order = expanded["invoice_detail"]["order_detail"]
+        self.assertEqual([item["quantity"] for item in order["items"]], [2])
+
+        # A wildcard expands everything below it.
+        everything = self.get_payment(expand="invoice_detail.*")["invoice_detail"]["order_detail"]
+        [item] = everything["items"]
+        self.assertEqual(item["menu_item_detail"]["name"], "Tacos")
+
+    def test_fields_keep_only_the_named_paths(self):
+        payment = self.get_payment(
+            fields="payment_id,invoice_detail.amount,invoice_detail.order_detail.total_price"
+        )
+        self.assertEqual(
+            payment,
+            {
+                "payment_id": str(self.paid.pk),
+                "invoice_detail": {"amount": "6.00", "order_detail": {"total_price": 6.0}},
+            },
+        )
+
+    def test_fields_do_not_limit_what_writes_validate(self):
+        response = self.client.post("/api/payments/?fields=payment_id", {"status": "PENDING"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("invoice", response.data)
+
+    def test_collapsed_orders_skip_the_items_query(self):
+        with CaptureQueriesContext(connection) as collapsed:
+            self.client.get("/api/orders/", {"fields": "order_id,status"})
+        with CaptureQueriesContext(connection) as expanded:
+            self.client.get("/api/orders/", {"expand": "items"})
+        self.assertFalse(any("restaurant_orderitem" in q["sql"] for q in collapsed.captured_queries))
+        self.assertTrue(any("restaurant_orderitem" in q["sql"] for q in expanded.captured_queries))
@@ -0,0 +1,376 @@
+"""Bulk CSV / JSON Lines import and export of the menu catalog.
+
+Each resource (``categories``, ``menu-items``, ``inventory``) is a flat row
+format keyed on a natural key: category ``name``, menu item ``item_id`` and
+the inventory row's menu ``item_id``. Export streams rows straight from a
+server-side ``.iterator()``. Import parses the input lazily and upserts it in
+``bulk_create(update_conflicts=True)`` batches inside one transaction, so
+memory stays flat however large the file is and a bad row leaves nothing
+half-applied.
+
+``bulk_create`` sends no signals, so the import does the signal handlers'
+work itself, once per batch (search index, stock ledger) or once per import
+(catalog version and static snapshot).
+"""
+
+from __future__ import annotations
+
+import abc
+import csv
+import io
+import json
+import uuid
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from . import inventory, search
+from .catalog import bump_catalog_version
+from .models import Category, InventoryItem, MenuItem
+from .permissions import RoleRequired
+from .snapshots import schedule_publish
+
+
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+CATALOG_EDITORS = ("chef", "manager", "admin")
+# Stop collecting after this many bad rows; the file needs fixing anyway.
+MAX_ERRORS = 50
+# Export rows are sent in chunks of roughly this many characters.
+EXPORT_CHUNK_SIZE = 64 * 1024
+TRUE_VALUES = {"1", "true", "yes", "y", "t"}
+FALSE_VALUES = {"0", "false", "no", "n", "f", ""}
+
+
+def _text(value):
+    return "" if value is None else str(value)
+
+
+def _decimal(value):
+    try:
+        return Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"not a number: {value!r}")
+
+
+def _int(value):
+    return int(str(value).strip())
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def _uuid(value):
+    return uuid.UUID(str(value).strip())
+
+
+def _dedupe(rows: list[dict], key: str) -> list[dict]:
+    """Keep the last row per key; one upsert can't touch a row twice."""
+    keyed, unkeyed = {}, []
+    for row in rows:
+        if row.get(key) is None:
+            unkeyed.append(row)
+        else:
+            keyed[row[key]] = row
+    return [*keyed.values(), *unkeyed]
+
+
+class Resource(abc.ABC):
+    model = None
+    # Export columns; the first one is the natural key.
+    columns: tuple[str, ...] = ()
+    # Export column -> ORM lookup, where they differ.
+    lookups: dict[str, str] = {}
+    # Column -> parser for imported values; missing columns keep their defaults.
+    parsers: dict = {}
+    required: tuple[str, ...] = ()
+
+    def export_rows(self):
+        lookups = [self.lookups.get(column, column) for column in self.columns]
+        queryset = self.model.objects.order_by("pk").values_list(*lookups)
+        for values in queryset.iterator(chunk_size=2000):
+            yield dict(zip(self.columns, values))
+
+    def parse(self, row: dict) -> dict:
+        missing = [column for column in self.required if _text(row.get(column)).strip() == ""]
+        if missing:
+            raise ValueError(f"missing {', '.join(missing)}")
+        parsed = {}
+        for column, parser in self.parsers.items():
+            if column in row and row[column] is not None:
+                parsed[column] = parser(row[column])
+        return parsed
+
+    @abc.abstractmethod
+    def upsert(self, rows: list[dict]) -> None:
+        """Insert or update a batch of parsed rows."""
+
+
+class CategoryResource(Resource):
+    model = Category
+    columns = ("name",)
+    parsers = {"name": lambda value: _text(value).strip()}
+    required = ("name",)
+
+    def upsert(self, rows):
+        Category.objects.bulk_create(
+            [Category(name=row["name"]) for row in _dedupe(rows, "name")],
+            update_conflicts=True,
+            unique_fields=["name"],
+            update_fields=["name"],
+        )
+
+
+class MenuItemResource(Resource):
+    model = MenuItem
+    columns = ("item_id", "name", "description", "price", "available", "prep_minutes", "category")
+    lookups = {"category": "category__name"}
+    parsers = {
+        "item_id": lambda value: _uuid(value) if _text(value).strip() else None,
+        "name": _text,
+        "description": _text,
+        "price": _decimal,
+        "available": _bool,
+        "prep_minutes": _int,
+        "category": lambda value: _text(value).strip() or None,
+    }
+    required = ("name", "price")
+
+    def upsert(self, rows):
+        # Categories are referenced by name; create the missing ones first.
+        names = {row["category"] for row in rows if row.get("category")}
+        Category.objects.bulk_create(
+            [Category(name=name) for name in names], ignore_conflicts=True
+        )
+        category_ids = dict(Category.objects.filter(name__in=names).values_list("name", "pk"))
+
+        # update_fields applies to every row of an upsert, so rows are grouped
+        # by the columns they carry; a missing column is never overwritten.
+        groups: dict[frozenset, list[dict]] = {}
+        for row in rows:
+            groups.setdefault(frozenset(row), []).append(row)
+        for present, group in groups.items():
+            self._upsert_group(group, present, category_ids)
+
+    def _upsert_group(self, rows, present, category_ids):
+        update_fields = [
+            field
+            for field in ("name", "description", "price", "available", "prep_minutes", "category")
+            if field in present
+        ]
+
+        items = []
+        for row in _dedupe(rows, "item_id"):
+            values = {k: v for k, v in row.items() if k not in ("item_id", "category")}
+            if "category" in row:
+                values["category_id"] = category_ids.get(row["category"])
+            items.append(MenuItem(item_id=row.get("item_id") or uuid.uuid4(), **values))
+        MenuItem.objects.bulk_create(
+            items,
+            update_conflicts=True,
+            unique_fields=["item_id"],
+            update_fields=update_fields,
+        )
+        search.index_items([item.pk for item in items])
+
+
+class InventoryResource(Resource):
+    model = InventoryItem
+    columns = ("item_id", "name", "quantity")
+    lookups = {"item_id": "item__item_id", "name": "item__name"}
+    parsers = {"item_id": _uuid, "quantity": _int}
+    required = ("item_id", "quantity")
+
+    def upsert(self, rows):
+        ids = {row["item_id"] for row in rows}
+        known = set(MenuItem.objects.filter(pk__in=ids).values_list("pk", flat=True))
+        unknown = sorted(str(pk) for pk in ids - known)
+        if unknown:
+            raise ValueError(f"unknown menu item(s): {', '.join(unknown[:10])}")
+        rows = _dedupe(rows, "item_id")
+        previous = dict(
+            InventoryItem.objects.filter(item_id__in=ids).values_list("item_id", "quantity")
+        )
+        InventoryItem.objects.bulk_create(
+            [InventoryItem(item_id=row["item_id"], quantity=row["quantity"]) for row in rows],
+            update_conflicts=True,
+            unique_fields=["item"],
+            update_fields=["quantity", "last_updated"],
+        )
+        inventory.record_stocktakes({row["item_id"]: row["quantity"] for row in rows}, previous)
+        inventory.sync_availability(ids)
+
+
+RESOURCES: dict[str, Resource] = {
+    "categories": CategoryResource(),
+    "menu-items": MenuItemResource(),
+    "inventory": InventoryResource(),
+}
+
+
+def render_rows(resource: Resource, fmt: str):
+    """Yield the export as encoded chunks, header first for CSV."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=resource.columns)
+        writer.writeheader()
+        for row in resource.export_rows():
+            writer.writerow(row)
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        lines = []
+        size = 0
+        for row in resource.export_rows():
+            line = json.dumps(row, default=str) + "\n"
+            lines.append(line)
+            size += len(line)
+            if size >= EXPORT_CHUNK_SIZE:
+                yield "".join(lines)
+                lines, size = [], 0
+        yield "".join(lines)
+
+
+async def _async_chunks(chunks):
+    """``chunks`` as an async iterator, pulled from the worker thread one at a time.
+
+    Under ASGI a sync iterator handed to StreamingHttpResponse is buffered
+    whole before anything is sent; this keeps the export streaming.
+    """
+    done = object()
+    chunks = iter(chunks)
+    while (chunk := await sync_to_async(next)(chunks, done)) is not done:
+        yield chunk
+
+
+def read_rows(stream, fmt: str):
+    """Yield ``(line number, row dict)`` from a binary file-like object."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for number, line in enumerate(text, start=1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError as exc:
+                    yield number, exc
+                    continue
+                yield number, row
+
+
+def import_rows(resource: Resource, rows, batch_size: int | None = None) -> int:
+    """Upsert ``(line, row)`` pairs in batches; raise ValidationError on bad rows.
+
+    Columns missing from a row take the model default for new rows and are
+    left alone on existing ones.
+
+    Everything runs in one transaction, so either the whole file is applied
+    or, if any row is rejected, none of it is.
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, "CATALOG_IMPORT_BATCH_SIZE", 1000)
+
+    errors: list[dict] = []
+    imported = 0
+    with transaction.atomic():
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            batch = []
+            for line, row in chunk:
+                try:
+                    if isinstance(row, Exception):
+                        raise ValueError(str(row))
+                    if not isinstance(row, dict):
+                        raise ValueError("expected an object")
+                    batch.append(resource.parse(row))
+                except (TypeError, ValueError) as exc:
+                    errors.append({"line": line, "error": str(exc)})
+            if errors:
+                if len(errors) >= MAX_ERRORS:
+                    break
+                # Keep validating the rest of the file, but stop writing.
+                continue
+            try:
+                resource.upsert(batch)
+            except ValueError as exc:
+                errors.append({"line": chunk[0][0], "error": str(exc)})
+            imported += len(batch)
+
+        if errors:
+            # Raising inside atomic() rolls back the batches already written.
+            raise ValidationError({"errors": errors[:MAX_ERRORS]})
+
+        bump_catalog_version()
+        schedule_publish()
+    return imported
+
+
+def parse_format(value: str | None, filename: str = "") -> str:
+    if not value:
+        value = "jsonl" if filename.endswith((".jsonl", ".ndjson")) else "csv"
+    if value not in FORMATS:
+        raise ValidationError({"as": f"Expected one of: {', '.join(FORMATS)}."})
+    return value
+
+
+class CatalogTransferMixin:
+    """``GET <resource>/export/?as=csv|jsonl`` and ``POST <resource>/import/``.
+
+    Import takes a multipart ``file`` (format from ``?as=`` or the file name,
+    CSV by default) and answers with the number of rows applied.
+    """
+
+    transfer_resource: str = ""
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[IsAuthenticated, RoleRequired.with_roles(*CATALOG_EDITORS)],
+    )
+    def export(self, request):
+        fmt = parse_format(request.query_params.get("as", "csv"))
+        chunks = render_rows(RESOURCES[self.transfer_resource], fmt)
+        if isinstance(request._request, ASGIRequest):
+            chunks = _async_chunks(chunks)
+        response = StreamingHttpResponse(chunks, content_type=FORMATS[fmt])
+        response["Content-Disposition"] = f'attachment; filename="{self.transfer_resource}.{fmt}"'
+        return response
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        permission_classes=[IsAuthenticated, RoleRequired.with_roles(*CATALOG_EDITORS)],
+    )
+    def import_file(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": "Upload the CSV or JSON Lines file as 'file'."})
+        fmt = parse_format(request.query_params.get("as"), upload.name or "")
+        upload.seek(0)
+        imported = import_rows(RESOURCES[self.transfer_resource], read_rows(upload, fmt))
+        return Response({"imported": imported})
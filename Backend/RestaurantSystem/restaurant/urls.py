@@ -9,7 +9,9 @@ from .views import (
     InvoiceViewSet,
     PaymentViewSet,
     OrderDetailView,
-    CategoryViewSet
+    CategoryViewSet,
+    ArchivedOrderViewSet,
+    order_event_stream,
 )
 
 router = DefaultRouter()
@@ -20,6 +22,7 @@ router.register(r"orders", OrderViewSet, basename="orders")
 router.register(r"order-items", OrderItemViewSet, basename="order-items")
 router.register(r"invoices", InvoiceViewSet, basename="invoices")
 router.register(r"payments", PaymentViewSet, basename="payments")
+router.register(r"archive/orders", ArchivedOrderViewSet, basename="archived-orders")
 router.register("categories", CategoryViewSet)
 router.register("menu-items", MenuItemViewSet)
 
@@ -29,6 +32,7 @@ router.register("menu-items", MenuItemViewSet)
 
 
 urlpatterns = [
+    path("orders/events/", order_event_stream, name="order-events"),
     path("", include(router.urls)),
     path("orders/<uuid:order_id>/", OrderDetailView.as_view()),
 
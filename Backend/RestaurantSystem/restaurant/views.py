@@ -3,18 +3,36 @@ from __future__ import annotations
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import APIException, PermissionDenied, ValidationError
 from rest_framework import generics
 from rest_framework.decorators import action
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Case, Count, Min, Prefetch, Q, Sum, When, prefetch_related_objects
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags, quote_etag
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from datetime import timedelta
+import asyncio
+import hashlib
+import uuid
 
 
 
 
 from users.models import Customer
 
-from .models import InventoryItem, Invoice, MenuItem, Order, OrderItem, Payment, Table, Category
+from .models import ArchivedOrder, DeletedOrder, InventoryItem, InventoryMovement, Invoice, MenuItem, Order, OrderItem, Payment, Table, Category
 from .serializers import (
     InventoryItemSerializer,
+    InventoryMovementSerializer,
+    InvoiceReissueSerializer,
     InvoiceSerializer,
     MenuItemSerializer,
     OrderItemSerializer,
@@ -23,16 +41,65 @@ from .serializers import (
     PaymentSerializer,
     TableSerializer,
     OrderDetailSerializer,
-    CategorySerializer
+    CategorySerializer,
+    BulkStatusSerializer,
+    ArchivedOrderSerializer,
+    StockAdjustmentsSerializer,
+)
+from . import billing, forecast, inventory, kitchen
+from .archive import tombstone_horizon
+from .search import search_menu_items
+from .catalog import CachedCatalogMixin
+from .fastpath import FastListMixin
+from .fieldsets import EXPAND_ALL, Fieldsets
+from .transfer import CatalogTransferMixin
+from .idempotency import idempotent
+from .events import get_broker, publish_order_event, publish_status_change
+from .pagination import (
+    InventoryMovementPagination,
+    InvoicePagination,
+    KeysetPagination,
+    OrderItemPagination,
+    PaymentPagination,
 )
 from .permissions import (
     IsOwnerCustomerOrStaff,
     ReadOnlyOrRoles,
+    RoleRequired,
     get_user_role,
 )
 
 
 STAFF_ROLES = {"admin", "manager", "chef", "waiter"}
+REVENUE_STATUSES = ("SERVED", "PAID")
+
+
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The resource was changed by another request."
+    default_code = "conflict"
+
+
+def order_items_prefetch(
+    lookup: str = "items", fieldsets: Fieldsets = EXPAND_ALL, path: str = "items"
+) -> list[Prefetch]:
+    """Prefetch the order lines OrderSerializer renders at ``path``.
+
+    Expanded, items -> menu_item -> category come from one JOINed query,
+    joining only as deep as the expansion goes; collapsed to ids, only the
+    line keys are read, and lines that aren't rendered aren't fetched at all.
+    """
+    parent = path.rpartition(".")[0]
+    if not fieldsets.includes(path) or (parent and not fieldsets.expands(parent)):
+        return []
+    if not fieldsets.expands(path):
+        return [Prefetch(lookup, queryset=OrderItem.objects.only("id", "order"))]
+    related = []
+    if fieldsets.expands(f"{path}.menu_item_detail.category"):
+        related.append("menu_item__category")
+    elif fieldsets.expands(f"{path}.menu_item_detail"):
+        related.append("menu_item")
+    return [Prefetch(lookup, queryset=OrderItem.objects.select_related(*related))]
 
 
 class TableViewSet(viewsets.ModelViewSet):
@@ -45,23 +112,131 @@ class TableViewSet(viewsets.ModelViewSet):
 
 
 
-class MenuItemViewSet(viewsets.ModelViewSet):
+class MenuItemViewSet(
+    CachedCatalogMixin, FastListMixin, CatalogTransferMixin, viewsets.ModelViewSet
+):
+    catalog_cache_prefix = "menu-items"
+    transfer_resource = "menu-items"
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
 
     permission_classes = [IsAuthenticated, ReadOnlyOrRoles]
     allowed_roles = ["chef", "manager", "admin"]
 
+    search_limit = 20
+    search_max_limit = 50
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if Fieldsets.from_request(self.request).expands("category"):
+            queryset = queryset.select_related("category")
+        return queryset
+
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """Ranked full-text search: ``?q=`` over name, description and category.
 
+        Every term matches as a prefix; ``?limit=`` caps the results (max 50).
+        """
+        return self._cached(request, lambda: self._search_response(request))
 
-class InventoryItemViewSet(viewsets.ModelViewSet):
+    def _search_response(self, request):
+        try:
+            limit = int(request.query_params.get("limit", self.search_limit))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        limit = max(1, min(limit, self.search_max_limit))
+
+        ids = search_menu_items(request.query_params.get("q", ""), limit)
+        if not ids:
+            return Response([])
+        # Ranked in SQL: ?fields= may leave item_id out of the rows.
+        rank = Case(*(When(pk=pk, then=position) for position, pk in enumerate(ids)))
+        return Response(self.serialize_many(self.get_queryset().filter(pk__in=ids).order_by(rank)))
+
+
+class InventoryItemViewSet(CatalogTransferMixin, viewsets.ModelViewSet):
+    transfer_resource = "inventory"
     queryset = InventoryItem.objects.all()
     serializer_class = InventoryItemSerializer
     permission_classes = [IsAuthenticated, ReadOnlyOrRoles]
     allowed_roles = ["chef", "manager", "admin"]
 
-class OrderViewSet(viewsets.ModelViewSet):
+    @action(
+        detail=False,
+        methods=["get", "post"],
+        permission_classes=[IsAuthenticated, RoleRequired.with_roles(*allowed_roles)],
+    )
+    def movements(self, request):
+        """The stock ledger, newest first (``?item=`` narrows it down).
+
+        POST ``{"entries": [{"item", "quantity", "reason": RESTOCK|WASTE, "note"}]}``
+        records deliveries and waste in one go.
+        """
+        if request.method == "POST":
+            serializer = StockAdjustmentsSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            entries = serializer.validated_data["entries"]
+            inventory.adjust([{**entry, "item": entry["item"].pk} for entry in entries])
+            return Response({"recorded": len(entries)}, status=status.HTTP_201_CREATED)
+
+        queryset = InventoryMovement.objects.all()
+        items = self._item_filter(request)
+        if items:
+            queryset = queryset.filter(item_id__in=items)
+        paginator = InventoryMovementPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        data = InventoryMovementSerializer(page, many=True, context=self.get_serializer_context()).data
+        return paginator.get_paginated_response(data)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[IsAuthenticated, RoleRequired.with_roles(*allowed_roles)],
+    )
+    def stock(self, request):
+        """Stock per menu item from the ledger, now or as of ``?at=<ISO datetime>``."""
+        at = None
+        if request.query_params.get("at"):
+            at = parse_datetime(request.query_params["at"])
+            if at is None:
+                raise ValidationError({"at": "Expected an ISO 8601 datetime."})
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+        levels = inventory.stock_levels(self._item_filter(request), at)
+        return Response([{"item": pk, "quantity": quantity} for pk, quantity in levels.items()])
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[IsAuthenticated, RoleRequired.with_roles(*allowed_roles)],
+    )
+    def forecast(self, request):
+        """When each stock-tracked item runs out at its usual hour-of-week pace."""
+        return Response(forecast.forecast())
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="low-stock",
+        permission_classes=[IsAuthenticated, RoleRequired.with_roles(*allowed_roles)],
+    )
+    def low_stock(self, request):
+        """Items forecast to run out within ``INVENTORY_LOW_STOCK_HOURS``."""
+        return Response(forecast.low_stock(forecast.forecast()))
+
+    def _item_filter(self, request):
+        try:
+            return [uuid.UUID(value) for value in request.query_params.getlist("item")] or None
+        except ValueError:
+            raise ValidationError({"item": "Expected menu item ids."})
+
+
+class OrderViewSet(FastListMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, IsOwnerCustomerOrStaff]
+    pagination_class = KeysetPagination
+    # Actions that publish order events, which always carry the full order.
+    event_actions = {"update", "partial_update", "update_status", "bulk_status"}
 
     def get_serializer_class(self):
         if self.action == "create":
@@ -69,17 +244,161 @@ class OrderViewSet(viewsets.ModelViewSet):
         return OrderSerializer
 
     def get_queryset(self):
+        role = get_user_role(self.request.user)
+        if self.action in self.event_actions:
+            fieldsets = EXPAND_ALL
+        else:
+            fieldsets = Fieldsets.from_request(self.request)
+        queryset = Order.objects.prefetch_related(*order_items_prefetch(fieldsets=fieldsets))
+        if role not in STAFF_ROLES:
+            try:
+                customer: Customer = self.request.user.customer_profile
+            except Exception:
+                return Order.objects.none()
+            queryset = queryset.filter(customer=customer)
+
+        statuses = self.get_status_filter()
+        if statuses:
+            queryset = queryset.filter(status__in=statuses)
+        return queryset.order_by("-created_at")
+
+    def get_tombstones(self):
         role = get_user_role(self.request.user)
         if role in STAFF_ROLES:
-            return Order.objects.all().order_by("-created_at")
-
+            return DeletedOrder.objects.all()
         try:
             customer: Customer = self.request.user.customer_profile
         except Exception:
-            return Order.objects.none()
+            return DeletedOrder.objects.none()
+        return DeletedOrder.objects.filter(customer=customer)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if "since" in request.query_params:
+            return self._delta_response(queryset, self.get_tombstones())
+
+        # Fingerprint the page from its keys alone, one LIMIT query down the
+        # ordering index, so an unchanged page is answered with 304 before
+        # anything is serialized.
+        etag = self._page_etag(queryset)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super().list(request, *args, **kwargs)
+
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+    def _page_etag(self, queryset) -> str:
+        paginator = self.pagination_class()
+        ordering = [field.lstrip("-") for field in paginator.ordering]
+        rows = paginator.paginate_queryset(
+            queryset.prefetch_related(None).values(*dict.fromkeys(["pk", "updated_at", *ordering])),
+            self.request,
+            view=self,
+        )
+        key = "|".join(
+            str(part)
+            for part in (
+                self.request.user.pk,
+                self.request.get_full_path(),
+                paginator.count,
+                paginator.has_next,
+                paginator.has_previous,
+                *(f"{row['pk']}@{row['updated_at'].isoformat()}" for row in rows),
+            )
+        )
+        return quote_etag(hashlib.sha1(key.encode()).hexdigest())
+
+    def _delta_response(self, queryset, tombstones):
+        """Orders changed and deleted after ``?since=``, oldest change first.
+
+        ``since`` is an ISO timestamp or the token returned by the previous
+        delta response; the token also carries the last pk so a batch cut
+        inside a run of equal timestamps resumes exactly where it stopped.
+
+        ``updated_at`` is stamped before the writing transaction commits, so
+        a change can turn up after later-stamped ones were synced. Tokens
+        therefore never pass ``ORDER_SYNC_SETTLE_WINDOW`` ago: changes newer
+        than that are sent with the last batch and again by the next sync.
+        """
+        since_ts, since_pk = self._parse_since(self.request.query_params["since"])
+        if since_ts < tombstone_horizon():
+            # Deletions that old may have been purged and would go unreported.
+            raise ValidationError({"since": "Too old to sync from; fetch the full list again."})
+        settled = timezone.now() - getattr(settings, "ORDER_SYNC_SETTLE_WINDOW", timedelta(seconds=10))
+        seek = Q(updated_at__gt=since_ts)
+        if since_pk:
+            seek |= Q(updated_at=since_ts, pk__gt=since_pk)
+        changes = queryset.filter(seek).order_by("updated_at", "pk")
+
+        limit = KeysetPagination.max_page_size
+        changed = list(changes.filter(updated_at__lte=settled)[: limit + 1])
+        has_more = len(changed) > limit
+        changed = changed[:limit]
+
+        deleted = tombstones.filter(deleted_at__gt=since_ts).values_list("order_id", flat=True)
+
+        if has_more:
+            watermark, watermark_pk = changed[-1].updated_at, changed[-1].pk
+        else:
+            # Every settled change has been read: send the recent ones too,
+            # and resume from the settle line so they are read again.
+            changed += changes.filter(updated_at__gt=settled)
+            watermark, watermark_pk = (since_ts, since_pk) if since_ts > settled else (settled, None)
+
+        token = watermark.isoformat()
+        if watermark_pk:
+            token = f"{token}|{watermark_pk}"
 
-        return Order.objects.filter(customer=customer).order_by("-created_at")
+        return Response(
+            {
+                "results": self.get_serializer(changed, many=True).data,
+                "deleted": list(deleted),
+                "since": token,
+                "has_more": has_more,
+            }
+        )
 
+    @staticmethod
+    def _parse_since(raw: str):
+        timestamp, _, pk = raw.partition("|")
+        since = parse_datetime(timestamp.strip())
+        if since is None:
+            raise ValidationError({"since": "Expected an ISO 8601 timestamp or a sync token."})
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since, pk or None
+
+    def get_status_filter(self) -> list[str]:
+        """Parse ``?status=PENDING,PREPARING`` into a list of valid statuses."""
+        raw = self.request.query_params.get("status")
+        if not raw:
+            return []
+
+        valid = {value for value, _ in Order.STATUS}
+        statuses = [s.strip().upper() for s in raw.split(",") if s.strip()]
+        invalid = [s for s in statuses if s not in valid]
+        if invalid:
+            raise ValidationError({"status": f"Invalid status: {', '.join(invalid)}"})
+        return statuses
+
+    def _queue_response(self, statuses):
+        # Live queues are served oldest first so the kitchen works FIFO; the
+        # (status, created_at) index answers this without touching history.
+        queryset = self.get_queryset().filter(status__in=statuses).order_by("created_at")
+        return Response(self.serialize_many(queryset))
+
+    @action(detail=False, methods=["get"], url_path="kitchen-queue")
+    def kitchen_queue(self, request):
+        return self._queue_response(Order.KITCHEN_STATUSES)
+
+    @action(detail=False, methods=["get"])
+    def ready(self, request):
+        return self._queue_response(["READY"])
+
+    @idempotent("orders.create")
     def create(self, request, *args, **kwargs):
         role = get_user_role(request.user)
         if role != "customer":
@@ -90,84 +409,366 @@ class OrderViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         order = serializer.save(customer=customer)
+        prefetch_related_objects([order], *order_items_prefetch())
 
         out = OrderSerializer(order, context=self.get_serializer_context())
+        publish_order_event("order.created", order, self.event_data([order])[0])
         headers = self.get_success_headers(out.data)
         return Response(out.data, status=status.HTTP_201_CREATED, headers=headers)
+
+    def perform_update(self, serializer):
+        new_status = serializer.validated_data.pop("status", None)
+        with transaction.atomic():
+            order = serializer.save()
+            previous_status = order.status
+            if new_status:
+                self.apply_status(order, new_status)
+        publish_status_change(order, previous_status, self.event_data([order])[0])
+
+    def event_data(self, orders) -> list:
+        """``orders`` fully expanded, whatever the request asked for.
+
+        Event subscribers can't pass ``?expand=``; they get what the order
+        endpoints rendered before expansion was opt-in.
+        """
+        context = {**self.get_serializer_context(), "fieldsets": EXPAND_ALL}
+        return OrderSerializer(orders, many=True, context=context).data
+
+    def apply_status(self, order: Order, new_status: str) -> None:
+        """Validate and apply one status transition, raising 400/403/409."""
+        if new_status == order.status:
+            return
+
+        role = get_user_role(self.request.user)
+        if role not in STAFF_ROLES and not (
+            new_status == "CANCELLED" and order.status == "PENDING"
+        ):
+            raise PermissionDenied("Customers can only cancel pending orders")
+
+        if not Order.can_transition(order.status, new_status):
+            raise ValidationError(
+                {"status": f"Cannot change status from {order.status} to {new_status}"}
+            )
+
+        previous_status = order.status
+        with transaction.atomic():
+            if not order.transition_to(new_status):
+                current = Order.objects.filter(pk=order.pk).values_list("status", flat=True).first()
+                raise Conflict(
+                    {
+                        "detail": f"Order is no longer {previous_status}",
+                        "status": current,
+                    }
+                )
+            kitchen.order_status_changed(order, previous_status)
+            if new_status == "CANCELLED":
+                inventory.release_orders([order.pk])
+            elif new_status in billing.BILLED_STATUSES:
+                billing.issue_invoices([order.pk])
     
+    @action(detail=False, methods=["get"])
+    def revenue(self, request):
+        """Revenue KPIs aggregated in SQL from the stored order totals."""
+        if get_user_role(request.user) not in {"admin", "manager"}:
+            raise PermissionDenied("Only managers can view revenue")
+
+        # Reports span both the live and the archived orders; each side is
+        # aggregated in SQL and only the per-table results are merged here.
+        since = timezone.localdate() - timedelta(days=6)
+        revenue, billed_count, daily = 0, 0, {}
+        for billed in (
+            Order.objects.filter(status__in=REVENUE_STATUSES),
+            ArchivedOrder.objects.filter(status__in=REVENUE_STATUSES),
+        ):
+            totals = billed.aggregate(revenue=Sum("total"), count=Count("pk"))
+            revenue += totals["revenue"] or 0
+            billed_count += totals["count"]
+            for row in (
+                billed.filter(created_at__date__gte=since)
+                .annotate(day=TruncDate("created_at"))
+                .values("day")
+                .annotate(revenue=Sum("total"))
+            ):
+                daily[row["day"]] = daily.get(row["day"], 0) + row["revenue"]
+
+        return Response(
+            {
+                "revenue": revenue,
+                "order_count": Order.objects.count() + ArchivedOrder.objects.count(),
+                "average_order": revenue / billed_count if billed_count else 0,
+                "daily": [{"day": day, "revenue": daily[day]} for day in sorted(daily)],
+            }
+        )
+
     @action(detail=True, methods=["patch"])
     def update_status(self, request, pk=None):
         order = self.get_object()
         new_status = request.data.get("status")
 
-        allowed = ["PREPARING", "READY", "SERVED", "PAID"]
-        if new_status not in allowed:
+        if new_status not in Order.TRANSITIONS:
             return Response(
                 {"detail": "Invalid status"},
-                status=drf_status.HTTP_400_BAD_REQUEST
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-        order.status = new_status
-        order.save()
+        previous_status = order.status
+        self.apply_status(order, new_status)
+        publish_status_change(order, previous_status, self.event_data([order])[0])
 
         return Response(
             {"status": order.status},
-            status=drf_status.HTTP_200_OK
+            status=status.HTTP_200_OK
         )
 
+    @action(detail=False, methods=["post"], url_path="bulk-status")
+    def bulk_status(self, request):
+        """Move many orders to one status with a single set-based UPDATE.
 
+        Each id is reported as updated, unchanged, invalid_transition,
+        conflict (changed by someone else meanwhile) or not_found.
+        """
+        if get_user_role(request.user) not in STAFF_ROLES:
+            raise PermissionDenied("Only staff can update orders in bulk")
 
-class OrderItemViewSet(viewsets.ModelViewSet):
+        serializer = BulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order_ids = list(dict.fromkeys(serializer.validated_data["order_ids"]))
+        new_status = serializer.validated_data["status"]
+        sources = {s for s, targets in Order.TRANSITIONS.items() if new_status in targets}
+
+        before = {
+            o.pk: o
+            for o in Order.objects.filter(pk__in=order_ids).only("order_id", "status", "prep_minutes")
+        }
+        eligible = [o for o in before.values() if o.status in sources]
+
+        updated_ids = set()
+        if eligible:
+            now = timezone.now()
+            changes = {"status": new_status, "updated_at": now}
+            eta = kitchen.bulk_status_eta(new_status, {o.prep_minutes for o in eligible})
+            if eta is not None:
+                changes["estimated_time"] = eta
+
+            with transaction.atomic():
+                Order.objects.filter(
+                    pk__in=[o.pk for o in eligible], status__in=sources
+                ).update(**changes)
+                # Rows stamped with our timestamp are the ones this request won.
+                updated_ids = set(
+                    Order.objects.filter(
+                        pk__in=[o.pk for o in eligible], status=new_status, updated_at=now
+                    ).values_list("pk", flat=True)
+                )
+                kitchen.bulk_status_changed(
+                    [o for o in eligible if o.pk in updated_ids], new_status
+                )
+                if new_status == "CANCELLED":
+                    inventory.release_orders(updated_ids)
+                elif new_status in billing.BILLED_STATUSES:
+                    billing.issue_invoices(updated_ids)
+
+        if updated_ids:
+            moved = self.get_queryset().filter(pk__in=updated_ids)
+            for order, data in zip(moved, self.event_data(moved)):
+                publish_status_change(order, before[order.pk].status, data)
+
+        results = []
+        for order_id in order_ids:
+            order = before.get(order_id)
+            if order is None:
+                outcome = "not_found"
+            elif order_id in updated_ids:
+                outcome = "updated"
+            elif order.status == new_status:
+                outcome = "unchanged"
+            elif order.status not in sources:
+                outcome = "invalid_transition"
+            else:
+                outcome = "conflict"
+            results.append({"order_id": order_id, "result": outcome})
+
+        return Response({"status": new_status, "results": results})
+
+
+class OrderItemViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = OrderItemSerializer
     permission_classes = [IsAuthenticated, IsOwnerCustomerOrStaff]
+    pagination_class = OrderItemPagination
 
     def get_queryset(self):
         role = get_user_role(self.request.user)
+        fieldsets = Fieldsets.from_request(self.request)
+        related = ["order"]
+        if fieldsets.expands("menu_item_detail.category"):
+            related.append("menu_item__category")
+        elif fieldsets.expands("menu_item_detail"):
+            related.append("menu_item")
+        queryset = OrderItem.objects.select_related(*related)
         if role in STAFF_ROLES:
-            return OrderItem.objects.select_related("order", "menu_item").all()
+            return queryset
 
         try:
             customer: Customer = self.request.user.customer_profile
         except Exception:
             return OrderItem.objects.none()
 
-        return OrderItem.objects.select_related("order", "menu_item").filter(order__customer=customer)
+        return queryset.filter(order__customer=customer)
+
+    # Editing lines directly reserves or returns the stock difference.
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            line = serializer.save()
+            inventory.sync_order(line.order_id)
+
+    def perform_update(self, serializer):
+        previous_order = serializer.instance.order_id
+        with transaction.atomic():
+            line = serializer.save()
+            for order_id in {previous_order, line.order_id}:
+                inventory.sync_order(order_id)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            inventory.sync_order(instance.order_id)
+
+    @action(detail=False, methods=["get"], url_path="prep-summary")
+    def prep_summary(self, request):
+        """Outstanding kitchen work rolled up by dish.
+
+        One GROUP BY over lines whose order is PENDING/PREPARING, plus one
+        query for the lines that actually carry a note.
+        """
+        if get_user_role(request.user) not in STAFF_ROLES:
+            raise PermissionDenied("Only staff can view the kitchen summary")
+
+        lines = OrderItem.objects.filter(order__status__in=Order.KITCHEN_STATUSES)
+        rows = (
+            lines.values("menu_item", "menu_item__name")
+            .annotate(
+                pending=Sum("quantity", filter=Q(order__status="PENDING"), default=0),
+                preparing=Sum("quantity", filter=Q(order__status="PREPARING"), default=0),
+                total=Sum("quantity"),
+                oldest_waiting=Min("order__created_at"),
+            )
+            .order_by("oldest_waiting")
+        )
+
+        notes: dict = {}
+        for line in lines.exclude(note="").values(
+            "menu_item", "order_id", "quantity", "note"
+        ).order_by("order__created_at"):
+            notes.setdefault(line["menu_item"], []).append(
+                {"order_id": line["order_id"], "quantity": line["quantity"], "note": line["note"]}
+            )
+
+        return Response(
+            [
+                {
+                    "menu_item": row["menu_item"],
+                    "name": row["menu_item__name"],
+                    "pending": row["pending"],
+                    "preparing": row["preparing"],
+                    "total": row["total"],
+                    "oldest_waiting": row["oldest_waiting"],
+                    "notes": notes.get(row["menu_item"], []),
+                }
+                for row in rows
+            ]
+        )
 
 
 class InvoiceViewSet(viewsets.ModelViewSet):
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated, IsOwnerCustomerOrStaff]
+    pagination_class = InvoicePagination
 
     def get_queryset(self):
         role = get_user_role(self.request.user)
+        fieldsets = Fieldsets.from_request(self.request)
+        queryset = Invoice.objects.select_related("order").prefetch_related(
+            *order_items_prefetch("order__items", fieldsets, "order_detail.items")
+        )
         if role in {"admin", "manager"}:
-            return Invoice.objects.select_related("order").all()
+            return queryset
 
         try:
             customer: Customer = self.request.user.customer_profile
         except Exception:
             return Invoice.objects.none()
 
-        return Invoice.objects.select_related("order").filter(order__customer=customer)
+        return queryset.filter(order__customer=customer)
+
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[IsAuthenticated, RoleRequired.with_roles("admin", "manager")],
+    )
+    def reissue(self, request):
+        """Re-issue the unpaid invoices of SERVED/PAID orders placed from ``start`` to ``end``."""
+        serializer = InvoiceReissueSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            issued = billing.reissue_invoices(
+                serializer.validated_data["start"], serializer.validated_data["end"]
+            )
+        return Response({"issued": issued})
 
 
 class PaymentViewSet(viewsets.ModelViewSet):
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated, IsOwnerCustomerOrStaff]
+    pagination_class = PaymentPagination
+
+    @idempotent("payments.create")
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
 
     def get_queryset(self):
         role = get_user_role(self.request.user)
+        fieldsets = Fieldsets.from_request(self.request)
+        queryset = Payment.objects.select_related("invoice", "invoice__order").prefetch_related(
+            *order_items_prefetch("invoice__order__items", fieldsets, "invoice_detail.order_detail.items")
+        )
         if role in {"admin", "manager"}:
-            return Payment.objects.select_related("invoice", "invoice__order").all()
+            return queryset
 
         try:
             customer: Customer = self.request.user.customer_profile
         except Exception:
             return Payment.objects.none()
 
-        return Payment.objects.select_related("invoice", "invoice__order").filter(
-            invoice__order__customer=customer
-        )
+        return queryset.filter(invoice__order__customer=customer)
+
+
+class ArchivedOrderViewSet(viewsets.ReadOnlyModelViewSet):
+    """Read access to closed orders moved out by ``manage.py archive_orders``."""
+
+    serializer_class = ArchivedOrderSerializer
+    permission_classes = [IsAuthenticated, IsOwnerCustomerOrStaff]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        role = get_user_role(self.request.user)
+        fieldsets = Fieldsets.from_request(self.request)
+        queryset = ArchivedOrder.objects.all()
+        # Even collapsed to an id, the reverse one-to-one needs the join.
+        if fieldsets.expands("invoice") and fieldsets.includes("invoice.payment"):
+            queryset = queryset.select_related("invoice__payment")
+        elif fieldsets.includes("invoice"):
+            queryset = queryset.select_related("invoice")
+        if fieldsets.includes("items"):
+            queryset = queryset.prefetch_related("items")
+        if role in {"admin", "manager"}:
+            return queryset
+
+        try:
+            customer: Customer = self.request.user.customer_profile
+        except Exception:
+            return ArchivedOrder.objects.none()
+
+        return queryset.filter(customer=customer)
 
 
 class OrderDetailView(generics.RetrieveAPIView):
@@ -176,11 +777,78 @@ class OrderDetailView(generics.RetrieveAPIView):
     lookup_field = "order_id"
 
     def get_queryset(self):
-        return Order.objects.filter(
+        return Order.objects.prefetch_related(*order_items_prefetch()).filter(
             customer=self.request.user.customer
         )
     
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(CachedCatalogMixin, CatalogTransferMixin, viewsets.ReadOnlyModelViewSet):
+    catalog_cache_prefix = "categories"
+    transfer_resource = "categories"
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
+
+
+def _stream_channels(request) -> list[str] | None:
+    """Authenticate an event-stream request and return its channels.
+
+    EventSource cannot set headers, so the access token may also be passed
+    as ``?token=``.
+    """
+    auth = JWTAuthentication()
+    raw_token = request.GET.get("token")
+    if not raw_token:
+        header = auth.get_header(request)
+        raw_token = auth.get_raw_token(header) if header else None
+    if not raw_token:
+        return None
+
+    try:
+        user = auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, TokenError):
+        return None
+
+    role = get_user_role(user)
+    if role in STAFF_ROLES:
+        return [f"role:{role}"]
+    if role == "customer":
+        return [f"customer:{user.customer_profile.pk}"]
+    return None
+
+
+async def order_event_stream(request):
+    """Server-sent events for order created / status changed / cancelled.
+
+    Needs an ASGI server (see RestaurantSystem/asgi.py); each connection
+    holds a broker subscription rather than a database cursor. Under WSGI
+    (``manage.py runserver``) the endless stream would be buffered into a
+    list and hang the worker, so the request is refused with 501 instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(
+            "Order events need an ASGI server, e.g. uvicorn RestaurantSystem.asgi:application.",
+            status=501,
+            content_type="text/plain",
+        )
+
+    channels = await sync_to_async(_stream_channels)(request)
+    if channels is None:
+        return HttpResponse(status=401)
+
+    heartbeat = getattr(settings, "ORDER_EVENTS_HEARTBEAT", 15)
+
+    async def stream():
+        async with get_broker().subscribe(channels) as queue:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
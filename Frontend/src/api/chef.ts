@@ -1,10 +1,28 @@
 import api from "./axios";
+import { ORDER_EXPAND } from "./restaurant";
 
 export const getChefOrders = async () => {
-  const res = await api.get("/orders/");
+  const res = await api.get("/orders/kitchen-queue/", {
+    params: { expand: ORDER_EXPAND },
+  });
   return res.data;
 };
 
+export type PrepSummaryRow = {
+  menu_item: string;
+  name: string;
+  pending: number;
+  preparing: number;
+  total: number;
+  oldest_waiting: string;
+  notes: { order_id: string; quantity: number; note: string }[];
+};
+
+export const getPrepSummary = async () => {
+  const res = await api.get("/order-items/prep-summary/");
+  return res.data as PrepSummaryRow[];
+};
+
 export const updateOrderStatus = async (
   orderId: string,
   status: "PREPARING" | "READY"
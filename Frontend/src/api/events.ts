@@ -0,0 +1,48 @@
+import api from "./axios";
+
+export type OrderEvent<T> = {
+  type: "order.created" | "order.status_changed" | "order.cancelled";
+  order: T;
+};
+
+// Live order updates over server-sent events. EventSource cannot send an
+// Authorization header, so the access token travels as a query parameter.
+// Returns an unsubscribe function suitable for a useEffect cleanup.
+export const subscribeToOrderEvents = <T,>(
+  onEvent: (event: OrderEvent<T>) => void
+) => {
+  let source: EventSource | null = null;
+  let retryTimer: number | undefined;
+  let closed = false;
+
+  const connect = () => {
+    const token = localStorage.getItem("accessToken");
+    if (closed || !token) return;
+
+    source = new EventSource(
+      `${api.defaults.baseURL}/orders/events/?token=${encodeURIComponent(token)}`
+    );
+
+    source.onmessage = (e) => {
+      try {
+        onEvent(JSON.parse(e.data));
+      } catch (err) {
+        console.error("Bad order event:", err);
+      }
+    };
+
+    source.onerror = () => {
+      // Reconnect ourselves so a refreshed access token gets picked up.
+      source?.close();
+      if (!closed) retryTimer = window.setTimeout(connect, 5000);
+    };
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    source?.close();
+    window.clearTimeout(retryTimer);
+  };
+};
@@ -28,6 +28,15 @@ export const cancelOrder = async (orderId: string) => {
 };
 
 
+// Ranked full-text search; every term matches as a prefix.
+export const searchMenuItems = async (q: string, limit = 50): Promise<MenuItem[]> => {
+  const res = await api.get("/menu-items/search/", {
+    params: { q, limit, expand: "category" },
+  });
+  return res.data;
+};
+
+
 export const listCategories = async () => {
   const res = await api.get("/categories/");
   return res.data;
@@ -55,23 +64,35 @@ type Order = {
 };
 
 
+// Nested objects come back as ids unless expanded.
+export const ORDER_EXPAND = "items.menu_item_detail"
+
 export const listMenuItems = async () => {
-  const res = await api.get("/menu-items/")
+  const res = await api.get("/menu-items/", { params: { expand: "category" } })
   return res.data as MenuItem[]
 }
 
-export const createOrder = async (payload: CreateOrderPayload) => {
-  const res = await api.post("/orders/", payload)
+// Reuse the same idempotencyKey when retrying one checkout so a timed-out
+// request that actually reached the server is not placed twice.
+export const createOrder = async (
+  payload: CreateOrderPayload,
+  idempotencyKey: string = crypto.randomUUID()
+) => {
+  const res = await api.post("/orders/", payload, {
+    headers: { "Idempotency-Key": idempotencyKey },
+  })
   return res.data
 }
 
 export const getOrderDetail = async (orderId: string) => {
-  const res = await api.get(`/orders/${orderId}/`);
+  const res = await api.get(`/orders/${orderId}/`, {
+    params: { expand: ORDER_EXPAND },
+  });
   return res.data;
 };
 
 
 export const listMyOrders = async () => {
-  const res = await api.get("/orders/")
-  return res.data
+  const res = await api.get("/orders/", { params: { expand: ORDER_EXPAND } })
+  return res.data.results
 }
@@ -1,10 +1,20 @@
 import api from "./axios";
+import { ORDER_EXPAND } from "./restaurant";
 
 export const getReadyOrders = async () => {
-  const res = await api.get("/orders/");
+  const res = await api.get("/orders/ready/", {
+    params: { expand: ORDER_EXPAND },
+  });
   return res.data;
 };
 
+export const getServedOrders = async () => {
+  const res = await api.get("/orders/", {
+    params: { status: "SERVED", page_size: 200, expand: ORDER_EXPAND },
+  });
+  return res.data.results;
+};
+
 export const markOrderAsServed = async (orderId: string) => {
   const res = await api.patch(`/orders/${orderId}/`, {
     status: "SERVED",
@@ -2,7 +2,13 @@ import { ChefHat, CheckCircle, Clock } from "lucide-react";
 import { DashboardLayout } from "./DashboardLayout";
 import { useAuth } from "../context/AuthContext";
 import { useEffect, useState } from "react";
-import { getChefOrders, updateOrderStatus } from "../api/chef";
+import {
+  getChefOrders,
+  getPrepSummary,
+  updateOrderStatus,
+  type PrepSummaryRow,
+} from "../api/chef";
+import { subscribeToOrderEvents } from "../api/events";
 
 type OrderItem = {
   menu_item: string; // UUID
@@ -41,9 +47,19 @@ const ChefDashboard = () => {
   const [orders, setOrders] = useState<Order[]>([]);
   const [loading, setLoading] = useState(true);
   const [updatingId, setUpdatingId] = useState<string | null>(null);
+  const [prepSummary, setPrepSummary] = useState<PrepSummaryRow[]>([]);
+
+  const loadPrepSummary = async () => {
+    try {
+      setPrepSummary(await getPrepSummary());
+    } catch (e) {
+      console.error("Failed to load prep summary:", e);
+    }
+  };
 
   const loadOrders = async () => {
     const data = await getChefOrders();
+    loadPrepSummary();
 
     const filtered: Order[] = Array.isArray(data)
       ? data.filter((o) => o.status === "PENDING" || o.status === "PREPARING")
@@ -70,6 +86,25 @@ const ChefDashboard = () => {
     };
   }, []);
 
+  useEffect(
+    () =>
+      subscribeToOrderEvents<Order>(({ order }) => {
+        loadPrepSummary();
+        setOrders((cur) => {
+          const rest = cur.filter((o) => o.order_id !== order.order_id);
+          if (order.status !== "PENDING" && order.status !== "PREPARING") {
+            return rest;
+          }
+          return [...rest, order].sort(
+            (a, b) =>
+              new Date(a.created_at).getTime() -
+              new Date(b.created_at).getTime()
+          );
+        });
+      }),
+    []
+  );
+
   const startPreparing = async (orderId: string) => {
     // ✅ Optimistic update (UI فوری تغییر می‌کند)
     const prev = orders;
@@ -129,6 +164,32 @@ const ChefDashboard = () => {
           <p className="text-slate-600">Manage kitchen orders</p>
         </div>
 
+        {prepSummary.length > 0 && (
+          <div className="bg-white border rounded-xl p-6 shadow-sm mb-8">
+            <h2 className="font-semibold text-lg mb-4">Prep by dish</h2>
+            <div className="space-y-2">
+              {prepSummary.map((row) => (
+                <div key={row.menu_item} className="bg-slate-50 rounded-lg p-3">
+                  <div className="flex justify-between">
+                    <span className="font-medium">{row.name}</span>
+                    <span>
+                      x{row.total}
+                      <span className="text-sm text-slate-500 ml-2">
+                        ({row.pending} waiting, {row.preparing} in progress)
+                      </span>
+                    </span>
+                  </div>
+                  {row.notes.map((n, idx) => (
+                    <p key={idx} className="text-sm text-orange-600">
+                      <strong>x{n.quantity}:</strong> {n.note}
+                    </p>
+                  ))}
+                </div>
+              ))}
+            </div>
+          </div>
+        )}
+
         {loading && <p className="text-slate-500">Loading orders...</p>}
 
         {!loading && orders.length === 0 && (
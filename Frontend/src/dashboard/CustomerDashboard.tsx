@@ -11,6 +11,7 @@ import { useNavigate } from "react-router-dom";
 import { DashboardLayout } from "./DashboardLayout";
 import { useAuth } from "../context/AuthContext";
 import { listMyOrders, cancelOrder } from "../api/restaurant";
+import { subscribeToOrderEvents } from "../api/events";
 
 const CustomerDashboard = () => {
   const { user } = useAuth();
@@ -55,6 +56,19 @@ const CustomerDashboard = () => {
     };
   }, []);
 
+  useEffect(
+    () =>
+      subscribeToOrderEvents<any>(({ order }) => {
+        setOrders((cur) => {
+          const exists = cur.some((o) => o.order_id === order.order_id);
+          return exists
+            ? cur.map((o) => (o.order_id === order.order_id ? order : o))
+            : [order, ...cur];
+        });
+      }),
+    []
+  );
+
   /* ---------------- Helpers ---------------- */
 
   const formatStatus = (status: string) => {
@@ -18,6 +18,7 @@ import {
 import { DashboardLayout } from "./DashboardLayout";
 import { useAuth } from "../context/AuthContext";
 import api from "../api/axios";
+import { ORDER_EXPAND } from "../api/restaurant";
 
 type OrderItem = {
   quantity: number;
@@ -35,6 +36,13 @@ type Order = {
   items?: OrderItem[];
 };
 
+type RevenueSummary = {
+  revenue: number;
+  order_count: number;
+  average_order: number;
+  daily: { day: string; revenue: number }[];
+};
+
 const formatStatus = (status: string) => {
   switch (status) {
     case "PENDING":
@@ -87,11 +95,18 @@ const ManagerDashboard = () => {
 
   const [orders, setOrders] = useState<Order[]>([]);
   const [loading, setLoading] = useState(true);
+  const [summary, setSummary] = useState<RevenueSummary | null>(null);
 
   const loadOrders = async () => {
-    const res = await api.get("/orders/");
-    const data: Order[] = Array.isArray(res.data) ? res.data : [];
+    const [ordersRes, revenueRes] = await Promise.all([
+      api.get("/orders/", { params: { page_size: 200, expand: ORDER_EXPAND } }),
+      api.get("/orders/revenue/"),
+    ]);
+    const data: Order[] = Array.isArray(ordersRes.data?.results)
+      ? ordersRes.data.results
+      : [];
     setOrders(data);
+    setSummary(revenueRes.data);
   };
 
   useEffect(() => {
@@ -104,22 +119,9 @@ const ManagerDashboard = () => {
     })();
   }, []);
 
-  const { revenue, orderCount, avgOrder } = useMemo(() => {
-    const paidOrServed = orders.filter(
-      (o) => o.status === "PAID" || o.status === "SERVED"
-    );
-
-    const revenue = paidOrServed.reduce(
-      (sum, o) => sum + (o.total_price ?? 0),
-      0
-    );
-
-    const orderCount = orders.length;
-    const avgOrder =
-      orderCount > 0 ? revenue / orderCount : 0;
-
-    return { revenue, orderCount, avgOrder };
-  }, [orders]);
+  const revenue = summary?.revenue ?? 0;
+  const orderCount = summary?.order_count ?? 0;
+  const avgOrder = summary?.average_order ?? 0;
 
   const revenueChartData = useMemo(() => {
     const today = new Date();
@@ -131,14 +133,11 @@ const ManagerDashboard = () => {
       daysMap[formatDay(d)] = 0;
     }
 
-    orders.forEach((order) => {
-      if (order.status !== "PAID" && order.status !== "SERVED") return;
-
-      const d = new Date(order.created_at);
-      const label = formatDay(d);
+    summary?.daily.forEach((row) => {
+      const label = formatDay(new Date(`${row.day}T00:00:00`));
 
       if (label in daysMap) {
-        daysMap[label] += order.total_price ?? 0;
+        daysMap[label] += row.revenue;
       }
     });
 
@@ -146,7 +145,7 @@ const ManagerDashboard = () => {
       day,
       revenue,
     }));
-  }, [orders]);
+  }, [summary]);
 
   const topSellingItems = useMemo(() => {
     const map: Record<string, number> = {};
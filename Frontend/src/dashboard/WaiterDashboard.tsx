@@ -3,7 +3,8 @@ import { DashboardLayout } from "./DashboardLayout";
 import { useAuth } from "../context/AuthContext";
 // import { useNavigate } from "react-router-dom";
 import { useEffect, useState } from "react";
-import { getReadyOrders, markOrderAsServed } from "../api/waiter";
+import { getReadyOrders, getServedOrders, markOrderAsServed } from "../api/waiter";
+import { subscribeToOrderEvents } from "../api/events";
 
 type OrderItem = {
   menu_item: string; // UUID
@@ -61,15 +62,16 @@ const WaiterDashboard = () => {
   const [loading, setLoading] = useState(true);
 
   const loadOrders = async () => {
-    const data = await getReadyOrders();
-    const allOrders: Order[] = Array.isArray(data) ? data : [];
+    const [readyData, servedData] = await Promise.all([
+      getReadyOrders(),
+      getServedOrders(),
+    ]);
 
-    const ready = allOrders.filter((o) => o.status === "READY");
+    const ready: Order[] = Array.isArray(readyData) ? readyData : [];
     setOrders(ready);
 
-    const servedToday = allOrders.filter(
-      (o) => o.status === "SERVED" && isToday(o.created_at)
-    );
+    const served: Order[] = Array.isArray(servedData) ? servedData : [];
+    const servedToday = served.filter((o) => isToday(o.created_at));
     setServedTodayCount(servedToday.length);
   };
 
@@ -83,6 +85,20 @@ const WaiterDashboard = () => {
     })();
   }, []);
 
+  useEffect(
+    () =>
+      subscribeToOrderEvents<Order>(({ type, order }) => {
+        setOrders((cur) => {
+          const rest = cur.filter((o) => o.order_id !== order.order_id);
+          return order.status === "READY" ? [...rest, order] : rest;
+        });
+        if (type === "order.status_changed" && order.status === "SERVED") {
+          setServedTodayCount((n) => n + 1);
+        }
+      }),
+    []
+  );
+
   const handleMarkAsServed = async (orderId: string) => {
     await markOrderAsServed(orderId);
     await loadOrders();
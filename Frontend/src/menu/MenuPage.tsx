@@ -1,4 +1,4 @@
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useMemo, useRef, useState } from "react";
 import {
   Search,
   ShoppingBag,
@@ -7,7 +7,7 @@ import {
 import { DashboardLayout } from "../dashboard/DashboardLayout";
 import { useAuth } from "../context/AuthContext";
 import { useNavigate } from "react-router-dom";
-import { listMenuItems, createOrder } from "../api/restaurant";
+import { listMenuItems, createOrder, searchMenuItems } from "../api/restaurant";
 
 /* ---------------- Types ---------------- */
 
@@ -16,12 +16,18 @@ interface Category {
   name: string;
 }
 
+interface MenuImage {
+  src: string;
+  // format ("avif", "webp") -> "url 160w, url 480w, ..."
+  srcset: Record<string, string>;
+}
+
 interface MenuItem {
   id: string;
   name: string;
   description: string;
   price: number;
-  image: string | null;
+  image: MenuImage | null;
   available: boolean;
   category: Category | null;
 }
@@ -56,9 +62,18 @@ const MenuPage = () => {
   const [menuError, setMenuError] = useState<string | null>(null);
 
   const [searchQuery, setSearchQuery] = useState("");
+  // IDs matched by the server-side search; null while the box is empty.
+  const [searchIds, setSearchIds] = useState<Set<string> | null>(null);
   const [activeCategory, setActiveCategory] = useState<string>("All");
 
   const [cart, setCart] = useState<CartItem[]>([]);
+
+  // One Idempotency-Key per cart: retrying the same checkout reuses it,
+  // any change to the cart starts a new one.
+  const checkoutKey = useRef(crypto.randomUUID());
+  useEffect(() => {
+    checkoutKey.current = crypto.randomUUID();
+  }, [cart]);
   const [isSubmitting, setIsSubmitting] = useState(false);
 
   /* ---------------- Load Menu ---------------- */
@@ -98,6 +113,29 @@ const MenuPage = () => {
     };
   }, []);
 
+  /* ---------------- Search ---------------- */
+
+  useEffect(() => {
+    const q = searchQuery.trim();
+    if (!q) {
+      setSearchIds(null);
+      return;
+    }
+    let current = true;
+    const timer = setTimeout(async () => {
+      try {
+        const results = await searchMenuItems(q);
+        if (current) setSearchIds(new Set(results.map((it) => it.item_id)));
+      } catch {
+        if (current) setSearchIds(new Set());
+      }
+    }, 200);
+    return () => {
+      current = false;
+      clearTimeout(timer);
+    };
+  }, [searchQuery]);
+
   /* ---------------- Categories (Dynamic) ---------------- */
 
   const categories = useMemo(() => {
@@ -117,9 +155,7 @@ const MenuPage = () => {
       activeCategory === "All" ||
       item.category?.name === activeCategory;
 
-    const matchesSearch =
-      item.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      item.description.toLowerCase().includes(searchQuery.toLowerCase());
+    const matchesSearch = searchIds === null || searchIds.has(item.id);
 
     return matchesCategory && matchesSearch;
   });
@@ -149,13 +185,16 @@ const MenuPage = () => {
 
     setIsSubmitting(true);
     try {
-      await createOrder({
-        items: cart.map((item) => ({
-          menu_item: item.id,
-          quantity: item.quantity,
-          note: "",
-        })),
-      });
+      await createOrder(
+        {
+          items: cart.map((item) => ({
+            menu_item: item.id,
+            quantity: item.quantity,
+            note: "",
+          })),
+        },
+        checkoutKey.current
+      );
       setCart([]);
       navigate("/dashboard/customer");
     } finally {
@@ -234,11 +273,22 @@ const MenuPage = () => {
           
           {/* Image */}
           <div className="h-48 bg-slate-100">
-            <img
-              src={item.image ?? "/placeholder-food.jpg"}
-              alt={item.name}
-              className="w-full h-full object-cover"
-            />
+            <picture className="block w-full h-full">
+              {Object.entries(item.image?.srcset ?? {}).map(([format, srcSet]) => (
+                <source
+                  key={format}
+                  type={`image/${format}`}
+                  srcSet={srcSet}
+                  sizes="(min-width: 640px) 320px, 100vw"
+                />
+              ))}
+              <img
+                src={item.image?.src ?? "/placeholder-food.jpg"}
+                alt={item.name}
+                loading="lazy"
+                className="w-full h-full object-cover"
+              />
+            </picture>
           </div>
 
           {/* Content */}